@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import dispatch
+import traffic
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, CAR_CAPACITY, TRANSFER_TIME, \
+    DOOR, ELEVATOR_STATE, MOVE_STATE, Passenger, ElevatorGroup
+
+
+class AsyncElevatorSystem(ElevatorGroup):
+    """
+    单线程的asyncio电梯控制器
+    每台电梯是一个协程，无事可做时等待自己的 asyncio.Event，移动/开关门用 asyncio.sleep 计时；
+    外部任务分配是一个协程，从 asyncio.Queue 中取出新的外部任务或"电梯状态已变化"的通知。
+    所有协程在同一线程中运行，状态读写无需加锁，电梯数量可以达到数千台。
+    扫描、开关门、载客量与乘客进出、故障处理以及外部任务分配规则由 ElevatorGroup 实现，与 simulation.py 相同
+    """
+
+    def __init__(self, elevator_num=ELEVATOR_NUM, floor_num=FLOOR_NUM, move_time=MOVE_TIME,
+                 door_time=DOOR_OPEN_AND_CLOSE_TIME, strategy=dispatch.EtaMinimizing.name, speed=1.0,
+                 capacity=CAR_CAPACITY, transfer_time=TRANSFER_TIME):
+        """
+        :param elevator_num: 电梯数量
+        :param floor_num: 楼层数
+        :param move_time: 移动一层所需时间（毫秒）
+        :param door_time: 一次开关门所需时间（毫秒）
+        :param strategy: 外部任务的分配策略，dispatch.STRATEGIES中的名称或 DispatchStrategy 对象
+        :param speed: 时间倍率，所有等待时间除以该值
+        :param capacity: 每台电梯最多容纳的乘客数，None表示不限；满载的电梯不参与分配
+        :param transfer_time: 每位乘客进出电梯所需时间（毫秒），开关门后电梯按进出人数多停留
+        """
+        if isinstance(strategy, str):
+            strategy = dispatch.make_strategy(strategy, move_time, door_time)
+        super().__init__(elevator_num, floor_num, move_time, door_time, strategy, capacity, transfer_time)
+        self.speed = speed
+
+        # 以下对象在 start() 中于事件循环内创建
+        self.loop = None
+        self.start_time = 0.0
+        self.calls = None  # 外部任务分配协程的通知：有新的外部任务，或电梯状态发生了变化
+        self.wakeups = []  # 每台电梯的唤醒事件
+        self.car_tasks = []  # 每台电梯的协程，故障时取消，恢复时重新创建
+        self.dispatcher_task = None
+
+    def now(self):
+        """
+        :return: 控制器启动以来经过的时间（毫秒，已乘以时间倍率）
+        """
+        return int((self.loop.time() - self.start_time) * 1000 * self.speed)
+
+    def current_time(self):
+        return self.now()
+
+    async def sleep(self, ms):
+        await asyncio.sleep(ms / 1000 / self.speed)
+
+    def start(self):
+        """
+        在当前事件循环中启动所有电梯协程与分配协程（须在事件循环所在线程中调用）
+        """
+        self.loop = asyncio.get_event_loop()
+        self.start_time = self.loop.time()
+        self.calls = asyncio.Queue()
+        self.wakeups = [asyncio.Event() for _ in range(self.elevator_num)]
+        self.car_tasks = [self.loop.create_task(self.car(i)) for i in range(self.elevator_num)]
+        self.dispatcher_task = self.loop.create_task(self.dispatcher())
+
+    async def stop(self):
+        """
+        取消所有协程并等待它们结束
+        """
+        tasks = [task for task in self.car_tasks if task is not None] + [self.dispatcher_task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self, elevator_id):
+        self.wakeups[elevator_id].set()
+
+    def notify_dispatcher(self):
+        """
+        电梯位置/状态发生变化，若有之前无法分配的任务则让分配协程再试一次
+        """
+        if self.outer_tasks_queue.unassigned:
+            self.calls.put_nowait(None)
+
+    def hall_call(self, floor_id, move_state):
+        """
+        外部方向按钮被点击
+        """
+        self.external_direction_button_clicked(floor_id, move_state)
+
+    def external_direction_button_clicked(self, floor_id, move_state):
+        """
+        外部任务加入队列后通知分配协程
+        :return: 是否产生了新的外部任务
+        """
+        added = super().external_direction_button_clicked(floor_id, move_state)
+        if added:
+            self.calls.put_nowait(None)
+        return added
+
+    def car_call(self, elevator_id, floor_id):
+        """
+        电梯内部按钮被点击
+        :return: 是否加入了新的目标楼层
+        """
+        added = self.elevator_button_clicked(elevator_id, floor_id)
+        if added:
+            self.wake(elevator_id)
+        return added
+
+    def passenger(self, origin, destination):
+        """
+        一位乘客到达origin层并按下外部按钮，电梯到达后进入电梯按下destination层
+        :return: 乘客对象
+        """
+        passenger = Passenger(origin, destination, self.now())
+        self.passenger_arrival(passenger)
+        return passenger
+
+    def fault(self, elevator_id):
+        """
+        报警键按下：取消该电梯正在进行的动作，电梯回到一楼，原先分配给它的外部任务重新分配
+        """
+        if not self.elevator_fault(elevator_id):
+            return
+        self.car_tasks[elevator_id].cancel()
+        self.car_tasks[elevator_id] = None
+        self.notify_dispatcher()
+
+    def repair(self, elevator_id):
+        """
+        故障解除，重新启动该电梯的协程
+        """
+        if not self.elevator_repair(elevator_id):
+            return
+        self.car_tasks[elevator_id] = self.loop.create_task(self.car(elevator_id))
+        self.notify_dispatcher()
+
+    async def car(self, elevator_id):
+        """
+        电梯协程：无事可做时等待唤醒，否则移动一层或开关门；故障时被取消
+        """
+        wakeup = self.wakeups[elevator_id]
+        while True:
+            action = self.next_action(elevator_id)
+            if action is None:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            if action == DOOR:
+                self.elevator_states[elevator_id] = ELEVATOR_STATE.DOOR
+                # 前1/4为开门阶段，门完全打开后乘客进出，有乘客进出时关门前按人数多停留一段时间
+                await self.sleep(self.door_time // 4)
+                moved = self.door_opened(elevator_id)
+                await self.sleep(self.door_time - self.door_time // 4 + moved * self.transfer_time)
+            else:
+                self.elevator_states[elevator_id] = ELEVATOR_STATE.UP if action == MOVE_STATE.UP \
+                    else ELEVATOR_STATE.DOWN
+                await self.sleep(self.move_time)
+                self.elevator_cur_floor[elevator_id] += action.value
+            self.elevator_states[elevator_id] = ELEVATOR_STATE.NORMAL
+            self.notify_dispatcher()
+
+    async def dispatcher(self):
+        """
+        外部任务分配协程（对应 Outer.run）：每收到新任务或状态变化的通知，分配所有等待分配的任务
+        """
+        while True:
+            await self.calls.get()
+            # 一次取完已经到达的通知，避免重复分配
+            while not self.calls.empty():
+                self.calls.get_nowait()
+            for elevator_id in self.dispatch():
+                self.wake(elevator_id)
+
+
+class QtLoopBridge:
+    """
+    在Qt事件循环中驱动asyncio事件循环（不依赖qasync）：
+    QTimer每隔interval毫秒让asyncio循环处理一轮已到期的回调，
+    协程与界面在同一线程中运行，界面可以直接读取 AsyncElevatorSystem 的状态、调用其按钮方法
+    """
+
+    def __init__(self, loop=None, interval=5):
+        """
+        :param loop: asyncio事件循环，None则新建一个并设为当前循环
+        :param interval: 驱动间隔（毫秒），即协程计时的最小精度
+        """
+        # 只有使用界面时才需要Qt
+        from PyQt5.QtCore import QTimer
+
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        self.loop = loop
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(interval)
+
+    def tick(self):
+        # stop回调排在本轮已就绪的回调之后，run_forever处理完这一轮即返回
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+
+    def close(self):
+        self.timer.stop()
+        self.loop.close()
+
+
+async def feed_traffic(system, passengers):
+    """
+    按到达时刻让乘客依次按下外部按钮
+    :param passengers: traffic.generate 生成的乘客（按到达时刻排序）
+    """
+    for passenger in passengers:
+        delay = passenger.arrival_time - system.now()
+        if delay > 0:
+            await system.sleep(delay)
+        system.passenger(passenger.origin, passenger.destination)
+
+
+async def run_traffic(elevator_num, floor_num, profile, rate, duration, speed, strategy, seed=None, drain=600000):
+    """
+    运行一段客流，客流结束后继续运行直到所有乘客送达（最多drain），返回控制器与乘客列表
+    :param rate: 每分钟到达的乘客数
+    :param duration: 客流持续时间（毫秒，控制器时间）
+    :param drain: 客流结束后最多再运行的时间（毫秒，控制器时间）
+    """
+    system = AsyncElevatorSystem(elevator_num, floor_num, strategy=strategy, speed=speed)
+    system.start()
+    passengers = traffic.generate(profile, duration, rate, seed, floor_num)
+    await feed_traffic(system, passengers)
+    if duration > system.now():
+        await system.sleep(duration - system.now())
+    deadline = system.now() + drain
+    while len(system.delivered_passengers) < len(passengers) and system.now() < deadline:
+        await system.sleep(1000)
+    await system.stop()
+    return system, passengers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="用asyncio在单线程中运行大量电梯")
+    parser.add_argument("-e", "--elevators", type=int, default=1000, help="电梯数量")
+    parser.add_argument("-f", "--floors", type=int, default=FLOOR_NUM, help="楼层数")
+    parser.add_argument("-p", "--profile", default=traffic.INTERFLOOR, choices=traffic.PROFILES, help="客流模式")
+    parser.add_argument("-r", "--rate", type=float, default=6000, help="每分钟到达的乘客数")
+    parser.add_argument("-t", "--duration", type=int, default=120, help="客流持续时间（秒，控制器时间）")
+    parser.add_argument("-x", "--speed", type=float, default=10.0, help="时间倍率")
+    # nearest在电梯都停在一楼时总是选编号最小的电梯，电梯很多时几乎所有请求都集中到少数几台上
+    parser.add_argument("-s", "--strategy", default=dispatch.EtaMinimizing.name,
+                        choices=sorted(dispatch.STRATEGIES), help="分配策略")
+    parser.add_argument("--drain", type=int, default=600, help="客流结束后等待乘客全部送达的最长时间（秒）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args(argv)
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    start = time.perf_counter()
+    system, passengers = asyncio.run(run_traffic(args.elevators, args.floors, args.profile, args.rate,
+                                                 args.duration * 1000, args.speed, args.strategy, seed,
+                                                 args.drain * 1000))
+    elapsed = time.perf_counter() - start
+    # 与 benchmark.py 相同，按送达的乘客统计候梯与行程时间（同一外部任务可能合并了多位乘客）
+    delivered = system.delivered_passengers
+    waits = [passenger.board_time - passenger.arrival_time for passenger in delivered]
+    journeys = [passenger.alight_time - passenger.arrival_time for passenger in delivered]
+    print("%d台电梯，%d层，控制器时间%.1fs，实际用时%.1fs" % (args.elevators, args.floors, system.now() / 1000,
+                                                        elapsed))
+    print("完成外部任务%d个；送达乘客%d/%d人，平均候梯%.1fs，平均行程%.1fs" % (
+        len(system.finished_tasks), len(delivered), len(passengers),
+        sum(waits) / len(waits) / 1000 if waits else 0.0, sum(journeys) / len(journeys) / 1000 if journeys else 0.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import argparse
+import json
+import math
+import sys
+import time
+
+import dispatch
+import traffic
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, CAR_CAPACITY, TRANSFER_TIME
+from simulation import Simulation
+
+# 固定的基准客流：名称 -> (客流模式, 每分钟人数, 分钟数, 种子)
+WORKLOADS = {
+    "up_peak": (traffic.UP_PEAK, 40, 60, 1),
+    "down_peak": (traffic.DOWN_PEAK, 40, 60, 2),
+    "lunch": (traffic.LUNCH, 30, 60, 3),
+    "interfloor": (traffic.INTERFLOOR, 20, 60, 4),
+}
+
+# 与基准结果比较时检查的指标（均为越小越好）
+REGRESSION_METRICS = ("wait_avg", "wait_p95", "wait_p99", "journey_avg", "journey_p95", "journey_p99")
+# 与基准结果比较时检查的处理量指标（均为越大越好）
+THROUGHPUT_METRICS = ("passengers_delivered", "passengers_per_hour")
+
+
+def percentile(values, p):
+    '''
+    最近秩法求百分位数
+    :param values: 已排序的数值列表
+    :param p: 百分位（0~100）
+    :return: 百分位数，列表为空时为None
+    '''
+    if not values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(values):
+    '''
+    :param values: 数值列表（毫秒）
+    :return: (平均值, 95百分位, 99百分位)，单位为秒
+    '''
+    if not values:
+        return None, None, None
+    values = sorted(values)
+    return (round(sum(values) / len(values) / 1000, 3), round(percentile(values, 95) / 1000, 3),
+            round(percentile(values, 99) / 1000, 3))
+
+
+def collect_metrics(sim, duration):
+    '''
+    从模拟结束后的模拟器中统计指标
+    :param sim: simulation.Simulation
+    :param duration: 客流的时长（毫秒），用于计算每小时处理量
+    :return: 指标字典，时间的单位为秒
+    '''
+    delivered = sim.delivered_passengers
+    waits = [passenger.board_time - passenger.arrival_time for passenger in delivered]
+    journeys = [passenger.alight_time - passenger.arrival_time for passenger in delivered]
+    hours = duration / 3600 / 1000
+    metrics = {
+        "passengers_delivered": len(delivered),
+        # 合并后的外部请求数，目的楼层分配模式下没有外部请求，为0；比较处理能力时用passengers_per_hour
+        "hall_calls_served": len(sim.finished_tasks),
+        "calls_served_per_hour": round(len(sim.finished_tasks) / hours, 1),
+        "passengers_per_hour": round(len(delivered) / hours, 1),
+        "stops_total": sim.stops_total,
+        "stops_per_trip": round(sim.stops_total / sim.trips_total, 2) if sim.trips_total else 0.0,
+        "simulated_seconds": round(sim.now / 1000, 1),
+    }
+    metrics["wait_avg"], metrics["wait_p95"], metrics["wait_p99"] = summarize(waits)
+    metrics["journey_avg"], metrics["journey_p95"], metrics["journey_p99"] = summarize(journeys)
+    # 利用率：电梯处于移动或开关门动作中的时间占比
+    utilization = [busy / sim.now if sim.now else 0.0 for busy in sim.elevator_busy_time]
+    metrics["car_utilization"] = [round(value, 4) for value in utilization]
+    metrics["car_utilization_avg"] = round(sum(utilization) / len(utilization), 4) if utilization else 0.0
+    return metrics
+
+
+def format_seconds(value):
+    '''
+    :param value: 秒数，没有数据时为None
+    :return: 保留一位小数的秒数，没有数据时为"n/a"
+    '''
+    return "n/a" if value is None else "%.1fs" % value
+
+
+def run_workload(workload, elevator_num=ELEVATOR_NUM, floor_num=FLOOR_NUM, move_time=MOVE_TIME,
+                 door_time=DOOR_OPEN_AND_CLOSE_TIME, **sim_args):
+    '''
+    运行一个基准客流
+    :param workload: (客流模式, 每分钟人数, 分钟数, 种子)
+    :param sim_args: 传给 Simulation 的其余参数
+    :return: 指标字典
+    '''
+    profile, rate, minutes, seed = workload
+    duration = int(minutes * 60 * 1000)
+    sim = Simulation(elevator_num, floor_num, move_time, door_time, **sim_args)
+    passengers = traffic.generate(profile, duration, rate, seed, floor_num)
+    traffic.schedule_passengers(sim, passengers)
+    start = time.perf_counter()
+    sim.run()
+    metrics = collect_metrics(sim, duration)
+    metrics["passengers_generated"] = len(passengers)
+    metrics["run_seconds"] = round(time.perf_counter() - start, 3)
+    return metrics
+
+
+def compare(results, baseline, tolerance):
+    '''
+    与基准结果比较
+    :param results: 本次结果 {客流名称: 指标}
+    :param baseline: 基准结果（同样的格式）
+    :param tolerance: 允许变差的比例
+    :return: 变差超过容差的 (客流名称, 指标, 基准值, 本次值) 列表，本次没有数据时本次值为None
+    '''
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for key in REGRESSION_METRICS + THROUGHPUT_METRICS:
+            old, new = baseline[name].get(key), metrics.get(key)
+            if old is None:
+                continue
+            # 基准有数据而本次没有（没有送达任何乘客）也算变差
+            if new is None:
+                regressions.append((name, key, old, new))
+            elif key in THROUGHPUT_METRICS and new < old * (1 - tolerance):
+                regressions.append((name, key, old, new))
+            elif key in REGRESSION_METRICS and new > old * (1 + tolerance):
+                regressions.append((name, key, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在无界面模拟器中运行固定客流，统计调度指标")
+    parser.add_argument("-w", "--workload", action="append", choices=sorted(WORKLOADS),
+                        help="只运行指定的客流（可重复），默认运行全部")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="结果文件（JSON）")
+    parser.add_argument("-b", "--baseline", help="基准结果文件，指标变差超过容差时返回非0")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.05, help="允许变差的比例，默认0.05")
+    parser.add_argument("-s", "--strategy", choices=sorted(dispatch.STRATEGIES),
+                        help="外部任务的分配策略，默认eta（--vectorized时为nearest）")
+    parser.add_argument("-d", "--destination", action="store_true", help="目的楼层分配模式（忽略--strategy）")
+    parser.add_argument("-c", "--capacity", type=int, default=CAR_CAPACITY,
+                        help="轿厢额定载客人数，默认%d，0表示不限" % CAR_CAPACITY)
+    parser.add_argument("--vectorized", action="store_true", help="使用numpy批量打分（仅nearest）")
+    parser.add_argument("--batch-interval", type=int, default=None,
+                        help="batch策略的分配周期（毫秒），默认每个事件之后立即分配")
+    args = parser.parse_args(argv)
+
+    names = args.workload or list(WORKLOADS)
+    strategy = args.strategy or dispatch.default_strategy(args.vectorized)
+    capacity = args.capacity or None
+    results = {}
+    for name in names:
+        results[name] = run_workload(WORKLOADS[name], vectorized=args.vectorized, strategy=strategy,
+                                     destination_dispatch=args.destination, capacity=capacity,
+                                     batch_interval=args.batch_interval)
+        metrics = results[name]
+        print("%-10s 候梯 平均%s P95 %s P99 %s | 行程 平均%s P95 %s | %d人/小时 | %d次外部请求/小时 | 每趟停靠%.1f次 | 利用率 %.1f%%" % (
+            # 没有送达任何乘客时（时长很短、电梯全部故障）这些指标为None，显示为n/a
+            name, format_seconds(metrics["wait_avg"]), format_seconds(metrics["wait_p95"]),
+            format_seconds(metrics["wait_p99"]), format_seconds(metrics["journey_avg"]),
+            format_seconds(metrics["journey_p95"]), metrics["passengers_per_hour"],
+            metrics["calls_served_per_hour"], metrics["stops_per_trip"],
+            metrics["car_utilization_avg"] * 100))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"config": {"elevator_num": ELEVATOR_NUM, "floor_num": FLOOR_NUM, "move_time": MOVE_TIME,
+                              "door_time": DOOR_OPEN_AND_CLOSE_TIME, "strategy": strategy,
+                              "destination_dispatch": args.destination, "capacity": capacity,
+                              "transfer_time": TRANSFER_TIME, "batch_interval": args.batch_interval},
+                   "results": results}, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, key, old, new in regressions:
+            print("变差：%s %s %s -> %s" % (name, key, old, "n/a" if new is None else new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import sys
+import time
+
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_STATE
+from simulation import Simulation
+
+# 轨迹文件格式（文本，每行一条记录，时间为相对于开始录制的毫秒数）：
+#   # elevator-trace v1 elevators=5 floors=20
+#   <毫秒> H <楼层> <方向(1/-1)>    外部方向按钮
+#   <毫秒> C <电梯> <楼层>          电梯内部按钮
+#   <毫秒> F <电梯>                 报警键：进入故障
+#   <毫秒> R <电梯>                 报警键：恢复正常
+TRACE_HEADER = "# elevator-trace v1"
+HALL_CALL = "H"
+CAR_CALL = "C"
+FAULT = "F"
+REPAIR = "R"
+
+
+class TraceRecorder:
+    """
+    乘客按键记录器
+    界面的按钮处理函数调用 hall_call/car_call/fault/repair，记录按下的时刻与参数，
+    save 后得到的轨迹文件可以交给 replay 在模拟器中重放
+    """
+
+    def __init__(self, path=None, elevator_num=ELEVATOR_NUM, floor_num=FLOOR_NUM, clock=None):
+        """
+        :param path: 轨迹文件路径，不为None时每条记录立即写入文件（程序异常退出也不会丢失）
+        :param elevator_num: 电梯数量
+        :param floor_num: 楼层数
+        :param clock: 返回当前毫秒数的函数（如界面按倍率推进的控制器时间），None为真实时间
+        """
+        self.elevator_num = elevator_num
+        self.floor_num = floor_num
+        self.records = []  # (毫秒, 种类, 参数...)
+        self.clock = clock or (lambda: int(time.monotonic() * 1000))
+        self.start_time = self.clock()
+        self.file = None
+        if path is not None:
+            self.file = open(path, "w", encoding="utf-8")
+            self.file.write(trace_header(elevator_num, floor_num) + "\n")
+            self.file.flush()
+
+    def elapsed(self):
+        """
+        :return: 距离开始录制的毫秒数
+        """
+        return self.clock() - self.start_time
+
+    def record(self, kind, *args):
+        record = (self.elapsed(), kind) + args
+        self.records.append(record)
+        if self.file is not None:
+            self.file.write(format_record(record) + "\n")
+            self.file.flush()
+
+    def hall_call(self, floor_id, move_state):
+        self.record(HALL_CALL, floor_id, move_state.value)
+
+    def car_call(self, elevator_id, floor_id):
+        self.record(CAR_CALL, elevator_id, floor_id)
+
+    def fault(self, elevator_id):
+        self.record(FAULT, elevator_id)
+
+    def repair(self, elevator_id):
+        self.record(REPAIR, elevator_id)
+
+    def save(self, path):
+        """
+        把已记录的内容写入轨迹文件
+        """
+        save_trace(path, self.records, self.elevator_num, self.floor_num)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def trace_header(elevator_num, floor_num):
+    return "%s elevators=%d floors=%d" % (TRACE_HEADER, elevator_num, floor_num)
+
+
+def format_record(record):
+    return " ".join(str(value) for value in record)
+
+
+def save_trace(path, records, elevator_num=ELEVATOR_NUM, floor_num=FLOOR_NUM):
+    '''
+    写出轨迹文件
+    :param path: 文件路径
+    :param records: (毫秒, 种类, 参数...) 的列表
+    '''
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(trace_header(elevator_num, floor_num) + "\n")
+        for record in records:
+            f.write(format_record(record) + "\n")
+
+
+def load_trace(path):
+    '''
+    读取轨迹文件
+    :param path: 文件路径
+    :return: (记录列表, 电梯数量, 楼层数)，记录按时间排序
+    '''
+    elevator_num, floor_num = ELEVATOR_NUM, FLOOR_NUM
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                for field in line.split():
+                    if field.startswith("elevators="):
+                        elevator_num = int(field[len("elevators="):])
+                    elif field.startswith("floors="):
+                        floor_num = int(field[len("floors="):])
+                continue
+            fields = line.split()
+            if len(fields) < 3 or fields[1] not in (HALL_CALL, CAR_CALL, FAULT, REPAIR):
+                raise ValueError("%s:%d: 无法解析的记录 %r" % (path, line_no, line))
+            records.append((int(fields[0]), fields[1]) + tuple(int(value) for value in fields[2:]))
+    # 稳定排序，同一时刻的记录保持录制顺序
+    records.sort(key=lambda record: record[0])
+    return records, elevator_num, floor_num
+
+
+def schedule_trace(sim, records, offset=0):
+    '''
+    把轨迹中的按键放入模拟器的事件堆
+    :param sim: simulation.Simulation
+    :param records: 轨迹记录
+    :param offset: 所有记录整体推迟的毫秒数
+    '''
+    for record in records:
+        when, kind, args = record[0] + offset, record[1], record[2:]
+        if kind == HALL_CALL:
+            sim.hall_call(when, args[0], MOVE_STATE(args[1]))
+        elif kind == CAR_CALL:
+            sim.car_call(when, args[0], args[1])
+        elif kind == FAULT:
+            sim.fault(when, args[0])
+        elif kind == REPAIR:
+            sim.repair(when, args[0])
+
+
+def run_paced(sim, speed=1.0, until=None):
+    '''
+    按墙上时间推进模拟：虚拟时间每过speed毫秒，真实时间过1毫秒
+    :param sim: simulation.Simulation
+    :param speed: 加速倍数，1.0为实时
+    :param until: 模拟截止时刻（毫秒），None表示处理完所有事件
+    :return: 当前虚拟时刻
+    '''
+    start_wall = time.monotonic()
+    start_sim = sim.now
+    while sim.events:
+        next_time = sim.events[0][0]
+        if until is not None and next_time > until:
+            break
+        delay = start_wall + (next_time - start_sim) / speed / 1000 - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        sim.run(until=next_time)
+    if until is not None:
+        sim.run(until=until)
+    return sim.now
+
+
+def replay(path, speed=None, until=None, **sim_args):
+    '''
+    在无界面模拟器中重放轨迹文件
+    :param path: 轨迹文件路径
+    :param speed: None表示尽快完成（只推进虚拟时钟），否则为相对实时的加速倍数
+    :param until: 模拟截止时刻（毫秒）
+    :param sim_args: 传给 Simulation 的其余参数（move_time、door_time、vectorized等）
+    :return: 模拟结束后的 Simulation
+    '''
+    records, elevator_num, floor_num = load_trace(path)
+    sim = Simulation(elevator_num, floor_num, **sim_args)
+    schedule_trace(sim, records)
+    if speed is None:
+        sim.run(until)
+    else:
+        run_paced(sim, speed, until)
+    return sim
+
+
+if __name__ == '__main__':
+    # python call_trace.py <轨迹文件> [加速倍数]
+    if len(sys.argv) < 2:
+        print("用法: python call_trace.py <轨迹文件> [加速倍数]")
+        sys.exit(1)
+    sim = replay(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else None)
+    waits = [task.finished_time - task.created_time for task in sim.finished_tasks]
+    print("模拟时长 %.1fs，处理事件 %d 个，完成外部请求 %d 个，平均等待 %.1fs" % (
+        sim.now / 1000, sim.event_count, len(waits), sum(waits) / len(waits) / 1000 if waits else 0))
@@ -0,0 +1,96 @@
+import argparse
+import json
+import sys
+
+import benchmark
+import dispatch
+import traffic
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, CAR_CAPACITY
+
+# 命令行入口：只使用无界面模拟器，不导入PyQt5，numpy只在 --vectorized 时才导入
+#   python -m cli simulate --workload up_peak --duration 600
+#   python -m cli replay incident.trace
+
+
+def simulate(args):
+    '''
+    生成一段客流并在模拟器中运行，打印指标
+    '''
+    if args.workload in benchmark.WORKLOADS:
+        profile, rate, minutes, seed = benchmark.WORKLOADS[args.workload]
+    else:
+        profile, rate, minutes, seed = args.workload, 30, 60, None
+    if args.rate is not None:
+        rate = args.rate
+    if args.duration is not None:
+        minutes = args.duration / 60
+    if args.seed is not None:
+        seed = args.seed
+    metrics = benchmark.run_workload(
+        (profile, rate, minutes, seed), args.elevators, args.floors, args.move_time, args.door_time,
+        vectorized=args.vectorized, strategy=args.strategy, destination_dispatch=args.destination,
+        capacity=args.capacity or None)
+    print("%s 乘客%d人 送达%d人 | 候梯 平均%s P95 %s | 行程 平均%s P95 %s | 利用率 %.1f%% | 用时%.2fs" % (
+        args.workload, metrics["passengers_generated"], metrics["passengers_delivered"],
+        benchmark.format_seconds(metrics["wait_avg"]), benchmark.format_seconds(metrics["wait_p95"]),
+        benchmark.format_seconds(metrics["journey_avg"]), benchmark.format_seconds(metrics["journey_p95"]),
+        metrics["car_utilization_avg"] * 100, metrics["run_seconds"]))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+def replay(args):
+    '''
+    在模拟器中重放轨迹文件，打印外部请求的等待时间
+    '''
+    import call_trace
+
+    sim = call_trace.replay(args.trace, args.speed, move_time=args.move_time, door_time=args.door_time,
+                            strategy=args.strategy)
+    waits = [task.finished_time - task.created_time for task in sim.finished_tasks]
+    print("模拟时长 %.1fs，处理事件 %d 个，完成外部请求 %d 个，平均等待 %.1fs" % (
+        sim.now / 1000, sim.event_count, len(waits), sum(waits) / len(waits) / 1000 if waits else 0))
+    return 0
+
+
+def add_timing_arguments(parser):
+    parser.add_argument("-m", "--move-time", type=int, default=MOVE_TIME, help="移动一层的时间（毫秒）")
+    parser.add_argument("--door-time", type=int, default=DOOR_OPEN_AND_CLOSE_TIME, help="开关门时间（毫秒）")
+    parser.add_argument("-s", "--strategy", choices=sorted(dispatch.STRATEGIES),
+                        help="外部任务的分配策略，默认eta（simulate --vectorized时为nearest）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli", description="无界面的电梯调度模拟")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    simulate_parser = commands.add_parser("simulate", help="生成客流并运行模拟")
+    simulate_parser.add_argument("-w", "--workload", default="up_peak",
+                                 choices=sorted(set(benchmark.WORKLOADS) | set(traffic.PROFILES)),
+                                 help="基准客流名称或客流模式")
+    simulate_parser.add_argument("-t", "--duration", type=float, default=None, help="客流持续时间（秒）")
+    simulate_parser.add_argument("-r", "--rate", type=float, default=None, help="每分钟到达的乘客数")
+    simulate_parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    simulate_parser.add_argument("-e", "--elevators", type=int, default=ELEVATOR_NUM, help="电梯数量")
+    simulate_parser.add_argument("-f", "--floors", type=int, default=FLOOR_NUM, help="楼层数")
+    add_timing_arguments(simulate_parser)
+    simulate_parser.add_argument("-d", "--destination", action="store_true", help="目的楼层分配模式")
+    simulate_parser.add_argument("-c", "--capacity", type=int, default=CAR_CAPACITY, help="轿厢额定载客人数，0表示不限")
+    simulate_parser.add_argument("--vectorized", action="store_true", help="使用numpy批量打分（仅nearest）")
+    simulate_parser.add_argument("-o", "--output", help="把指标写入JSON文件")
+    simulate_parser.set_defaults(handler=simulate)
+
+    replay_parser = commands.add_parser("replay", help="重放 main.py --record 录下的轨迹")
+    replay_parser.add_argument("trace", help="轨迹文件")
+    replay_parser.add_argument("-x", "--speed", type=float, default=None, help="相对实时的加速倍数，默认尽快完成")
+    add_timing_arguments(replay_parser)
+    replay_parser.set_defaults(handler=replay)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,418 @@
+import elevator_core
+from elevator_core import FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, ELEVATOR_STATE, MOVE_STATE, OuterTask, \
+    TargetSet
+
+
+class DispatchStrategy:
+    """
+    外部任务的分配策略
+    输入为各电梯状态的快照（状态、楼层、扫描方向、上行/下行目标）与一个待分配的外部任务，输出电梯编号；
+    界面的outer线程与离散事件模拟器都通过 choose 调用，快照的含义与 elevator_core.find_best_elevator 相同
+    """
+    name = None
+
+    def choose(self, outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+               elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        '''
+        选出负责outer_task的电梯
+        :return: 电梯编号，没有可用电梯时为-1
+        '''
+        raise NotImplementedError
+
+
+class NearestCar(DispatchStrategy):
+    """
+    原有的最近电梯规则（elevator_core.find_best_elevator）
+    """
+    name = "nearest"
+
+    def choose(self, outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+               elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        return elevator_core.find_best_elevator(outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+                                                elevator_up_target_list, elevator_down_target_list, floor_num)
+
+
+def start_floor(state, cur_floor):
+    '''
+    已经上行/下行的电梯视为已在下一层
+    '''
+    if state == ELEVATOR_STATE.UP:
+        return cur_floor + 1
+    elif state == ELEVATOR_STATE.DOWN:
+        return cur_floor - 1
+    return cur_floor
+
+
+def target_bounds(targets):
+    '''
+    :param targets: 目标楼层（TargetSet或列表）
+    :return: (最低, 最高) 的目标楼层
+    '''
+    if isinstance(targets, TargetSet):
+        return targets.lowest(), targets.highest()
+    return min(targets), max(targets)
+
+
+def count_stops(targets, low, high):
+    '''
+    :param targets: 目标楼层（TargetSet或列表）
+    :return: 位于[low, high]层之间的目标数，TargetSet为O(log 楼层数)
+    '''
+    if isinstance(targets, TargetSet):
+        return targets.count_between(low, high)
+    return sum(1 for target in targets if low <= target <= high)
+
+
+def sweep_route(origin, move_state, up_targets, down_targets, outer_task, at_stop=False):
+    '''
+    电梯按LOOK方式（走到当前方向最远的目标再换向）扫描，直到以outer_task要求的方向经过其楼层
+    只用目标集合的最低/最高楼层与各段楼层内的目标数，不逐个遍历目标
+    :param origin: 出发楼层
+    :param move_state: 电梯当前的扫描方向
+    :param up_targets: 上行目标（升序）
+    :param down_targets: 下行目标（降序）
+    :param outer_task: 外部任务
+    :param at_stop: 电梯正在origin层开关门（这一站仍在扫描方向的目标中，不再计为途中停靠）
+    :return: (经过的楼层数, 途中需要停靠的目标数)
+    '''
+    floor = outer_task.floor
+    if not up_targets and not down_targets:
+        return abs(origin - floor), 0
+    highest = max(origin, floor)
+    lowest = min(origin, floor)
+    for targets in (up_targets, down_targets):
+        if targets:
+            low, high = target_bounds(targets)
+            lowest = min(lowest, low)
+            highest = max(highest, high)
+
+    # 依次列出扫描路线的各段：(起点, 终点, 方向)
+    if move_state == MOVE_STATE.UP:
+        legs = [(origin, highest, MOVE_STATE.UP), (highest, lowest, MOVE_STATE.DOWN), (lowest, floor, MOVE_STATE.UP)]
+    else:
+        legs = [(origin, lowest, MOVE_STATE.DOWN), (lowest, highest, MOVE_STATE.UP), (highest, floor, MOVE_STATE.DOWN)]
+
+    distance = 0
+    stops = 0
+    for index, (begin, end, direction) in enumerate(legs):
+        # outer_task在这一段上，且方向一致（或恰好位于换向点）时，到达后结束
+        reached = min(begin, end) <= floor <= max(begin, end) and (direction == outer_task.move_state or floor == end)
+        if reached:
+            end = floor
+        low, high = min(begin, end), max(begin, end)
+        targets = up_targets if direction == MOVE_STATE.UP else down_targets
+        stops += count_stops(targets, low, high)
+        # 不计入途中停靠的楼层：到达时的这一站就是outer_task本身，正在开关门的这一站已单独计时
+        skipped = set()
+        if reached:
+            skipped.add(floor)
+        if index == 0 and at_stop:
+            skipped.add(origin)
+        stops -= sum(1 for target in skipped if target in targets)
+        distance += high - low
+        if reached:
+            break
+    return distance, stops
+
+
+class LookCollective(DispatchStrategy):
+    """
+    LOOK集选控制：沿电梯的扫描路线计算到达外部任务的距离，
+    与最近电梯规则不同，反向或已经错过的请求按完整的扫描路线计距离，不会出现分配不出去的情况
+    """
+    name = "look"
+
+    def cost(self, outer_task, state, cur_floor, move_state, up_targets, down_targets):
+        distance, _ = sweep_route(start_floor(state, cur_floor), move_state, up_targets, down_targets, outer_task)
+        return distance
+
+    def choose(self, outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+               elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        target_id = -1
+        min_cost = None
+        for i in range(len(elevator_states)):
+            if elevator_states[i] == ELEVATOR_STATE.FAULT:
+                continue
+            cost = self.cost(outer_task, elevator_states[i], elevator_cur_floor[i], elevator_move_states[i],
+                             elevator_up_target_list[i], elevator_down_target_list[i])
+            if min_cost is None or cost < min_cost:
+                min_cost = cost
+                target_id = i
+        return target_id
+
+
+class EtaMinimizing(LookCollective):
+    """
+    最短预计到达时间：沿LOOK扫描路线模拟电梯已承诺的停靠（上行/下行目标），
+    每经过一层计MOVE_TIME，途中每一次停靠计一次开关门时间；
+    目标集合（TargetSet）在加入、完成停靠时增量维护各楼层的停靠数，估计一台电梯只需O(log 楼层数)
+    """
+    name = "eta"
+
+    def __init__(self, move_time=MOVE_TIME, door_time=DOOR_OPEN_AND_CLOSE_TIME):
+        """
+        :param move_time: 移动一层所需时间（毫秒）
+        :param door_time: 一次开关门所需时间（毫秒）
+        """
+        self.move_time = move_time
+        self.door_time = door_time
+
+    def cost(self, outer_task, state, cur_floor, move_state, up_targets, down_targets):
+        at_stop = state == ELEVATOR_STATE.DOOR
+        distance, stops = sweep_route(start_floor(state, cur_floor), move_state, up_targets, down_targets,
+                                      outer_task, at_stop)
+        eta = distance * self.move_time + stops * self.door_time
+        # 正在开关门的电梯要先完成这一次开关门
+        if at_stop:
+            eta += self.door_time
+        return eta
+
+
+def copy_targets(targets):
+    return targets.copy() if isinstance(targets, TargetSet) else list(targets)
+
+
+def add_target(targets, floor):
+    if isinstance(targets, TargetSet):
+        targets.add(floor)
+    elif floor not in targets:
+        targets.append(floor)
+
+
+def min_cost_assignment(cost):
+    '''
+    匈牙利算法（带势能的最短增广路，O(n²m)）求最小代价的一一匹配
+    :param cost: n×m的代价矩阵，n <= m
+    :return: 长度为n的列表，第i行匹配的列号
+    '''
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    # 行/列的势能，p[j]为匹配到第j列的行（均从1开始编号，0为虚拟节点）
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        min_v = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = row[j - 1] - u[i0] - v[j]
+                    if reduced < min_v[j]:
+                        min_v[j] = reduced
+                        way[j] = j0
+                    if min_v[j] < delta:
+                        delta = min_v[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # 沿增广路翻转匹配
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    result = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            result[p[j] - 1] = j - 1
+    return result
+
+
+class BatchOptimal(EtaMinimizing):
+    """
+    批量最优分配：把所有等待分配的外部任务一起分配，使预计到达时间之和最小
+    每一轮以 任务×电梯 的预计到达时间为代价求最小代价匹配（每台电梯最多分到一个任务），
+    把本轮分到的楼层计入电梯的目标后，对剩余任务再进行下一轮，直到全部分配或没有电梯可以接受
+    """
+    name = "batch"
+    # 无法分配（电梯故障、正驶离该层）的代价
+    UNAVAILABLE = 10 ** 12
+
+    def assign_batch(self, outer_tasks, elevator_states, elevator_cur_floor, elevator_move_states,
+                     elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        '''
+        一次为多个外部任务选出电梯
+        :param outer_tasks: 等待分配的外部任务列表
+        :return: 与outer_tasks对应的电梯编号列表，无法分配的为-1
+        '''
+        elevator_num = len(elevator_states)
+        # 本批次内已分到的楼层也计入目标（只在本函数内修改副本）
+        up_targets = [copy_targets(targets) for targets in elevator_up_target_list]
+        down_targets = [copy_targets(targets) for targets in elevator_down_target_list]
+        result = [-1] * len(outer_tasks)
+        remaining = list(range(len(outer_tasks)))
+        while remaining:
+            cost = []
+            for task_index in remaining:
+                outer_task = outer_tasks[task_index]
+                row = []
+                for i in range(elevator_num):
+                    if elevator_states[i] == ELEVATOR_STATE.FAULT or elevator_core.choose_target_queue(
+                            elevator_cur_floor[i], elevator_states[i], outer_task) is None:
+                        row.append(self.UNAVAILABLE)
+                    else:
+                        row.append(self.cost(outer_task, elevator_states[i], elevator_cur_floor[i],
+                                             elevator_move_states[i], up_targets[i], down_targets[i]))
+                cost.append(row)
+            if len(remaining) <= elevator_num:
+                pairs = [(row, column) for row, column in enumerate(min_cost_assignment(cost))]
+            else:
+                # 任务多于电梯：转置后每台电梯分到一个任务，其余任务留到下一轮
+                transposed = [list(column) for column in zip(*cost)]
+                pairs = [(row, column) for column, row in enumerate(min_cost_assignment(transposed))]
+            assigned = set()
+            for row, elevator_id in pairs:
+                if cost[row][elevator_id] >= self.UNAVAILABLE:
+                    continue
+                task_index = remaining[row]
+                outer_task = outer_tasks[task_index]
+                result[task_index] = elevator_id
+                assigned.add(task_index)
+                if elevator_core.choose_target_queue(elevator_cur_floor[elevator_id], elevator_states[elevator_id],
+                                                     outer_task, elevator_move_states[elevator_id],
+                                                     up_targets[elevator_id], down_targets[elevator_id]):
+                    add_target(down_targets[elevator_id], outer_task.floor)
+                else:
+                    add_target(up_targets[elevator_id], outer_task.floor)
+            if not assigned:
+                break
+            remaining = [task_index for task_index in remaining if task_index not in assigned]
+        return result
+
+
+class RoundRobin(DispatchStrategy):
+    """
+    轮流分配：依次把外部任务交给下一台未故障的电梯（用作比较的基线）
+    """
+    name = "round_robin"
+
+    def __init__(self):
+        self.next_id = 0
+
+    def choose(self, outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+               elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        elevator_num = len(elevator_states)
+        for offset in range(elevator_num):
+            i = (self.next_id + offset) % elevator_num
+            if elevator_states[i] != ELEVATOR_STATE.FAULT:
+                self.next_id = (i + 1) % elevator_num
+                return i
+        return -1
+
+
+class DestinationGrouping:
+    """
+    目的楼层分配（乘客在候梯厅输入目的楼层）：
+    乘客登记时立即分配电梯，代价为电梯到达出发楼层的预计时间，加上为该乘客新增停靠的开关门时间，
+    再加上已分配给该电梯、尚未上车的乘客因此多等的时间（新的停靠可能让电梯先去更远处再折返）；
+    与已分配乘客同一出发楼层或同一目的楼层时不产生新的停靠，因此同去一层的乘客倾向于集中到同一台电梯
+    """
+
+    def __init__(self, move_time=MOVE_TIME, door_time=DOOR_OPEN_AND_CLOSE_TIME):
+        """
+        :param move_time: 移动一层所需时间（毫秒）
+        :param door_time: 一次开关门所需时间（毫秒）
+        """
+        self.eta = EtaMinimizing(move_time, door_time)
+        self.door_time = door_time
+
+    def added_delay(self, passenger, waiting, state, cur_floor, move_state, up_targets, down_targets):
+        '''
+        :param waiting: 已分配给该电梯、尚未上车的乘客
+        :return: 加入passenger的出发楼层与目的楼层后，waiting中乘客预计到达时间增加的总和（毫秒）
+        '''
+        new_up_targets = copy_targets(up_targets)
+        new_down_targets = copy_targets(down_targets)
+        # 与 Simulation.add_pickup 相同：出发楼层按相对电梯的位置加入，目的楼层按乘客的方向加入
+        if passenger.origin > cur_floor:
+            add_target(new_up_targets, passenger.origin)
+        elif passenger.origin < cur_floor:
+            add_target(new_down_targets, passenger.origin)
+        if passenger.move_state == MOVE_STATE.UP:
+            add_target(new_up_targets, passenger.destination)
+        else:
+            add_target(new_down_targets, passenger.destination)
+        delay = 0
+        for other in waiting:
+            pickup = OuterTask(other.origin, other.move_state)
+            delay += self.eta.cost(pickup, state, cur_floor, move_state, new_up_targets, new_down_targets) - \
+                self.eta.cost(pickup, state, cur_floor, move_state, up_targets, down_targets)
+        return delay
+
+    def choose(self, passenger, elevator_states, elevator_cur_floor, elevator_move_states,
+               elevator_up_target_list, elevator_down_target_list, elevator_passengers):
+        '''
+        为登记了目的楼层的乘客选择电梯
+        :param passenger: 乘客（elevator_core.Passenger）
+        :param elevator_passengers: 每台电梯已分配（含已在车内）的乘客列表，尚未上车的乘客board_time为None
+        :return: 电梯编号，没有可用电梯时为-1
+        '''
+        pickup = OuterTask(passenger.origin, passenger.move_state)
+        target_id = -1
+        min_cost = None
+        for i in range(len(elevator_states)):
+            if elevator_states[i] == ELEVATOR_STATE.FAULT:
+                continue
+            up_targets, down_targets = elevator_up_target_list[i], elevator_down_target_list[i]
+            cost = self.eta.cost(pickup, elevator_states[i], elevator_cur_floor[i], elevator_move_states[i],
+                                 up_targets, down_targets)
+            committed = elevator_passengers[i]
+            new_stops = 0
+            if passenger.origin not in up_targets and passenger.origin not in down_targets and \
+                    all(other.origin != passenger.origin for other in committed):
+                new_stops += 1
+            if passenger.destination not in up_targets and passenger.destination not in down_targets and \
+                    all(other.destination != passenger.destination for other in committed):
+                new_stops += 1
+            cost += new_stops * self.door_time
+            waiting = [other for other in committed if other.board_time is None]
+            if waiting:
+                cost += self.added_delay(passenger, waiting, elevator_states[i], elevator_cur_floor[i],
+                                         elevator_move_states[i], up_targets, down_targets)
+            if min_cost is None or cost < min_cost:
+                min_cost = cost
+                target_id = i
+        return target_id
+
+
+STRATEGIES = {strategy.name: strategy for strategy in
+              (NearestCar, LookCollective, EtaMinimizing, BatchOptimal, RoundRobin)}
+
+
+def default_strategy(vectorized=False):
+    '''
+    未指定分配策略时使用的策略名称：eta；numpy批量打分只支持nearest
+    :param vectorized: 是否使用numpy批量打分
+    :return: STRATEGIES中的名称
+    '''
+    return NearestCar.name if vectorized else EtaMinimizing.name
+
+
+def make_strategy(name, move_time=MOVE_TIME, door_time=DOOR_OPEN_AND_CLOSE_TIME):
+    '''
+    按名称创建分配策略
+    :param name: STRATEGIES中的名称
+    :param move_time: 移动一层所需时间（毫秒），仅eta、batch使用
+    :param door_time: 一次开关门所需时间（毫秒），仅eta、batch使用
+    :return: DispatchStrategy
+    '''
+    if name not in STRATEGIES:
+        raise ValueError("未知的分配策略 %r，可选 %s" % (name, ", ".join(STRATEGIES)))
+    if issubclass(STRATEGIES[name], EtaMinimizing):
+        return STRATEGIES[name](move_time, door_time)
+    return STRATEGIES[name]()
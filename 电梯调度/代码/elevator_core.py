@@ -0,0 +1,817 @@
+import bisect
+import sys
+from collections import deque
+from enum import Enum
+
+# 常量
+ELEVATOR_NUM = 5  # 电梯数量
+FLOOR_NUM = 20  # 电梯层数
+MOVE_TIME = 1000  # 上升下降时间
+DOOR_OPEN_AND_CLOSE_TIME = 2000  # 电梯开关门时间
+CAR_CAPACITY = 13  # 轿厢额定载客人数（仅模拟时使用）
+TRANSFER_TIME = 1000  # 每位乘客进出电梯所需时间（仅模拟时使用）
+
+
+# 电梯的状态
+class ELEVATOR_STATE(Enum):
+    DOWN = -1
+    NORMAL = 0
+    UP = 1
+    FAULT = 2
+    DOOR = 3
+
+# 电梯的移动状态
+class MOVE_STATE(Enum):
+    UP = 1
+    DOWN = -1
+
+# 外部按钮产生的任务的分配状态
+class TASK_STATE(Enum):
+    UNASSIGNED = 0
+    WAITING = 1
+    FINISHED = 2
+
+
+class OuterTask:
+    '''
+    外部请求的封装，同一楼层同一方向的请求视为相等（按(floor, move_state)比较与哈希）
+    :target_floor:目标楼层
+    :move_state:运动状态
+    :task_state：任务状态
+    :created_time：请求产生的时刻（毫秒，仅模拟时使用）
+    '''
+
+    def __init__(self, target_floor, move_state, state=TASK_STATE.UNASSIGNED, created_time=0):
+        self.floor = target_floor  # 目标楼层
+        self.move_state = move_state  # 需要的电梯运行方向
+        self.task_state = state  # 是否完成（默认未完成）
+        self.created_time = created_time  # 按下按钮的时刻
+        self.assigned_time = None  # 首次分配到电梯的时刻
+        self.finished_time = None  # 完成的时刻
+        self.elevator_id = None  # 负责该任务的电梯
+        self.descending = None  # 加入了该电梯的上行目标(False)还是下行目标(True)
+
+    @property
+    def key(self):
+        return self.floor, self.move_state
+
+    def __eq__(self, other):
+        if not isinstance(other, OuterTask):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+class Passenger:
+    '''
+    乘客（仅模拟时使用）
+    :origin:出发楼层
+    :destination:目的楼层
+    :arrival_time：到达出发楼层、按下外部按钮的时刻（毫秒）
+    '''
+
+    def __init__(self, origin, destination, arrival_time=0):
+        self.origin = origin  # 出发楼层
+        self.destination = destination  # 目的楼层
+        self.arrival_time = arrival_time  # 到达候梯厅的时刻
+        self.board_time = None  # 进入电梯的时刻
+        self.alight_time = None  # 到达目的楼层的时刻
+        self.elevator_id = None  # 乘坐的电梯
+
+    @property
+    def move_state(self):
+        return MOVE_STATE.UP if self.destination > self.origin else MOVE_STATE.DOWN
+
+    def __repr__(self):
+        return "Passenger(%d->%d @%d)" % (self.origin, self.destination, self.arrival_time)
+
+
+class TargetSet:
+    """
+    电梯的上行/下行目标楼层集合
+    按停靠顺序排列（上行升序、下行降序），二分插入；
+    另用一个长度为楼层数的字节表判断楼层是否已在集合中，取出下一站为O(1)；
+    加入/取出时同步维护按楼层的树状数组，预计到达时间可以O(log 楼层数)统计一段楼层内的停靠数
+    """
+
+    def __init__(self, descending=False, floor_num=FLOOR_NUM):
+        """
+        :param descending: False为上行目标（升序），True为下行目标（降序）
+        :param floor_num: 楼层数
+        """
+        self.descending = descending
+        # 内部按键值升序保存，下一站位于列表末尾：上行存-floor，下行存floor
+        self.keys = []
+        self.bitmap = bytearray(floor_num)
+        self.counts = [0] * (floor_num + 1)  # 树状数组，下标为楼层+1
+
+    def key(self, floor):
+        return floor if self.descending else -floor
+
+    def floor(self, key):
+        return key if self.descending else -key
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, floor):
+        return self.bitmap[floor] == 1
+
+    def __iter__(self):
+        # 按停靠顺序
+        return (self.floor(key) for key in reversed(self.keys))
+
+    def __getitem__(self, index):
+        # [0]为下一站，[-1]为最远的一站
+        if index < 0:
+            index += len(self.keys)
+        return self.floor(self.keys[len(self.keys) - 1 - index])
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def lowest(self):
+        return self.floor(self.keys[0 if self.descending else -1])
+
+    def highest(self):
+        return self.floor(self.keys[-1 if self.descending else 0])
+
+    def update_count(self, floor, delta):
+        index = floor + 1
+        while index < len(self.counts):
+            self.counts[index] += delta
+            index += index & -index
+
+    def count_below(self, floor):
+        """
+        :return: 低于floor层（不含）的目标数
+        """
+        count = 0
+        index = min(max(floor, 0), len(self.counts) - 1)
+        while index:
+            count += self.counts[index]
+            index -= index & -index
+        return count
+
+    def count_between(self, low, high):
+        """
+        :return: 位于[low, high]层之间的目标数
+        """
+        if low > high:
+            return 0
+        return self.count_below(high + 1) - self.count_below(low)
+
+    def add(self, floor):
+        """
+        加入一个目标楼层
+        :return: 是否为新的目标楼层
+        """
+        if self.bitmap[floor]:
+            return False
+        self.bitmap[floor] = 1
+        bisect.insort(self.keys, self.key(floor))
+        self.update_count(floor, 1)
+        return True
+
+    def discard(self, floor):
+        """
+        删除一个目标楼层
+        :return: 该楼层原先是否在集合中
+        """
+        if not self.bitmap[floor]:
+            return False
+        self.bitmap[floor] = 0
+        del self.keys[bisect.bisect_left(self.keys, self.key(floor))]
+        self.update_count(floor, -1)
+        return True
+
+    def pop(self):
+        """
+        取出下一站
+        """
+        floor = self.floor(self.keys.pop())
+        self.bitmap[floor] = 0
+        self.update_count(floor, -1)
+        return floor
+
+    def clear(self):
+        for key in self.keys:
+            self.bitmap[self.floor(key)] = 0
+        self.keys.clear()
+        self.counts = [0] * len(self.counts)
+
+    def copy(self):
+        """
+        :return: 内容相同的新集合（分配时在副本上试加目标）
+        """
+        target_set = TargetSet(self.descending, len(self.bitmap))
+        target_set.keys = list(self.keys)
+        target_set.bitmap = bytearray(self.bitmap)
+        target_set.counts = list(self.counts)
+        return target_set
+
+
+class HallCallQueue:
+    """
+    外部请求队列
+    按钮处理函数与故障处理把待分配的任务放入队列，outer线程从中取出分配；
+    尚未完成的任务以(floor, move_state)为键保存在dict中（保持插入顺序），
+    重复按下同一按钮会被合并，因此队列中最多有2×楼层数个任务，完成时O(1)删除；
+    另按电梯索引已分配的任务，电梯停靠与故障时只处理分配给自己的任务
+    """
+
+    def __init__(self):
+        self.tasks = {}  # 尚未完成的外部任务：(floor, move_state) -> OuterTask
+        self.unassigned = deque()  # 等待分配的任务
+        self.assignments = {}  # 电梯编号 -> {(floor, move_state): 分配给该电梯的OuterTask}
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks.values())
+
+    def __contains__(self, task):
+        return task.key in self.tasks
+
+    def get(self, floor, move_state):
+        """
+        查找某楼层某方向尚未完成的任务
+        :return: 外部任务，没有时为None
+        """
+        return self.tasks.get((floor, move_state))
+
+    def push(self, task):
+        """
+        加入一个新的外部任务，已有相同楼层相同方向的任务时合并
+        :param task: 外部任务
+        :return: 是否为新的任务
+        """
+        if task.key in self.tasks:
+            return False
+        task.task_state = TASK_STATE.UNASSIGNED
+        self.tasks[task.key] = task
+        self.unassigned.append(task)
+        return True
+
+    def requeue(self, task):
+        """
+        任务重新等待分配（电梯故障，或本轮未能分配）
+        :param task: 外部任务
+        """
+        self.unassign(task)
+        task.task_state = TASK_STATE.UNASSIGNED
+        self.unassigned.append(task)
+
+    def assign(self, task, elevator_id, descending):
+        """
+        任务分配到电梯，记入该电梯的索引
+        :param task: 外部任务
+        :param elevator_id: 电梯编号
+        :param descending: 任务所在楼层加入了电梯的下行目标(True)还是上行目标(False)
+        """
+        self.unassign(task)
+        task.task_state = TASK_STATE.WAITING
+        task.elevator_id = elevator_id
+        task.descending = descending
+        self.assignments.setdefault(elevator_id, {})[task.key] = task
+
+    def unassign(self, task):
+        """
+        从负责电梯的索引中删除任务
+        """
+        if task.elevator_id is None:
+            return
+        assigned = self.assignments.get(task.elevator_id)
+        if assigned is not None and assigned.get(task.key) is task:
+            del assigned[task.key]
+        task.elevator_id = None
+        task.descending = None
+
+    def assigned_to(self, elevator_id):
+        """
+        :return: 分配给该电梯、尚未完成的任务列表
+        """
+        return list(self.assignments.get(elevator_id, {}).values())
+
+    def finish_stop(self, elevator_id, floor, move_state, up_targets, down_targets):
+        """
+        电梯在floor层完成一次停靠，只完成与电梯离开方向相同的请求，乘客不会搭上反方向运行的电梯：
+        分配给本电梯、方向与到达时的扫描方向相同的请求总是完成（乘客上车后按下的目的楼层让电梯继续该方向）；
+        否则按 departing_directions 的方向完成该层的请求（优先本电梯的，其次是分配给别的电梯或尚未分配的）；
+        分配给本电梯、方向相反的请求仍由本电梯负责，该层重新加入折返后的目标
+        :param elevator_id: 电梯编号
+        :param floor: 停靠的楼层
+        :param move_state: 电梯到达时的扫描方向
+        :param up_targets: 本电梯的上行目标（已取出这一站）
+        :param down_targets: 本电梯的下行目标（已取出这一站）
+        :return: 完成的任务列表（最多一个）
+        """
+        assigned = self.assignments.get(elevator_id, {})
+        candidates = [assigned.get((floor, move_state))]
+        departing = departing_directions(move_state, up_targets, down_targets)
+        candidates += [assigned.get((floor, direction)) for direction in departing]
+        candidates += [self.tasks.get((floor, direction)) for direction in departing]
+        finished = []
+        for task in candidates:
+            if task is not None:
+                self.finish(task)
+                finished.append(task)
+                break
+        # 剩下的只可能是与到达方向相反的请求，加入另一个目标集合不会让电梯在本层再次停靠
+        for direction in MOVE_STATE:
+            task = assigned.get((floor, direction))
+            if task is not None:
+                task.descending = direction == MOVE_STATE.DOWN
+                (down_targets if task.descending else up_targets).add(floor)
+        return finished
+
+    def release(self, elevator_id):
+        """
+        电梯故障：分配给它的任务全部重新等待分配
+        :return: 重新等待分配的任务列表
+        """
+        tasks = self.assigned_to(elevator_id)
+        for task in tasks:
+            self.requeue(task)
+        return tasks
+
+    def pop(self):
+        """
+        取出一个等待分配的任务，已被分配或已完成的任务直接跳过
+        :return: 外部任务，没有时为None
+        """
+        while self.unassigned:
+            task = self.unassigned.popleft()
+            if task.task_state == TASK_STATE.UNASSIGNED and self.tasks.get(task.key) is task:
+                return task
+        return None
+
+    def finish(self, task):
+        """
+        任务完成，从队列中删除
+        :param task: 外部任务
+        """
+        self.unassign(task)
+        task.task_state = TASK_STATE.FINISHED
+        if self.tasks.get(task.key) is task:
+            del self.tasks[task.key]
+
+
+def find_best_elevator(outer_task, elevator_states, elevator_cur_floor, elevator_move_states,
+                       elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+    '''
+    找到距离最近的电梯编号（GUI线程与离散事件模拟共用同一套规则）
+    :param outer_task: 外界点击所产生的任务
+    :param elevator_states: 每台电梯的状态
+    :param elevator_cur_floor: 每台电梯的当前楼层
+    :param elevator_move_states: 每台电梯的扫描方向
+    :param elevator_up_target_list: 每台电梯的上行目标（升序的TargetSet或列表）
+    :param elevator_down_target_list: 每台电梯的下行目标（降序的TargetSet或列表）
+    :param floor_num: 楼层数
+    :return: 电梯编号，没有可用电梯时为-1
+    '''
+    min_distance = floor_num + 1
+    # 初始化分配电梯
+    target_id = -1
+    # 依次访问每一个电梯
+    for i in range(len(elevator_states)):
+        # 如果电梯处于故障状态，则跳过它
+        if elevator_states[i] == ELEVATOR_STATE.FAULT:
+            continue
+
+        # 如果已经上行/下行了，则上/下移动一层
+        origin = elevator_cur_floor[i]
+        if elevator_states[i] == ELEVATOR_STATE.UP:
+            origin += 1
+        elif elevator_states[i] == ELEVATOR_STATE.DOWN:
+            origin -= 1
+
+        if elevator_move_states[i] == MOVE_STATE.UP:
+            targets = elevator_up_target_list[i]
+        else:  # down
+            targets = elevator_down_target_list[i]
+
+        # 根据到outer_task的距离计算优先级
+        # 如果电梯运行方向无任务，则直接算绝对值
+        if not targets:
+            distance = abs(origin - outer_task.floor)
+        # 若电梯朝着按键所在楼层运行，且运动方向与外部请求相同
+        elif elevator_move_states[i] == outer_task.move_state and (
+                (outer_task.move_state == MOVE_STATE.UP and outer_task.floor >= origin) or
+                (outer_task.move_state == MOVE_STATE.DOWN and outer_task.floor <= origin)):
+            distance = abs(origin - outer_task.floor)
+        # 其余情况则算最远任务楼层到目标楼层的绝对值和最远楼层到当前电梯楼层的绝对值之和
+        else:
+            distance = abs(origin - targets[-1]) + abs(outer_task.floor - targets[-1])
+
+        # 寻找最小值
+        if distance < min_distance:
+            min_distance = distance
+            target_id = i
+
+    return target_id
+
+
+def choose_target_queue(cur_floor, elevator_state, outer_task, move_state=None, up_targets=None, down_targets=None):
+    '''
+    判断外部任务应当加入电梯的上行队列还是下行队列
+    :param cur_floor: 电梯当前楼层
+    :param elevator_state: 电梯当前状态
+    :param outer_task: 外部任务
+    :param move_state: 电梯的扫描方向（与两个目标集合一起给出时，反向请求直接加入折返后的队列）
+    :param up_targets: 电梯的上行目标
+    :param down_targets: 电梯的下行目标
+    :return: False表示上行队列，True表示下行队列，None表示暂时无法加入
+    '''
+    # 若该电梯恰好在对应请求楼层，但运行状态与需求状态不同
+    # 或该电梯还未到达该层
+    if (cur_floor == outer_task.floor and outer_task.move_state == MOVE_STATE.UP
+        and elevator_state != ELEVATOR_STATE.UP) or cur_floor < outer_task.floor:
+        descending = False
+    elif (cur_floor == outer_task.floor and outer_task.move_state == MOVE_STATE.DOWN
+          and elevator_state != ELEVATOR_STATE.DOWN) or cur_floor > outer_task.floor:
+        descending = True
+    else:
+        return None
+    if move_state is None:
+        return descending
+    # 上方的下行请求：电梯正在上行、且要到更高的楼层才折返时，在折返后的下行途中停靠，上行经过时不停
+    if not descending and outer_task.move_state == MOVE_STATE.DOWN and cur_floor < outer_task.floor:
+        if move_state == MOVE_STATE.UP and up_targets and up_targets[-1] > outer_task.floor:
+            return True
+    # 下方的上行请求同理
+    if descending and outer_task.move_state == MOVE_STATE.UP and cur_floor > outer_task.floor:
+        if move_state == MOVE_STATE.DOWN and down_targets and down_targets[-1] < outer_task.floor:
+            return False
+    return descending
+
+
+def departing_directions(move_state, up_targets, down_targets):
+    '''
+    电梯在某层停靠完成（已取出该站）后离开时可能的运行方向
+    :param move_state: 电梯的扫描方向
+    :param up_targets: 上行目标
+    :param down_targets: 下行目标
+    :return: 运行方向的元组：继续扫描或换向时只有一个方向，空闲时两个方向都可以（扫描方向优先）
+    '''
+    if move_state == MOVE_STATE.UP:
+        if up_targets:
+            return MOVE_STATE.UP,
+        if down_targets:
+            return MOVE_STATE.DOWN,
+        return MOVE_STATE.UP, MOVE_STATE.DOWN
+    if down_targets:
+        return MOVE_STATE.DOWN,
+    if up_targets:
+        return MOVE_STATE.UP,
+    return MOVE_STATE.DOWN, MOVE_STATE.UP
+
+
+def add_task_to_queue(target_queue, out_task):
+    '''
+    将任务所在楼层加入电梯的目标（任务本身由 HallCallQueue.assign 记入该电梯的索引）
+    楼层已在目标中时电梯同样会在该层停靠，任务同样由该电梯负责
+    :param target_queue: 电梯的上行/下行目标（TargetSet）
+    :param out_task: 产生的任务
+    :return: 是否加入了新的目标楼层
+    '''
+    return target_queue.add(out_task.floor)
+
+
+# 电梯在当前楼层开关门（ElevatorGroup.next_action 的返回值之一，另两种为 MOVE_STATE.UP/DOWN）
+DOOR = "door"
+
+
+class ElevatorGroup:
+    """
+    一组电梯的状态与不依赖计时方式的控制规则，离散事件模拟器（simulation.Simulation）
+    与asyncio控制器（async_core.AsyncElevatorSystem）共用：
+    扫描（next_action）、开门后完成停靠（door_opened）、乘客进出与载客量、故障处理以及外部任务分配；
+    子类负责计时：提供 current_time，在动作开始/完成时调用这里的方法
+    """
+
+    def __init__(self, elevator_num, floor_num, move_time, door_time, strategy, capacity, transfer_time):
+        """
+        :param elevator_num: 电梯数量
+        :param floor_num: 楼层数
+        :param move_time: 移动一层所需时间（毫秒）
+        :param door_time: 一次开关门所需时间（毫秒）
+        :param strategy: 外部任务的分配策略（dispatch.DispatchStrategy 对象）
+        :param capacity: 每台电梯最多容纳的乘客数，None表示不限；满载的电梯不参与分配
+        :param transfer_time: 每位乘客进出电梯所需时间（毫秒），开关门后电梯按进出人数多停留
+        """
+        self.elevator_num = elevator_num
+        self.floor_num = floor_num
+        self.move_time = move_time
+        self.door_time = door_time
+        self.strategy = strategy
+        self.capacity = capacity
+        self.transfer_time = transfer_time
+
+        # 与 main.py 中的全局变量一一对应
+        self.elevator_up_target_list = [TargetSet(floor_num=floor_num) for _ in range(elevator_num)]
+        self.elevator_down_target_list = [TargetSet(descending=True, floor_num=floor_num) for _ in range(elevator_num)]
+        self.outer_tasks_queue = HallCallQueue()
+        self.elevator_states = [ELEVATOR_STATE.NORMAL for _ in range(elevator_num)]
+        self.elevator_cur_floor = [0 for _ in range(elevator_num)]
+        self.elevator_move_states = [MOVE_STATE.UP for _ in range(elevator_num)]
+
+        # 行程：电梯从出发到空闲或换向为一趟（与 metrics.ControllerMetrics 相同），记录每趟的停靠次数
+        self.elevator_trip_stops = [0 for _ in range(elevator_num)]
+        self.trips_total = 0
+        self.stops_total = 0
+
+        # 乘客：在候梯厅等待的（按(floor, move_state)分组）、电梯内的、已到达目的楼层的
+        self.waiting_passengers = {}
+        self.riding_passengers = [[] for _ in range(elevator_num)]
+        self.delivered_passengers = []
+        # 已经完成的外部任务
+        self.finished_tasks = []
+
+    def current_time(self):
+        """
+        :return: 当前时刻（毫秒），由子类按各自的时钟提供
+        """
+        raise NotImplementedError
+
+    def elevator_button_clicked(self, elevator_id, floor_id):
+        """
+        电梯内部按钮被点击
+        :return: 是否加入了新的目标楼层
+        """
+        # 电梯故障，不处理按键
+        if self.elevator_states[elevator_id] == ELEVATOR_STATE.FAULT:
+            return False
+        # 楼层与电梯处在的楼层相同则不处理
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        if floor_id == cur_floor:
+            return False
+
+        if floor_id > cur_floor:
+            return self.elevator_up_target_list[elevator_id].add(floor_id)
+        return self.elevator_down_target_list[elevator_id].add(floor_id)
+
+    def external_direction_button_clicked(self, floor_id, move_state):
+        """
+        外部方向按钮被点击
+        所有电梯都故障时任务同样加入队列，等待分配，有电梯恢复后再分配，乘客不会被丢下
+        :return: 是否产生了新的外部任务
+        """
+        # 同一楼层同一方向的请求合并，等待时间从第一次按下算起
+        return self.outer_tasks_queue.push(OuterTask(floor_id, move_state, created_time=self.current_time()))
+
+    def passenger_arrival(self, passenger):
+        """
+        乘客到达候梯厅并按下对应方向的外部按钮
+        """
+        self.waiting_passengers.setdefault((passenger.origin, passenger.move_state), []).append(passenger)
+        self.external_direction_button_clicked(passenger.origin, passenger.move_state)
+
+    def elevator_fault(self, elevator_id):
+        """
+        报警键按下：电梯回到一楼并进入故障处理，车内乘客在一楼下车，未到达目的楼层的重新候梯
+        :return: 电梯是否由正常进入故障
+        """
+        if self.elevator_states[elevator_id] == ELEVATOR_STATE.FAULT:
+            return False
+        self.elevator_states[elevator_id] = ELEVATOR_STATE.FAULT
+        self.elevator_cur_floor[elevator_id] = 0
+        self.trouble_solving(elevator_id)
+        riders = self.riding_passengers[elevator_id]
+        self.riding_passengers[elevator_id] = []
+        now = self.current_time()
+        for passenger in riders:
+            if passenger.destination == 0:
+                passenger.alight_time = now
+                self.delivered_passengers.append(passenger)
+            else:
+                passenger.origin = 0
+                passenger.board_time = None
+                passenger.elevator_id = None
+                self.passenger_arrival(passenger)
+        return True
+
+    def elevator_repair(self, elevator_id):
+        """
+        故障解除，电梯恢复正常
+        :return: 电梯是否由故障恢复
+        """
+        if self.elevator_states[elevator_id] != ELEVATOR_STATE.FAULT:
+            return False
+        self.elevator_states[elevator_id] = ELEVATOR_STATE.NORMAL
+        return True
+
+    def trouble_solving(self, elevator_id):
+        """
+        电梯出现故障，把原先分配给它的外部任务交还重新分配
+        """
+        self.outer_tasks_queue.release(elevator_id)
+        self.elevator_up_target_list[elevator_id].clear()
+        self.elevator_down_target_list[elevator_id].clear()
+
+    def trip_end(self, elevator_id):
+        """
+        电梯空闲或换向，结束当前行程（没有停靠的行程不计）
+        """
+        stops = self.elevator_trip_stops[elevator_id]
+        if stops:
+            self.trips_total += 1
+            self.stops_total += stops
+            self.elevator_trip_stops[elevator_id] = 0
+
+    def next_action(self, elevator_id):
+        """
+        空闲电梯决定下一步动作（对应 Elevator.run 的一次循环，最多换向一次）
+        :return: DOOR、MOVE_STATE.UP/DOWN，无事可做时为None
+        """
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        up_targets = self.elevator_up_target_list[elevator_id]
+        down_targets = self.elevator_down_target_list[elevator_id]
+        for _ in range(2):
+            # 向上扫描状态
+            if self.elevator_move_states[elevator_id] == MOVE_STATE.UP:
+                if up_targets:
+                    if up_targets[0] == cur_floor:
+                        return DOOR
+                    elif up_targets[0] > cur_floor:
+                        return MOVE_STATE.UP
+                    return None
+                # 当没有上行目标而出现下行目标时 更换状态
+                elif down_targets:
+                    self.elevator_move_states[elevator_id] = MOVE_STATE.DOWN
+                    self.trip_end(elevator_id)
+                else:
+                    self.trip_end(elevator_id)
+                    return None
+            # 向下扫描状态时(与上面一致)
+            else:
+                if down_targets:
+                    if down_targets[0] == cur_floor:
+                        return DOOR
+                    elif down_targets[0] < cur_floor:
+                        return MOVE_STATE.DOWN
+                    return None
+                elif up_targets:
+                    self.elevator_move_states[elevator_id] = MOVE_STATE.UP
+                    self.trip_end(elevator_id)
+                else:
+                    self.trip_end(elevator_id)
+                    return None
+        return None
+
+    def door_opened(self, elevator_id):
+        """
+        电梯门完全打开，把完成的任务删去(分为内外两方面)，乘客进出电梯
+        :return: 进出电梯的人数，关门前电梯按人数多停留 transfer_time
+        """
+        self.elevator_trip_stops[elevator_id] += 1
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        up_targets = self.elevator_up_target_list[elevator_id]
+        down_targets = self.elevator_down_target_list[elevator_id]
+        move_state = self.elevator_move_states[elevator_id]
+        if move_state == MOVE_STATE.DOWN:
+            down_targets.pop()
+        else:
+            up_targets.pop()
+        # 完成该层与电梯离开方向相同的外部任务
+        finished_tasks = self.outer_tasks_queue.finish_stop(elevator_id, cur_floor, move_state, up_targets, down_targets)
+        for outer_task in finished_tasks:
+            outer_task.finished_time = self.current_time()
+            self.finished_tasks.append(outer_task)
+            # 在本层换向：立即改为新的扫描方向，乘客进出期间新分配的请求按新方向加入目标
+            if outer_task.move_state != move_state:
+                self.elevator_move_states[elevator_id] = outer_task.move_state
+                self.trip_end(elevator_id)
+        return self.exchange_passengers(elevator_id, finished_tasks)
+
+    def load(self, elevator_id):
+        """
+        :return: 分配时计入电梯载客量的乘客数
+        """
+        return len(self.riding_passengers[elevator_id])
+
+    def free_space(self, elevator_id):
+        """
+        :return: 电梯还能容纳的乘客数
+        """
+        if self.capacity is None:
+            return sys.maxsize
+        return self.capacity - len(self.riding_passengers[elevator_id])
+
+    def available_states(self):
+        """
+        分配时使用的电梯状态：满载的电梯视为不可用，与故障相同
+        """
+        if self.capacity is None:
+            return self.elevator_states
+        return [ELEVATOR_STATE.FAULT if self.load(elevator_id) >= self.capacity else state
+                for elevator_id, state in enumerate(self.elevator_states)]
+
+    def alight_passengers(self, elevator_id):
+        """
+        到站的乘客下车
+        :return: 下车的人数
+        """
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        riders = self.riding_passengers[elevator_id]
+        staying = []
+        now = self.current_time()
+        for passenger in riders:
+            if passenger.destination == cur_floor:
+                passenger.alight_time = now
+                self.delivered_passengers.append(passenger)
+            else:
+                staying.append(passenger)
+        self.riding_passengers[elevator_id] = staying
+        return len(riders) - len(staying)
+
+    def exchange_passengers(self, elevator_id, finished_tasks):
+        """
+        到站的乘客下车；响应了外部请求时，该方向候梯的乘客在容量允许的范围内上车并按下目的楼层，
+        没能上车的乘客再次按下外部按钮
+        :param finished_tasks: 本次完成的外部任务列表
+        :return: 进出电梯的人数
+        """
+        moved = self.alight_passengers(elevator_id)
+        riders = self.riding_passengers[elevator_id]
+        now = self.current_time()  # 同一次开门上车的乘客使用同一时刻（asyncio控制器的时钟在循环中仍会前进）
+        for finished_task in finished_tasks:
+            waiting = self.waiting_passengers.pop(finished_task.key, [])
+            space = self.free_space(elevator_id)
+            boarding, left = waiting[:space], waiting[space:]
+            for passenger in boarding:
+                passenger.board_time = now
+                passenger.elevator_id = elevator_id
+                riders.append(passenger)
+                self.elevator_button_clicked(elevator_id, passenger.destination)
+            if left:
+                self.waiting_passengers[finished_task.key] = left
+                self.external_direction_button_clicked(*finished_task.key)
+            moved += len(boarding)
+        return moved
+
+    def make_scorer(self, outer_tasks, states):
+        """
+        :return: 批量为外部任务打分的对象（见 vector_dispatch.BatchScorer），不使用时为None
+        """
+        return None
+
+    def dispatch(self):
+        """
+        外部任务分配（对应 Outer.run 的一次循环）
+        :return: 加入了新目标楼层的电梯编号
+        """
+        touched = []
+        # 只处理等待分配的任务，本轮未能分配的放回队列
+        outer_tasks = []
+        for _ in range(len(self.outer_tasks_queue.unassigned)):
+            outer_task = self.outer_tasks_queue.pop()
+            if outer_task is None:
+                break
+            outer_tasks.append(outer_task)
+        if not outer_tasks:
+            return touched
+
+        # 满载的电梯不参与分配
+        states = self.available_states()
+        scorer = self.make_scorer(outer_tasks, states)
+        batch = None
+        if scorer is None and hasattr(self.strategy, "assign_batch"):
+            # 所有任务一起求最小代价匹配
+            batch = self.strategy.assign_batch(
+                outer_tasks, states, self.elevator_cur_floor, self.elevator_move_states,
+                self.elevator_up_target_list, self.elevator_down_target_list, self.floor_num)
+        for task_index, outer_task in enumerate(outer_tasks):
+            if scorer is not None:
+                target_id = scorer.best(task_index)
+            elif batch is not None:
+                target_id = batch[task_index]
+            else:
+                target_id = self.strategy.choose(
+                    outer_task, states, self.elevator_cur_floor, self.elevator_move_states,
+                    self.elevator_up_target_list, self.elevator_down_target_list, self.floor_num)
+            if target_id != -1:
+                descending = choose_target_queue(
+                    self.elevator_cur_floor[target_id], self.elevator_states[target_id], outer_task,
+                    self.elevator_move_states[target_id], self.elevator_up_target_list[target_id],
+                    self.elevator_down_target_list[target_id])
+                if descending is not None:
+                    if descending:
+                        target_queue = self.elevator_down_target_list[target_id]
+                    else:
+                        target_queue = self.elevator_up_target_list[target_id]
+                    self.outer_tasks_queue.assign(outer_task, target_id, descending)
+                    if add_task_to_queue(target_queue, outer_task):
+                        touched.append(target_id)
+                        # 该电梯的目标发生变化，只重算它对应的一列
+                        if scorer is not None:
+                            scorer.update(target_id, task_index + 1, self.elevator_states[target_id],
+                                          self.elevator_cur_floor[target_id], self.elevator_move_states[target_id],
+                                          self.elevator_up_target_list[target_id],
+                                          self.elevator_down_target_list[target_id])
+            if outer_task.task_state == TASK_STATE.UNASSIGNED:
+                self.outer_tasks_queue.requeue(outer_task)
+        return touched
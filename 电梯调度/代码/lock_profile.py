@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+
+from PyQt5.QtCore import QMutex, QWaitCondition
+
+from metrics import Histogram
+
+# 等待/持有时间直方图的桶上界（微秒）
+LOCK_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+def call_site(depth=2):
+    '''
+    调用加锁/解锁的位置，形如 Elevator.run、Outer.snapshot（静态方法同样带类名）
+    :param depth: 相对本函数的栈深度
+    '''
+    frame = sys._getframe(depth)
+    code = frame.f_code
+    # Python 3.11起代码对象带有完整的限定名
+    qualname = getattr(code, "co_qualname", None)
+    if qualname is not None:
+        return qualname
+    owner = frame.f_locals.get("self")
+    if owner is not None:
+        return "%s.%s" % (type(owner).__name__, code.co_name)
+    # 更早的版本中静态方法与模块级函数取不到类名，用 模块:函数:行号 区分
+    return "%s:%s:%d" % (frame.f_globals.get("__name__"), code.co_name, code.co_firstlineno)
+
+
+class LockProfiler:
+    """
+    按 (锁, 调用位置) 汇总加锁的等待时间与持有时间
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}  # (锁名, 调用位置) -> (等待时间直方图, 持有时间直方图)
+
+    def record(self, name, site, wait_us, hold_us):
+        with self.lock:
+            key = (name, site)
+            if key not in self.stats:
+                self.stats[key] = (Histogram(LOCK_BUCKETS), Histogram(LOCK_BUCKETS))
+            wait, hold = self.stats[key]
+            if wait_us is not None:
+                wait.observe(wait_us)
+            if hold_us is not None:
+                hold.observe(hold_us)
+
+    def report(self, file=None):
+        '''
+        打印每个调用位置的等待/持有时间以及直方图
+        '''
+        file = file or sys.stderr
+        with self.lock:
+            items = sorted(self.stats.items())
+        if not items:
+            return
+        print("\n锁竞争统计（微秒）", file=file)
+        print("%-22s %-44s %8s %10s %10s %10s %10s" % ("锁", "调用位置", "次数", "等待均值", "等待最大",
+                                                       "持有均值", "持有最大"), file=file)
+        for (name, site), (wait, hold) in items:
+            print("%-22s %-44s %8d %10.1f %10d %10.1f %10d" % (
+                name, site, max(wait.count, hold.count), wait.sum / wait.count if wait.count else 0.0, wait.max,
+                hold.sum / hold.count if hold.count else 0.0, hold.max), file=file)
+        for (name, site), (wait, hold) in items:
+            print("\n%s @ %s" % (name, site), file=file)
+            for label, histogram in (("等待", wait), ("持有", hold)):
+                if not histogram.count:
+                    continue
+                previous = 0
+                for bound, cumulative in zip(histogram.buckets, histogram.counts):
+                    count = cumulative - previous
+                    previous = cumulative
+                    if count:
+                        bar = "#" * max(1, 40 * count // histogram.count)
+                        print("  %s <=%7dus %8d %s" % (label, bound, count, bar), file=file)
+                if histogram.count > previous:
+                    print("  %s  >%7dus %8d" % (label, histogram.buckets[-1], histogram.count - previous),
+                          file=file)
+
+
+profiler = LockProfiler()
+
+
+class ProfiledMutex(QMutex):
+    """
+    记录等待时间与持有时间的QMutex，可直接替换原有的锁，也可交给QWaitCondition.wait
+    """
+
+    def __init__(self, name):
+        """
+        :param name: 锁的名称（报告中显示）
+        """
+        super().__init__()
+        self.name = name
+        # 当前持有者的加锁位置与时刻，只由持有者读写
+        self.holder_site = None
+        self.acquired_at = 0
+
+    def lock(self):
+        site = call_site()
+        start = time.perf_counter_ns()
+        super().lock()
+        now = time.perf_counter_ns()
+        self.holder_site = site
+        self.acquired_at = now
+        profiler.record(self.name, site, (now - start) // 1000, None)
+
+    def unlock(self):
+        site, acquired_at = self.holder_site, self.acquired_at
+        self.holder_site = None
+        super().unlock()
+        if site is not None:
+            profiler.record(self.name, site, None, (time.perf_counter_ns() - acquired_at) // 1000)
+
+    def release_for_wait(self):
+        '''
+        QWaitCondition.wait 在C++中释放锁，这里先结算持有时间
+        :return: 加锁位置，供 reacquired_after_wait 使用
+        '''
+        site, acquired_at = self.holder_site, self.acquired_at
+        self.holder_site = None
+        if site is not None:
+            profiler.record(self.name, site, None, (time.perf_counter_ns() - acquired_at) // 1000)
+        return site
+
+    def reacquired_after_wait(self, site):
+        self.holder_site = site
+        self.acquired_at = time.perf_counter_ns()
+
+
+class ProfiledWaitCondition(QWaitCondition):
+    """
+    与 ProfiledMutex 配合的条件变量：挂起期间不计入锁的持有时间
+    """
+
+    def wait(self, mutex, *args):
+        if not isinstance(mutex, ProfiledMutex):
+            return super().wait(mutex, *args)
+        site = mutex.release_for_wait()
+        result = super().wait(mutex, *args)
+        mutex.reacquired_after_wait(site)
+        return result
@@ -1,59 +1,189 @@
 import sys
 import os
-from enum import Enum
+import time
+from collections import deque
 from functools import partial
 import ui_mainwindow
-from PyQt5.QtCore import QThread, QMutex, QTimer
+import elevator_core
+from call_trace import TraceRecorder
+import traffic
+import dispatch
+from metrics import ControllerMetrics, dump_json
+import metrics_server
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, \
+    ELEVATOR_STATE, MOVE_STATE, TASK_STATE, OuterTask, TargetSet, HallCallQueue
+from PyQt5.QtCore import QThread, QMutex, QWaitCondition, QTimer
 from PyQt5 import QtWidgets, QtGui, QtCore
 
 # 常量
-ELEVATOR_NUM = 5  # 电梯数量
-FLOOR_NUM = 20  # 电梯层数
-MOVE_TIME = 1000  # 上升下降时间
-DOOR_OPEN_AND_CLOSE_TIME = 2000  # 电梯开关门时间
 BUTTON_COLOR = (255, 255, 255)  # 按钮未被按下的颜色
 BUTTON_CLICKED_COLOR = (255, 255, 0)  # 按钮按下的颜色(黄色)
 ELEVATOR_COLOR = (127, 255, 170)  # 电梯运行中的颜色(绿色)
 DOOR_OPERATION_COLOR = (255, 255, 0)  # 电梯开关门时的中间色
 WARNING_BUTTON_COLOR = (250, 128, 114)  # 报警按钮颜色(粉红色)
+DOOR_PALETTE_STEPS = 20  # 开关门动画的量化级数（每级对应电梯线程的一个时间片）
+
+# 预先拼好的样式表，刷新时不再拼接字符串
+BUTTON_STYLE = "background-color : rgb" + str(BUTTON_COLOR)
+BUTTON_CLICKED_STYLE = "background-color : rgb" + str(BUTTON_CLICKED_COLOR)
+WARNING_BUTTON_STYLE = "background-color : rgb" + str(WARNING_BUTTON_COLOR)
+HALL_BUTTON_LIT_STYLE = "background-color : yellow"
+DEFAULT_STYLE = "background-color : None"
+METRICS_DUMP_INTERVAL = 5000  # 指标文件的写出间隔（毫秒）
+SPEED_FACTORS = (1, 10, 100)  # 界面上可选的时间倍率
+TIME_SLICE = 100  # 电梯线程的时间片（毫秒），单步时前进一个时间片
+
+
+# 互斥锁
+# elevator_mutexes[i] 保护第i台电梯的 elevator_up_target_list[i]、elevator_down_target_list[i]、elevator_states[i]、
+#   elevator_cur_floor[i]、elevator_door_process_bar[i]、elevator_move_states[i]
+# outer_mutex 保护外部请求队列 outer_tasks_queue（含按电梯的分配索引）以及其中每个任务的 task_state
+# 加锁顺序：先 outer_mutex，再按编号从小到大获取电梯锁；持有电梯锁时不得再获取 outer_mutex，
+#   电梯线程需要修改外部任务时，须先释放自己的电梯锁
+elevator_mutexes = [QMutex() for _ in range(ELEVATOR_NUM)]
+outer_mutex = QMutex()
+# 与互斥锁配合使用的条件变量：线程无事可做时挂起，有新任务时被唤醒
+elevator_conditions = [QWaitCondition() for _ in range(ELEVATOR_NUM)]  # 与elevator_mutexes配合：新的目标楼层/故障状态变化
+outer_condition = QWaitCondition()  # 与outer_mutex配合：有新的外部任务/电梯状态发生变化
+
+# python main.py --profile-locks：换成记录等待/持有时间的锁，退出时按调用位置打印直方图
+if "--profile-locks" in sys.argv:
+    from lock_profile import ProfiledMutex, ProfiledWaitCondition
+
+    elevator_mutexes = [ProfiledMutex("elevator_mutexes[%d]" % i) for i in range(ELEVATOR_NUM)]
+    outer_mutex = ProfiledMutex("outer_mutex")
+    elevator_conditions = [ProfiledWaitCondition() for _ in range(ELEVATOR_NUM)]
+    outer_condition = ProfiledWaitCondition()
+
+
+def notify_outer():
+    '''
+    唤醒outer线程（调用者不能持有任何电梯锁）
+    :return:
+    '''
+    outer_mutex.lock()
+    outer_condition.wakeAll()
+    outer_mutex.unlock()
 
 
-# 电梯的状态
-class ELEVATOR_STATE(Enum):
-    DOWN = -1
-    NORMAL = 0
-    UP = 1
-    FAULT = 2
-    DOOR = 3
-
-# 电梯的移动状态
-class MOVE_STATE(Enum):
-    UP = 1
-    DOWN = -1
-
-# 外部按钮产生的任务的分配状态
-class TASK_STATE(Enum):
-    UNASSIGNED = 0
-    WAITING = 1
-    FINISHED = 2
+def metrics():
+    '''
+    读取控制器的运行指标：计数器与直方图来自 controller_metrics，
+    外部任务数与电梯状态在对应的锁内复制（不同时持有多把锁）；
+    --metrics-file、--metrics-port 使用，导入本模块后也可以直接调用
+    :return: 指标字典（见 metrics.ControllerMetrics.snapshot）
+    '''
+    outer_mutex.lock()
+    pending_hall_calls = len(outer_tasks_queue)
+    unassigned_hall_calls = sum(1 for outer_task in outer_tasks_queue
+                                if outer_task.task_state == TASK_STATE.UNASSIGNED)
+    outer_mutex.unlock()
+    car_states = []
+    car_floors = []
+    for i in range(ELEVATOR_NUM):
+        elevator_mutexes[i].lock()
+        car_states.append(elevator_states[i])
+        car_floors.append(elevator_cur_floor[i])
+        elevator_mutexes[i].unlock()
+    return controller_metrics.snapshot(pending_hall_calls, unassigned_hall_calls, car_states, car_floors)
+
+
+class SpeedControl:
+    """
+    全局的时间倍率与暂停/单步控制
+    电梯线程每个时间片调用 wait_slice 代替 msleep：按倍率缩短等待，暂停时挂起，单步时每个线程放行一个时间片；
+    virtual_time 给出按倍率推进、暂停时停止的控制器时间，供指标、按键记录与客流使用。
+    内部的锁不与其他锁嵌套，调用者不应持有任何电梯锁
+    """
 
+    def __init__(self):
+        self.mutex = QMutex()
+        self.condition = QWaitCondition()  # 与mutex配合：取消暂停或单步
+        self.speed = 1
+        self.paused = False
+        self.step_count = 0  # 单步的次数，暂停中的线程看到它变化后前进一个时间片
+        # 上次改变倍率/暂停状态时的控制器时间（毫秒）与真实时间（秒）
+        self.base_virtual_time = 0.0
+        self.base_real_time = time.monotonic()
+
+    def current_virtual_time(self):
+        # 调用时持有mutex
+        if self.paused:
+            return self.base_virtual_time
+        return self.base_virtual_time + (time.monotonic() - self.base_real_time) * 1000 * self.speed
+
+    def rebase(self):
+        # 倍率或暂停状态改变前，结算此前经过的控制器时间（调用时持有mutex）
+        self.base_virtual_time = self.current_virtual_time()
+        self.base_real_time = time.monotonic()
+
+    def virtual_time(self):
+        """
+        :return: 控制器启动以来经过的时间（毫秒）
+        """
+        self.mutex.lock()
+        now = int(self.current_virtual_time())
+        self.mutex.unlock()
+        return now
 
-# mutex全局互斥锁
-mutex = QMutex()
+    def set_speed(self, speed):
+        """
+        :param speed: 时间倍率，如SPEED_FACTORS中的1、10、100
+        """
+        self.mutex.lock()
+        self.rebase()
+        self.speed = speed
+        self.mutex.unlock()
+
+    def set_paused(self, paused):
+        self.mutex.lock()
+        self.rebase()
+        self.paused = paused
+        if not paused:
+            self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def step(self, time_slice):
+        """
+        暂停时前进一个时间片
+        :param time_slice: 时间片长度（毫秒）
+        """
+        self.mutex.lock()
+        if self.paused:
+            self.step_count += 1
+            self.base_virtual_time += time_slice
+            self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def wait_slice(self, thread, time_slice):
+        """
+        线程经过一个时间片
+        :param thread: 调用的QThread
+        :param time_slice: 时间片长度（毫秒）
+        """
+        self.mutex.lock()
+        if self.paused:
+            step_count = self.step_count
+            while self.paused and self.step_count == step_count:
+                self.condition.wait(self.mutex)
+            self.mutex.unlock()
+            return
+        speed = self.speed
+        self.mutex.unlock()
+        thread.msleep(max(1, round(time_slice / speed)))
 
 
-class OuterTask:
-    '''
-    外部请求的封装
-    :target_floor:目标楼层
-    :move_state:运动状态
-    :task_state：任务状态
-    '''
+speed_control = SpeedControl()
 
-    def __init__(self, target_floor, move_state, state=TASK_STATE.UNASSIGNED):
-        self.floor = target_floor  # 目标楼层
-        self.move_state = move_state  # 需要的电梯运行方向
-        self.task_state = state  # 是否完成（默认未完成）
+# 全局变量：控制器的状态，由上面的互斥锁保护；在模块导入时创建，导入后即可调用 metrics()
+elevator_up_target_list = [TargetSet() for _ in range(ELEVATOR_NUM)]  # 每台电梯当前需要向上运行处理的目标有哪些（升序排序）
+elevator_down_target_list = [TargetSet(descending=True) for _ in range(ELEVATOR_NUM)]  # 每台电梯当前需要向下运行处理的目标有哪些（降序排序）
+outer_tasks_queue = HallCallQueue()  # 外部按钮产生的需求(是OuterTask类的对象)
+elevator_states = [ELEVATOR_STATE.NORMAL for _ in range(ELEVATOR_NUM)]  # 每组电梯的状态
+elevator_cur_floor = [0 for _ in range(ELEVATOR_NUM)]  # 每台电梯的当前楼层
+elevator_door_process_bar = [0.0 for _ in range(ELEVATOR_NUM)]  # 开/关门进度条
+elevator_move_states = [MOVE_STATE.UP for _ in range(ELEVATOR_NUM)]  # 每台电梯当前的扫描运行状态
+controller_metrics = ControllerMetrics(clock=speed_control.virtual_time)  # 运行指标，通过 metrics() 读取
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -61,8 +191,12 @@ class MainWindow(QtWidgets.QMainWindow):
     整个UI界面，详细定义见ui_mainwindow.py
     """
 
-    def __init__(self):
+    def __init__(self, recorder=None):
+        '''
+        :param recorder: 按键记录器（call_trace.TraceRecorder），None表示不记录
+        '''
         super(MainWindow, self).__init__()
+        self.recorder = recorder
         self.ui = ui_mainwindow.Ui_MainWindow()
         self.ui.setupUi(self)
 
@@ -75,12 +209,69 @@ class MainWindow(QtWidgets.QMainWindow):
         self.external_down_buttons = []
         self.elevator_warning_buttons = []
 
+        # 上一次画出的状态，刷新时只更新发生变化的控件
+        self.drawn_snapshots = [None for _ in range(ELEVATOR_NUM)]  # 每台电梯的(状态, 楼层, 开关门进度, 目标楼层)
+        self.drawn_arrows = [None for _ in range(ELEVATOR_NUM)]  # 箭头
+        self.drawn_floors = [None for _ in range(ELEVATOR_NUM)]  # 数码管显示的楼层
+        self.drawn_items = [[None for _ in range(FLOOR_NUM)] for _ in range(ELEVATOR_NUM)]  # 状态栏每格的(颜色, 文字)
+        self.drawn_styles = {}  # 按钮 -> 样式表
+        self.drawn_pending_tasks = set()  # 亮起的外部按钮(floor, move_state)
+        self.drawn_clock = None  # 显示的控制器时间（秒）
+
+        # 时间倍率、暂停与单步控制
+        self.pause_button = None
+        self.step_button = None
+        self.speed_buttons = {}  # 倍率 -> 按钮
+        self.clock_label = None
+
+        # 所有电梯共用的画刷与开关门动画调色板
+        self.brushes = {}  # 颜色 -> QBrush
+        self.door_palette = []  # 第i级：(内部按钮样式表, 状态栏颜色, 状态栏文字)
+        self.init_palette()
+
         # 定时器 用于定时更新UI界面
         self.timer = QTimer()
 
         # 初始化 UI 元素
         self.init_ui_elements()
 
+    def init_palette(self):
+        '''
+        预先生成画刷与量化后的开关门动画调色板
+        :return:
+        '''
+        for color in (BUTTON_COLOR, ELEVATOR_COLOR, WARNING_BUTTON_COLOR):
+            self.get_brush(color)
+        for step in range(DOOR_PALETTE_STEPS + 1):
+            door_process_bar = step / DOOR_PALETTE_STEPS
+            # 内部按钮由按下时的黄色逐渐恢复为白色
+            button_style = "background-color : rgb(255,255,%d)" % int(255 * door_process_bar)
+            # 状态栏颜色在电梯色与开关门中间色之间往返
+            weight = -2 * abs(door_process_bar - 0.5) + 1
+            color = tuple(ELEVATOR_COLOR[i] + int(weight * (DOOR_OPERATION_COLOR[i] - ELEVATOR_COLOR[i]))
+                          for i in range(3))
+            self.get_brush(color)
+            if door_process_bar < 1 / 4:
+                word = "           开门中"
+            elif door_process_bar < 3 / 4:
+                word = "           等待中"
+            else:
+                word = "           关门中"
+            self.door_palette.append((button_style, color, word))
+
+    def get_brush(self, color):
+        '''
+        取出某颜色的画刷，没有时创建并缓存
+        :param color: 颜色rgb三元组
+        :return: QBrush
+        '''
+        brush = self.brushes.get(color)
+        if brush is None:
+            brush = QtGui.QBrush(QtGui.QColor(*color))
+            brush.setStyle(QtCore.Qt.SolidPattern)
+            self.brushes[color] = brush
+        return brush
+
     def init_ui_elements(self):
         '''
         初始化ui界面
@@ -93,6 +284,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.elevator_arrows = [self.ui.arrow_1, self.ui.arrow_2, self.ui.arrow_3, self.ui.arrow_4, self.ui.arrow_5]
         self.up_arrow = QtGui.QPixmap(QtGui.QImage("img/arrow_up.png").scaled(32, 32))
         self.down_arrow = QtGui.QPixmap(QtGui.QImage("img/arrow_down.png").scaled(32, 32))
+        self.no_arrow = QtGui.QPixmap()
         self.elevator_warning_buttons = [self.ui.Warning_1, self.ui.Warning_2, self.ui.Warning_3, self.ui.Warning_4,
                                          self.ui.Warning_5]
 
@@ -131,7 +323,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 partial(self.elevator_warning_button_clicked, elevator_id))
 
         for arrow in self.elevator_arrows:
-            arrow.setPixmap(QtGui.QPixmap())
+            arrow.setPixmap(self.no_arrow)
+
+        self.init_speed_controls()
 
         # 设置定时，定时
         self.timer.setInterval(30)
@@ -140,6 +334,59 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.show()
 
+    def init_speed_controls(self):
+        '''
+        在标题右侧放置暂停、单步与1×/10×/100×倍率按钮，以及控制器时间
+        :return:
+        '''
+        x = 600
+        self.pause_button = QtWidgets.QPushButton("暂停", self.ui.centralwidget)
+        self.pause_button.setGeometry(QtCore.QRect(x, 14, 45, 23))
+        self.pause_button.setCheckable(True)
+        self.pause_button.toggled.connect(self.pause_button_toggled)
+        self.step_button = QtWidgets.QPushButton("单步", self.ui.centralwidget)
+        self.step_button.setGeometry(QtCore.QRect(x + 50, 14, 45, 23))
+        self.step_button.setEnabled(False)
+        self.step_button.clicked.connect(self.step_button_clicked)
+        x += 105
+        speed_group = QtWidgets.QButtonGroup(self)
+        for speed in SPEED_FACTORS:
+            button = QtWidgets.QPushButton("%d×" % speed, self.ui.centralwidget)
+            button.setGeometry(QtCore.QRect(x, 14, 41, 23))
+            button.setCheckable(True)
+            button.setChecked(speed == 1)
+            button.clicked.connect(partial(self.speed_button_clicked, speed))
+            speed_group.addButton(button)
+            self.speed_buttons[speed] = button
+            x += 45
+        self.clock_label = QtWidgets.QLabel(self.ui.centralwidget)
+        self.clock_label.setGeometry(QtCore.QRect(x + 5, 14, 80, 23))
+
+    def pause_button_toggled(self, paused):
+        '''
+        暂停/继续：暂停时电梯线程在下一个时间片挂起
+        :param paused: 是否暂停
+        :return:
+        '''
+        speed_control.set_paused(paused)
+        self.pause_button.setText("继续" if paused else "暂停")
+        self.step_button.setEnabled(paused)
+
+    def step_button_clicked(self):
+        '''
+        暂停时所有电梯前进一个时间片
+        :return:
+        '''
+        speed_control.step(TIME_SLICE)
+
+    def speed_button_clicked(self, speed):
+        '''
+        切换时间倍率
+        :param speed: SPEED_FACTORS中的倍率
+        :return:
+        '''
+        speed_control.set_speed(speed)
+
     def elevator_button_clicked(self, elevator_id, floor_id):
         '''
         当电梯内部按钮被点击时
@@ -147,29 +394,31 @@ class MainWindow(QtWidgets.QMainWindow):
         :param floor_id: 楼层的index
         :return:
         '''
-        # 互斥锁：一次只能点一个电梯按钮
-        mutex.lock()
+        if self.recorder is not None:
+            self.recorder.car_call(elevator_id, floor_id)
+        # 互斥锁：只锁住对应的电梯
+        elevator_mutexes[elevator_id].lock()
 
         # 电梯故障，不处理按键
         if elevator_states[elevator_id] == ELEVATOR_STATE.FAULT:
-            mutex.unlock()
+            elevator_mutexes[elevator_id].unlock()
             return
 
         # 楼层与电梯处在的楼层相同则不处理
         if floor_id == elevator_cur_floor[elevator_id]:
-            mutex.unlock()
+            elevator_mutexes[elevator_id].unlock()
             return
 
         # 将按键加入任务列表中
-        if floor_id > elevator_cur_floor[elevator_id] and floor_id not in elevator_up_target_list[elevator_id]:
-            elevator_up_target_list[elevator_id].append(floor_id)
-            elevator_up_target_list[elevator_id].sort()
-        elif floor_id < elevator_cur_floor[elevator_id] and floor_id not in elevator_down_target_list[elevator_id]:
-            elevator_down_target_list[elevator_id].append(floor_id)
-            elevator_down_target_list[elevator_id].sort(reverse=True)
-        self.elevator_buttons[elevator_id][floor_id].setStyleSheet("background-color : rgb" + str(BUTTON_CLICKED_COLOR))
+        if floor_id > elevator_cur_floor[elevator_id]:
+            elevator_up_target_list[elevator_id].add(floor_id)
+        elif floor_id < elevator_cur_floor[elevator_id]:
+            elevator_down_target_list[elevator_id].add(floor_id)
+        self.set_style_sheet(self.elevator_buttons[elevator_id][floor_id], BUTTON_CLICKED_STYLE)
+        # 唤醒对应电梯
+        elevator_conditions[elevator_id].wakeAll()
 
-        mutex.unlock()
+        elevator_mutexes[elevator_id].unlock()
 
         # self.show_current_position(floor_id, elevator_id)
 
@@ -179,30 +428,42 @@ class MainWindow(QtWidgets.QMainWindow):
         :param elevator_id: 电梯的index
         :return:
         '''
-        mutex.lock()
+        elevator_mutexes[elevator_id].lock()
         # 一开始处于正常状态
         if elevator_states[elevator_id] != ELEVATOR_STATE.FAULT:
+            if self.recorder is not None:
+                self.recorder.fault(elevator_id)
             elevator_states[elevator_id] = ELEVATOR_STATE.FAULT
+            controller_metrics.car_state(elevator_id, ELEVATOR_STATE.FAULT)
             # 回到一楼
             elevator_cur_floor[elevator_id] = 0
+            # 唤醒该电梯进行故障处理
+            elevator_conditions[elevator_id].wakeAll()
             # 可以开放锁，供其他使用
-            mutex.unlock()
+            elevator_mutexes[elevator_id].unlock()
 
             self.elevator_warning_buttons[elevator_id].setStyleSheet(
-                "background-color : rgb" + str(WARNING_BUTTON_COLOR))
+                WARNING_BUTTON_STYLE)
             self.elevator_warning_buttons[elevator_id].setText("正常")
             for btn in self.elevator_buttons[elevator_id]:
-                btn.setStyleSheet("background-color : rgb" + str(BUTTON_COLOR))
+                self.set_style_sheet(btn, BUTTON_STYLE)
             # 涂成粉红色
             for i in range(FLOOR_NUM):
                 self.paint_item(elevator_id, i, WARNING_BUTTON_COLOR)
         # 一开始处于报警状态：恢复正常
         else:
+            if self.recorder is not None:
+                self.recorder.repair(elevator_id)
             elevator_states[elevator_id] = ELEVATOR_STATE.NORMAL
+            controller_metrics.car_state(elevator_id, ELEVATOR_STATE.NORMAL)
+            # 唤醒该电梯
+            elevator_conditions[elevator_id].wakeAll()
             # 可以开放锁，供其他使用
-            mutex.unlock()
+            elevator_mutexes[elevator_id].unlock()
+            # 通知outer有电梯可用
+            notify_outer()
 
-            self.elevator_warning_buttons[elevator_id].setStyleSheet("background-color : None")
+            self.elevator_warning_buttons[elevator_id].setStyleSheet(DEFAULT_STYLE)
             self.elevator_warning_buttons[elevator_id].setText("报警")
 
             for i in range(FLOOR_NUM):
@@ -215,114 +476,138 @@ class MainWindow(QtWidgets.QMainWindow):
         :param move_state:需求方向
         :return:
         '''
+        if self.recorder is not None:
+            self.recorder.hall_call(floor_id, move_state)
         # 互斥锁
-        mutex.lock()
-
-        # 检测是否所有电梯均已经发生故障
-        no_elevator_left = True
-        for i in range(ELEVATOR_NUM):
-            if elevator_states[i] != ELEVATOR_STATE.FAULT:
-                no_elevator_left = False
-        if no_elevator_left == True:
-            print("所有电梯均已经发生故障")
-            mutex.unlock()
-            return
+        outer_mutex.lock()
 
+        # 所有电梯均已经发生故障时任务同样进入队列，等有电梯恢复（notify_outer）后再分配
         task = OuterTask(floor_id, move_state)
 
-        # 考虑重复点击的情况
-        if task not in outer_tasks_list:
-            outer_tasks_list.append(task)
+        # 考虑重复点击的情况：同一楼层同一方向的请求合并
+        if outer_tasks_queue.push(task):
+            controller_metrics.task_created(task)
+            # 唤醒outer分配任务
+            outer_condition.wakeAll()
 
             move_states = None
             if move_state == MOVE_STATE.UP:
-                self.external_up_buttons[floor_id].setStyleSheet("background-color : rgb" + str(BUTTON_CLICKED_COLOR))
+                self.set_style_sheet(self.external_up_buttons[floor_id], BUTTON_CLICKED_STYLE)
             elif move_states == MOVE_STATE.DOWN:
-                self.external_down_buttons[floor_id].setStyleSheet("background-color : rgb" + str(BUTTON_CLICKED_COLOR))
+                self.set_style_sheet(self.external_down_buttons[floor_id], BUTTON_CLICKED_STYLE)
 
-        mutex.unlock()
+        outer_mutex.unlock()
+
+    def set_style_sheet(self, button, style):
+        """
+        设置按钮样式表，与上一次相同时不做任何事
+        :param button: 按钮
+        :param style: 样式表字符串
+        :return:
+        """
+        if self.drawn_styles.get(button) == style:
+            return
+        self.drawn_styles[button] = style
+        button.setStyleSheet(style)
 
     def paint_item(self, elevator_id, floor_id, color=(255, 255, 255), word=""):
         """
-        展示电梯的运行状态
+        展示电梯的运行状态，与该格上一次画出的内容相同时不做任何事
         :param elevator_id: 电梯index
         :param floor_id: 楼层index
         :param color: 颜色rgb三元组
         :param word: 输入文字
         :return:
         """
-        brush = QtGui.QBrush(QtGui.QColor(*color))
-        brush.setStyle(QtCore.Qt.SolidPattern)
-        self.list_widgets[elevator_id].item(19 - floor_id).setBackground(brush)
+        if self.drawn_items[elevator_id][floor_id] == (color, word):
+            return
+        self.drawn_items[elevator_id][floor_id] = (color, word)
+        self.list_widgets[elevator_id].item(19 - floor_id).setBackground(self.get_brush(color))
         self.list_widgets[elevator_id].item(19 - floor_id).setText(word)
 
     def update(self):
         """
-        用于刷新界面
+        用于刷新界面：与上一次画出的状态比较，只更新发生变化的电梯与按钮
         :return:
         """
-        mutex.lock()
+        clock = speed_control.virtual_time() // 1000
+        if clock != self.drawn_clock:
+            self.drawn_clock = clock
+            self.clock_label.setText("%d:%02d:%02d" % (clock // 3600, clock // 60 % 60, clock % 60))
+
+        # 逐台电梯加锁，只复制状态，绘制时不持有锁
+        snapshots = []
+        for elevator_id in range(ELEVATOR_NUM):
+            elevator_mutexes[elevator_id].lock()
+            snapshots.append((elevator_states[elevator_id], elevator_cur_floor[elevator_id],
+                              elevator_door_process_bar[elevator_id],
+                              frozenset(elevator_up_target_list[elevator_id]) |
+                              frozenset(elevator_down_target_list[elevator_id])))
+            elevator_mutexes[elevator_id].unlock()
+
         for elevator_id in range(ELEVATOR_NUM):
+            # 与上一帧相同则不重绘该电梯
+            if snapshots[elevator_id] == self.drawn_snapshots[elevator_id]:
+                continue
+            previous = self.drawn_snapshots[elevator_id]
+            self.drawn_snapshots[elevator_id] = snapshots[elevator_id]
+            state, cur_floor, door_process_bar, targets = snapshots[elevator_id]
+            # 高倍速下两帧之间电梯可能移动了好几层、整个开关门也可能落在两帧之间，
+            # 因此按上一次画出的楼层清除状态栏，并恢复已经停靠完成（不再是目标）的楼层的内部按钮
+            if previous is not None and state != ELEVATOR_STATE.FAULT:
+                _, drawn_floor, _, drawn_targets = previous
+                if drawn_floor != cur_floor:
+                    self.paint_item(elevator_id, drawn_floor)
+                for floor in drawn_targets - targets:
+                    self.set_style_sheet(self.elevator_buttons[elevator_id][floor], BUTTON_STYLE)
+
             # 实时更新楼层
-            if elevator_states[elevator_id] == ELEVATOR_STATE.UP:
-                self.elevator_arrows[elevator_id].setPixmap(self.up_arrow)
-            elif elevator_states[elevator_id] == ELEVATOR_STATE.DOWN:
-                self.elevator_arrows[elevator_id].setPixmap(self.down_arrow)
+            if state == ELEVATOR_STATE.UP or state == ELEVATOR_STATE.DOWN:
+                arrow = state
             else:
-                self.elevator_arrows[elevator_id].setPixmap(QtGui.QPixmap())
-            self.elevator_lcds[elevator_id].display(str(elevator_cur_floor[elevator_id] + 1))
-
-            # 对内部的按钮，如果在开门或关门状态的话，则设进度条
-            if elevator_states[elevator_id] == ELEVATOR_STATE.DOOR:
-                self.elevator_buttons[elevator_id][elevator_cur_floor[elevator_id]].setStyleSheet(
-                    "background-color : rgb(255,255" + str(int(255 * (1 - elevator_door_process_bar[elevator_id]))))
-                red = ELEVATOR_COLOR[0] + int((-2 * abs(elevator_door_process_bar[elevator_id] - 0.5) + 1) * (
-                        DOOR_OPERATION_COLOR[0] - ELEVATOR_COLOR[0]))
-                green = ELEVATOR_COLOR[1] + int((-2 * abs(elevator_door_process_bar[elevator_id] - 0.5) + 1) * (
-                        DOOR_OPERATION_COLOR[1] - ELEVATOR_COLOR[1]))
-                blue = ELEVATOR_COLOR[2] + int((-2 * abs(elevator_door_process_bar[elevator_id] - 0.5) + 1) * (
-                        DOOR_OPERATION_COLOR[2] - ELEVATOR_COLOR[2]))
-                color = (red, green, blue)
-                if elevator_door_process_bar[elevator_id] < 1 / 4:
-                    self.paint_item(elevator_id, elevator_cur_floor[elevator_id], color, "           开门中")
-                elif elevator_door_process_bar[elevator_id] < 3 / 4:
-                    self.paint_item(elevator_id, elevator_cur_floor[elevator_id], color, "           等待中")
+                arrow = None
+            if arrow != self.drawn_arrows[elevator_id]:
+                self.drawn_arrows[elevator_id] = arrow
+                if arrow == ELEVATOR_STATE.UP:
+                    self.elevator_arrows[elevator_id].setPixmap(self.up_arrow)
+                elif arrow == ELEVATOR_STATE.DOWN:
+                    self.elevator_arrows[elevator_id].setPixmap(self.down_arrow)
                 else:
-                    self.paint_item(elevator_id, elevator_cur_floor[elevator_id], color, "           关门中")
-        mutex.unlock()
-
-        # 对外部来说，遍历任务，找出未完成的设为红色，其他设为默认None
-        for button in self.external_up_buttons:
-            button.setStyleSheet("background-color : None")
-        for button in self.external_down_buttons:
-            button.setStyleSheet("background-color : None")
-        mutex.lock()
-        for outer_task in outer_tasks_list:
-            if outer_task.task_state != TASK_STATE.FINISHED:
-                if outer_task.move_state == MOVE_STATE.UP:  # 注意index
-                    self.external_up_buttons[outer_task.floor].setStyleSheet("background-color : yellow")
-                elif outer_task.move_state == MOVE_STATE.DOWN:
-                    self.external_down_buttons[outer_task.floor].setStyleSheet("background-color : yellow")
-        mutex.unlock()
-
-        # 将电梯对应的状态栏涂上色
-        mutex.lock()
-        for elevator_id in range(ELEVATOR_NUM):
-            if elevator_states[elevator_id] != ELEVATOR_STATE.FAULT:
-                if elevator_states[elevator_id] != ELEVATOR_STATE.DOOR:
-                    if elevator_states[elevator_id] == ELEVATOR_STATE.UP:
-                        self.paint_item(elevator_id, elevator_cur_floor[elevator_id], ELEVATOR_COLOR,
-                                        "         电梯上升中")
-                    elif elevator_states[elevator_id] == ELEVATOR_STATE.DOWN:
-                        self.paint_item(elevator_id, elevator_cur_floor[elevator_id], ELEVATOR_COLOR,
-                                        "         电梯下降中")
+                    self.elevator_arrows[elevator_id].setPixmap(self.no_arrow)
+            if cur_floor != self.drawn_floors[elevator_id]:
+                self.drawn_floors[elevator_id] = cur_floor
+                self.elevator_lcds[elevator_id].display(cur_floor + 1)
+
+            # 对内部的按钮，如果在开门或关门状态的话，则设进度条（取量化后的调色板）
+            if state == ELEVATOR_STATE.DOOR:
+                button_style, color, word = self.door_palette[round(door_process_bar * DOOR_PALETTE_STEPS)]
+                self.set_style_sheet(self.elevator_buttons[elevator_id][cur_floor], button_style)
+                self.paint_item(elevator_id, cur_floor, color, word)
+
+            # 将电梯对应的状态栏涂上色
+            if state != ELEVATOR_STATE.FAULT:
+                if state != ELEVATOR_STATE.DOOR:
+                    if state == ELEVATOR_STATE.UP:
+                        self.paint_item(elevator_id, cur_floor, ELEVATOR_COLOR, "         电梯上升中")
+                    elif state == ELEVATOR_STATE.DOWN:
+                        self.paint_item(elevator_id, cur_floor, ELEVATOR_COLOR, "         电梯下降中")
                     else:
-                        self.paint_item(elevator_id, elevator_cur_floor[elevator_id], ELEVATOR_COLOR)
-                if elevator_cur_floor[elevator_id] > 0:
-                    self.paint_item(elevator_id, elevator_cur_floor[elevator_id] - 1)
-                if elevator_cur_floor[elevator_id] < 19:
-                    self.paint_item(elevator_id, elevator_cur_floor[elevator_id] + 1)
-        mutex.unlock()
+                        self.paint_item(elevator_id, cur_floor, ELEVATOR_COLOR)
+
+        # 对外部来说，只更新亮灭发生变化的按钮：未完成的设为黄色，其他设为默认None
+        outer_mutex.lock()
+        pending_tasks = {outer_task.key for outer_task in outer_tasks_queue}
+        outer_mutex.unlock()
+        for floor, move_state in pending_tasks ^ self.drawn_pending_tasks:
+            if move_state == MOVE_STATE.UP:  # 注意index
+                button = self.external_up_buttons[floor]
+            else:
+                button = self.external_down_buttons[floor]
+            if (floor, move_state) in pending_tasks:
+                self.set_style_sheet(button, HALL_BUTTON_LIT_STYLE)
+            else:
+                self.set_style_sheet(button, DEFAULT_STYLE)
+        self.drawn_pending_tasks = pending_tasks
 
 class Elevator(QThread):
     """
@@ -336,7 +621,10 @@ class Elevator(QThread):
         """
         super().__init__()
         self.elevator_id = elevator_id
-        self.time_slice = 100
+        self.time_slice = TIME_SLICE
+        # 本电梯的锁与条件变量
+        self.mutex = elevator_mutexes[elevator_id]
+        self.condition = elevator_conditions[elevator_id]
 
     def move_one_floor(self, move_state):
         """
@@ -348,16 +636,17 @@ class Elevator(QThread):
             elevator_states[self.elevator_id] = ELEVATOR_STATE.UP
         elif move_state == MOVE_STATE.DOWN:
             elevator_states[self.elevator_id] = ELEVATOR_STATE.DOWN
+        controller_metrics.car_state(self.elevator_id, elevator_states[self.elevator_id])
 
         # 运行过程
         has_slept_time = 0
         # 模拟上升用时
         while has_slept_time != MOVE_TIME:
-            mutex.unlock()
+            self.mutex.unlock()
 
-            self.msleep(self.time_slice)
+            speed_control.wait_slice(self, self.time_slice)
             has_slept_time += self.time_slice
-            mutex.lock()
+            self.mutex.lock()
 
             # 出故障
             if elevator_states[self.elevator_id] == ELEVATOR_STATE.FAULT:
@@ -370,6 +659,7 @@ class Elevator(QThread):
         elif move_state == MOVE_STATE.DOWN:
             elevator_cur_floor[self.elevator_id] += MOVE_STATE.DOWN.value
         elevator_states[self.elevator_id] = ELEVATOR_STATE.NORMAL
+        controller_metrics.car_state(self.elevator_id, ELEVATOR_STATE.NORMAL)
 
         # 电梯故障，则进入故障处理
         if elevator_states[self.elevator_id] == ELEVATOR_STATE.FAULT:
@@ -378,98 +668,144 @@ class Elevator(QThread):
     def door_operation(self):
         """
         电梯门操作，开门-等待-关门
+        :return: 开关门是否正常完成（中途故障则为False）
         """
         # 电梯门用时
         door_open_time = 0
         elevator_states[self.elevator_id] = ELEVATOR_STATE.DOOR
+        controller_metrics.car_state(self.elevator_id, ELEVATOR_STATE.DOOR)
         while True:
             if elevator_states[self.elevator_id] == ELEVATOR_STATE.FAULT:
                 self.trouble_solving()
-                break
+                return False
             # 门正在打开
             if elevator_states[self.elevator_id] == ELEVATOR_STATE.DOOR:
                 # 开锁，以便别的线程运行
-                mutex.unlock()
-                self.msleep(self.time_slice)
+                self.mutex.unlock()
+                speed_control.wait_slice(self, self.time_slice)
                 door_open_time += self.time_slice
                 # 锁回来
-                mutex.lock()
+                self.mutex.lock()
                 elevator_door_process_bar[self.elevator_id] = door_open_time / DOOR_OPEN_AND_CLOSE_TIME
             # 完成操作
             if elevator_door_process_bar[self.elevator_id] == 1.0:
                 # 开关门动作完成
                 elevator_states[self.elevator_id] = ELEVATOR_STATE.NORMAL
+                controller_metrics.car_state(self.elevator_id, ELEVATOR_STATE.NORMAL)
+                controller_metrics.car_stop(self.elevator_id)
                 # 重新记为0
                 elevator_door_process_bar[self.elevator_id] = 0.0
-                break
+                return True
+
+    def finish_outer_task(self, floor, descending):
+        """
+        停靠完成后，完成该层与电梯离开方向相同的外部任务（见 HallCallQueue.finish_stop，调用时持有本电梯锁）
+        :param floor: 停靠的楼层
+        :param descending: 本次停靠取自下行目标(True)还是上行目标(False)
+        """
+        # 按加锁顺序，先释放电梯锁再获取outer锁
+        self.mutex.unlock()
+        outer_mutex.lock()
+        self.mutex.lock()
+        if descending:
+            target_queue = elevator_down_target_list[self.elevator_id]
+        else:
+            target_queue = elevator_up_target_list[self.elevator_id]
+        # 释放电梯锁期间该层又被分配给了本电梯（重新加入了目标），留到下一次停靠时完成
+        if floor not in target_queue:
+            up_targets = elevator_up_target_list[self.elevator_id]
+            down_targets = elevator_down_target_list[self.elevator_id]
+            move_state = elevator_move_states[self.elevator_id]
+            for outer_task in outer_tasks_queue.finish_stop(self.elevator_id, floor, move_state, up_targets,
+                                                            down_targets):
+                controller_metrics.task_finished(outer_task)
+                # 在本层换向：立即改为新的扫描方向，之后分配的请求按新方向加入目标
+                if outer_task.move_state != move_state:
+                    elevator_move_states[self.elevator_id] = outer_task.move_state
+                    controller_metrics.trip_end(self.elevator_id)
+        outer_mutex.unlock()
 
     def trouble_solving(self):
         """
-        电梯出现故障，处理措施
+        电梯出现故障，处理措施（调用时持有本电梯锁）
         """
         elevator_states[self.elevator_id] = ELEVATOR_STATE.FAULT
         elevator_door_process_bar[self.elevator_id] = 0.0
-        for outer_task in outer_tasks_list:
-            if outer_task.task_state == TASK_STATE.WAITING:
-                # 如果外界的需求恰好与电梯的目的地相符
-                if outer_task.floor in elevator_up_target_list[self.elevator_id] or outer_task.floor in \
-                        elevator_down_target_list[self.elevator_id]:
-                    # 把原先分配给它的任务交给outer重新分配
-                    outer_task.task_state = TASK_STATE.UNASSIGNED
-        elevator_up_target_list[self.elevator_id] = []
-        elevator_down_target_list[self.elevator_id] = []
+        elevator_up_target_list[self.elevator_id].clear()
+        elevator_down_target_list[self.elevator_id].clear()
+
+        # 按加锁顺序，先释放电梯锁再获取outer锁
+        self.mutex.unlock()
+        outer_mutex.lock()
+        # 把原先分配给它的任务交给outer重新分配
+        outer_tasks_queue.release(self.elevator_id)
+        # 通知outer重新分配
+        outer_condition.wakeAll()
+        outer_mutex.unlock()
+        self.mutex.lock()
 
     def run(self):
         """
          电梯运行线程
         """
         while True:
-            mutex.lock()
+            self.mutex.lock()
+            # 故障状态：处理完后挂起，等待报警键恢复
             if elevator_states[self.elevator_id] == ELEVATOR_STATE.FAULT:
                 self.trouble_solving()
-                mutex.unlock()
+                if elevator_states[self.elevator_id] == ELEVATOR_STATE.FAULT:
+                    self.condition.wait(self.mutex)
+                self.mutex.unlock()
                 continue
 
+            # 本次循环是否有事可做
+            has_work = False
+
             # 向上扫描状态
             if elevator_move_states[self.elevator_id] == MOVE_STATE.UP:
-                if elevator_up_target_list[self.elevator_id] != []:
+                if elevator_up_target_list[self.elevator_id]:
                     # 到层开门
                     if elevator_up_target_list[self.elevator_id][0] == elevator_cur_floor[self.elevator_id]:
-                        self.door_operation()
                         # 到达以后 把完成的任务删去(分为内外两方面)
-                        for outer_task in outer_tasks_list:
-                            if outer_task.floor == elevator_cur_floor[self.elevator_id] :
-                                outer_task.task_state = TASK_STATE.FINISHED  # 交给outer处理
-                                break
-
-                        if elevator_up_target_list != []:
-                            elevator_up_target_list[self.elevator_id].pop(0)
+                        if self.door_operation():
+                            elevator_up_target_list[self.elevator_id].pop()
+                            self.finish_outer_task(elevator_cur_floor[self.elevator_id], False)
+                        has_work = True
 
                     elif elevator_up_target_list[self.elevator_id][0] > elevator_cur_floor[self.elevator_id]:
                         self.move_one_floor(MOVE_STATE.UP)
+                        has_work = True
                 # 当没有上行目标而出现下行目标时 更换状态
-                elif elevator_up_target_list[self.elevator_id] == [] and elevator_down_target_list[
-                    self.elevator_id] != []:
+                elif elevator_down_target_list[self.elevator_id]:
                     elevator_move_states[self.elevator_id] = MOVE_STATE.DOWN
+                    controller_metrics.trip_end(self.elevator_id)
+                    has_work = True
 
             # 向下扫描状态时(与上面一致)
             elif elevator_move_states[self.elevator_id] == MOVE_STATE.DOWN:
-                if elevator_down_target_list[self.elevator_id] != []:
+                if elevator_down_target_list[self.elevator_id]:
                     if elevator_down_target_list[self.elevator_id][0] == elevator_cur_floor[self.elevator_id]:
-                        self.door_operation()
-                        for outer_task in outer_tasks_list:
-                            if outer_task.floor == elevator_cur_floor[self.elevator_id]:
-                                outer_task.task_state = TASK_STATE.FINISHED
-                                break
-                        if elevator_down_target_list != []:
-                            elevator_down_target_list[self.elevator_id].pop(0)
+                        if self.door_operation():
+                            elevator_down_target_list[self.elevator_id].pop()
+                            self.finish_outer_task(elevator_cur_floor[self.elevator_id], True)
+                        has_work = True
                     elif elevator_down_target_list[self.elevator_id][0] < elevator_cur_floor[self.elevator_id]:
                         self.move_one_floor(MOVE_STATE.DOWN)
-                elif elevator_down_target_list[self.elevator_id] == [] and elevator_up_target_list[
-                    self.elevator_id] != []:
+                        has_work = True
+                elif elevator_up_target_list[self.elevator_id]:
                     elevator_move_states[self.elevator_id] = MOVE_STATE.UP
+                    controller_metrics.trip_end(self.elevator_id)
+                    has_work = True
+
+            if not has_work:
+                controller_metrics.trip_end(self.elevator_id)
+                # 无事可做时挂起，直到有新的目标楼层或报警键被按下
+                self.condition.wait(self.mutex)
+            self.mutex.unlock()
 
-            mutex.unlock()
+            if has_work:
+                # 电梯位置/状态发生变化，通知outer（可能有之前无法分配的任务）
+                notify_outer()
 
 
 class Outer(QThread):
@@ -477,132 +813,195 @@ class Outer(QThread):
     外部任务处理线程
     """
 
-    def __init__(self):
+    def __init__(self, strategy=None):
+        """
+        :param strategy: 外部任务的分配策略（dispatch.DispatchStrategy），默认为最短预计到达时间（eta）
+        """
         super().__init__()
+        if strategy is None:
+            strategy = dispatch.EtaMinimizing()
+        self.strategy = strategy
 
     @staticmethod
-    def find_best_elevator(outer_task):
+    def snapshot():
+        '''
+        逐台电梯加锁复制状态，不同时持有多把电梯锁
+        :return: (状态, 楼层, 扫描方向, 上行目标, 下行目标) 各为每台电梯一项的列表
+        '''
+        states = []
+        cur_floors = []
+        move_states = []
+        up_targets = []
+        down_targets = []
+        for i in range(ELEVATOR_NUM):
+            elevator_mutexes[i].lock()
+            states.append(elevator_states[i])
+            cur_floors.append(elevator_cur_floor[i])
+            move_states.append(elevator_move_states[i])
+            up_targets.append(elevator_up_target_list[i].copy())
+            down_targets.append(elevator_down_target_list[i].copy())
+            elevator_mutexes[i].unlock()
+        return states, cur_floors, move_states, up_targets, down_targets
+
+    def find_best_elevator(self, outer_task):
         '''
-        找到距离最近的电梯编号
+        按分配策略找到负责该任务的电梯编号
         :param outer_task: 外界点击所产生的任务
         :return:
         '''
-        min_distance = FLOOR_NUM + 1
-        # 初始化分配电梯
-        target_id = -1
-        # 依次访问每一个电梯
-        for i in range(ELEVATOR_NUM):
-            # 如果电梯处于故障状态，则跳过它
-            if elevator_states[i] == ELEVATOR_STATE.FAULT:
-                continue
-
-            # 如果已经上行/下行了，则上/下移动一层
-            origin = elevator_cur_floor[i]
-            if elevator_states[i] == ELEVATOR_STATE.UP:
-                origin += 1
-            elif elevator_states[i] == ELEVATOR_STATE.DOWN:
-                origin -= 1
-
-            if elevator_move_states[i] == MOVE_STATE.UP:
-                targets = elevator_up_target_list[i]
-            else:  # down
-                targets = elevator_down_target_list[i]
-
-            # 根据到outer_task的距离计算优先级
-            # 如果电梯运行方向无任务，则直接算绝对值
-            if targets == []:
-                distance = abs(origin - outer_task.floor)
-            # 若电梯朝着按键所在楼层运行，且运动方向与外部请求相同
-            elif elevator_move_states[i] == outer_task.move_state and (
-                    (outer_task.move_state == MOVE_STATE.UP and outer_task.floor >= origin) or
-                    (outer_task.move_state == MOVE_STATE.DOWN and outer_task.floor <= origin)):
-                distance = abs(origin - outer_task.floor)
-            # 其余情况则算最远任务楼层到目标楼层的绝对值和最远楼层到当前电梯楼层的绝对值之和
-            else:
-                distance = abs(origin - targets[-1]) + abs(outer_task.floor - targets[-1])
-
-            # 寻找最小值
-            if distance < min_distance:
-                min_distance = distance
-                target_id = i
-
-        return target_id
+        return self.strategy.choose(outer_task, *self.snapshot())
 
     @staticmethod
-    def add_task_to_queue(elevator_id, out_task, descending=False):
+    def add_task_to_queue(elevator_id, out_task):
         '''
-        将任务加入相应的队列中
+        将任务加入相应的队列中（调用时持有outer锁，内部获取对应电梯锁）
         :param elevator_id: 相应电梯
         :param out_task: 产生的任务
-        :param descending: 升序/降序
         :return:
         '''
-        target_queue = []
-        if descending == True:
-            target_queue = elevator_down_target_list[elevator_id]
-        else:
-            target_queue = elevator_up_target_list[elevator_id]
-        if out_task.floor not in target_queue:
-            target_queue.append(out_task.floor)
-            target_queue.sort(reverse=descending)
-            # 设为等待态
-            out_task.task_state = TASK_STATE.WAITING
+        elevator_mutexes[elevator_id].lock()
+        # 状态可能在复制之后发生了变化，按最新状态决定加入哪个队列
+        descending = None
+        if elevator_states[elevator_id] != ELEVATOR_STATE.FAULT:
+            descending = elevator_core.choose_target_queue(
+                elevator_cur_floor[elevator_id], elevator_states[elevator_id], out_task,
+                elevator_move_states[elevator_id], elevator_up_target_list[elevator_id],
+                elevator_down_target_list[elevator_id])
+        if descending is not None:
+            if descending == True:
+                target_queue = elevator_down_target_list[elevator_id]
+            else:
+                target_queue = elevator_up_target_list[elevator_id]
+            outer_tasks_queue.assign(out_task, elevator_id, descending)
+            if elevator_core.add_task_to_queue(target_queue, out_task):
+                # 唤醒对应电梯
+                elevator_conditions[elevator_id].wakeAll()
+        elevator_mutexes[elevator_id].unlock()
 
     def run(self):
         while True:
             # 互斥锁
-            mutex.lock()
-            global outer_tasks_list
-
-            # 找到距离最短的电梯编号..
-            for outer_task in outer_tasks_list:
-                target_id = -1
-                # 如果该外部请求未被分配
-                if outer_task.task_state == TASK_STATE.UNASSIGNED:
+            outer_mutex.lock()
+
+            # 只处理等待分配的任务，本轮未能分配的放回队列，下次被唤醒时再试
+            outer_tasks = []
+            for _ in range(len(outer_tasks_queue.unassigned)):
+                outer_task = outer_tasks_queue.pop()
+                if outer_task is None:
+                    break
+                outer_tasks.append(outer_task)
+
+            # 批量分配的策略对本次取出的所有任务只复制一次状态，一起求解
+            batch = None
+            if outer_tasks and hasattr(self.strategy, "assign_batch"):
+                batch = self.strategy.assign_batch(outer_tasks, *self.snapshot())
+
+            for task_index, outer_task in enumerate(outer_tasks):
+                # 找到距离最短的电梯编号..
+                if batch is not None:
+                    target_id = batch[task_index]
+                else:
                     target_id = self.find_best_elevator(outer_task)
 
-                    # 找到了电梯，添加任务到target_id电梯的对应数组下
-                    if target_id != -1:
-                        # 若该电梯恰好在对应请求楼层，但运行状态与需求状态不同
-                        # 或该电梯还未到达该层
-                        if (elevator_cur_floor[target_id] == outer_task.floor
-                            and outer_task.move_state == MOVE_STATE.UP and elevator_states[
-                                target_id] != ELEVATOR_STATE.UP) \
-                                or elevator_cur_floor[target_id] < outer_task.floor:
-                            self.add_task_to_queue(target_id, outer_task)
-                        elif (elevator_cur_floor[target_id] == outer_task.floor
-                              and outer_task.move_state == MOVE_STATE.DOWN and elevator_states[
-                                  target_id] != ELEVATOR_STATE.DOWN) \
-                                or elevator_cur_floor[target_id] > outer_task.floor:
-                            self.add_task_to_queue(target_id, outer_task, descending=True)
-
-            # 将已经完成的任务从请求清单上删除
-            outer_tasks_list = [task for task in outer_tasks_list if task.task_state != TASK_STATE.FINISHED]
+                # 找到了电梯，添加任务到target_id电梯的对应数组下
+                if target_id != -1:
+                    self.add_task_to_queue(target_id, outer_task)
+                if outer_task.task_state == TASK_STATE.WAITING:
+                    controller_metrics.task_assigned(outer_task)
+                elif outer_task.task_state == TASK_STATE.UNASSIGNED:
+                    outer_tasks_queue.requeue(outer_task)
+
+            # 挂起，直到有新的外部任务或电梯状态发生变化
+            outer_condition.wait(outer_mutex)
 
             # 互斥锁打开
-            mutex.unlock()
+            outer_mutex.unlock()
+
+
+class TrafficFeeder:
+    """
+    把 traffic.generate 生成的乘客按到达时刻送入界面：
+    到达时按下外部方向按钮，所在楼层有电梯开门时进入电梯并按下目的楼层
+    """
+
+    def __init__(self, main_window, passengers):
+        """
+        :param main_window: 主界面
+        :param passengers: 按到达时刻排序的乘客列表
+        """
+        self.main_window = main_window
+        self.pending = deque(passengers)  # 尚未到达的乘客
+        self.waiting = []  # 在候梯厅等待的乘客
+        self.start_time = speed_control.virtual_time()
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(self.interval())
+
+    @staticmethod
+    def interval():
+        '''
+        检查间隔随时间倍率缩短，快进时也不会错过电梯开门
+        :return: 毫秒
+        '''
+        return max(10, 100 // speed_control.speed)
+
+    def tick(self):
+        '''
+        定时检查乘客的到达与上车
+        :return:
+        '''
+        if self.timer.interval() != self.interval():
+            self.timer.setInterval(self.interval())
+        now = speed_control.virtual_time() - self.start_time
+        while self.pending and self.pending[0].arrival_time <= now:
+            passenger = self.pending.popleft()
+            self.waiting.append(passenger)
+            self.main_window.external_direction_button_clicked(passenger.origin, passenger.move_state)
+        if not self.waiting:
+            return
+
+        # 正在开关门的电梯所在的楼层
+        door_floors = {}
+        for elevator_id in range(ELEVATOR_NUM):
+            elevator_mutexes[elevator_id].lock()
+            if elevator_states[elevator_id] == ELEVATOR_STATE.DOOR:
+                door_floors.setdefault(elevator_cur_floor[elevator_id], elevator_id)
+            elevator_mutexes[elevator_id].unlock()
+
+        still_waiting = []
+        for passenger in self.waiting:
+            elevator_id = door_floors.get(passenger.origin)
+            if elevator_id is None:
+                still_waiting.append(passenger)
+                continue
+            passenger.elevator_id = elevator_id
+            self.main_window.elevator_button_clicked(elevator_id, passenger.destination)
+        self.waiting = still_waiting
 
 
 if __name__ == '__main__':
 
-    # 全局变量
-    elevator_up_target_list = [[] for _ in range(ELEVATOR_NUM)]  # 每台电梯当前需要向上运行处理的目标有哪些（升序排序）
-    elevator_down_target_list = [[] for _ in range(ELEVATOR_NUM)]  # 每台电梯当前需要向下运行处理的目标有哪些（降序排序）
-    outer_tasks_list = []  # 外部按钮产生的需求(是OuterTask类的对象)
-    elevator_states = [ELEVATOR_STATE.NORMAL for _ in range(ELEVATOR_NUM)]  # 每组电梯的状态
-    elevator_cur_floor = [0 for _ in range(ELEVATOR_NUM)]  # 每台电梯的当前楼层
-    elevator_door_process_bar = [0.0 for _ in range(ELEVATOR_NUM)]  # 开/关门进度条
-    elevator_move_states = [MOVE_STATE.UP for _ in range(ELEVATOR_NUM)]  # 每台电梯当前的扫描运行状态
+    # python main.py --record <轨迹文件>：记录所有按键，之后可用 call_trace.py 在模拟器中重放
+    recorder = None
+    if "--record" in sys.argv:
+        trace_path = sys.argv[sys.argv.index("--record") + 1]
+        recorder = TraceRecorder(trace_path, clock=speed_control.virtual_time)
 
     # 调整窗口大小
     os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
     app = QtWidgets.QApplication(sys.argv)
 
     # 展示ui界面
-    main_window = MainWindow()
+    main_window = MainWindow(recorder)
+
+    # python main.py --strategy <分配策略>：eta（默认）、nearest、look、batch、round_robin
+    strategy = None
+    if "--strategy" in sys.argv:
+        strategy = dispatch.make_strategy(sys.argv[sys.argv.index("--strategy") + 1])
 
     # 开启外部处理线程
-    outer = Outer()
+    outer = Outer(strategy)
     outer.start()
 
     # 开启电梯线程
@@ -610,4 +1009,35 @@ if __name__ == '__main__':
     for elevator in elevators:
         elevator.start()
 
-    sys.exit(app.exec_())
+    # python main.py --traffic <客流模式> [每分钟人数]：用生成的客流代替手动点击
+    feeder = None
+    if "--traffic" in sys.argv:
+        traffic_args = sys.argv[sys.argv.index("--traffic") + 1:]
+        profile = traffic_args[0]
+        rate = float(traffic_args[1]) if len(traffic_args) > 1 and not traffic_args[1].startswith("--") else 20
+        feeder = TrafficFeeder(main_window, traffic.generate(profile, rate=rate, seed=0))
+
+    # python main.py --metrics-file <文件>：定期把 metrics() 写入JSON文件
+    metrics_timer = None
+    if "--metrics-file" in sys.argv:
+        metrics_path = sys.argv[sys.argv.index("--metrics-file") + 1]
+        metrics_timer = QTimer()
+        metrics_timer.timeout.connect(lambda: dump_json(metrics_path, metrics()))
+        metrics_timer.start(METRICS_DUMP_INTERVAL)
+
+    # python main.py --metrics-port [端口]：在 http://127.0.0.1:端口/metrics 提供Prometheus格式的指标
+    metrics_http = None
+    if "--metrics-port" in sys.argv:
+        port_args = sys.argv[sys.argv.index("--metrics-port") + 1:]
+        port = int(port_args[0]) if port_args and port_args[0].isdigit() else metrics_server.DEFAULT_PORT
+        metrics_http = metrics_server.start_server(metrics, port)
+
+    exit_code = app.exec_()
+    if metrics_http is not None:
+        metrics_http.shutdown()
+    if recorder is not None:
+        recorder.close()
+    if "--profile-locks" in sys.argv:
+        from lock_profile import profiler
+        profiler.report()
+    sys.exit(exit_code)
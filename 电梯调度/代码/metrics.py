@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+
+from elevator_core import ELEVATOR_NUM, ELEVATOR_STATE
+
+# 直方图的桶上界（毫秒）
+LATENCY_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000)
+
+
+def monotonic_ms():
+    return int(time.monotonic() * 1000)
+
+
+class Histogram:
+    """
+    固定桶的直方图：每个桶记录不超过上界的样本数（累积），另记样本数、总和与最大值
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0 for _ in buckets]
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": dict(zip(self.buckets, self.counts)),
+        }
+
+
+class ControllerMetrics:
+    """
+    电梯控制器的运行指标
+    各线程在外部任务产生、分配、完成以及电梯状态改变时调用对应的方法；
+    内部只用一把很小的锁保护计数器，不会与 elevator_mutexes/outer_mutex 互相等待，
+    调用者持有任意一把全局锁时都可以调用
+    """
+
+    def __init__(self, elevator_num=ELEVATOR_NUM, clock=monotonic_ms):
+        """
+        :param elevator_num: 电梯数量
+        :param clock: 返回当前毫秒数的函数
+        """
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.start_time = clock()
+
+        self.hall_calls_total = 0  # 产生的外部任务数（合并后的）
+        self.hall_calls_assigned_total = 0  # 首次分配到电梯的外部任务数
+        self.hall_calls_finished_total = 0  # 完成的外部任务数
+        self.assignment_latency = Histogram()  # 按下按钮到首次分配的时间
+        self.wait_time = Histogram()  # 按下按钮到电梯开门完成的时间
+
+        # 每台电梯各状态累计的时间，以及当前状态开始的时刻
+        self.state_durations = [{state.name: 0 for state in ELEVATOR_STATE} for _ in range(elevator_num)]
+        self.car_states = [(ELEVATOR_STATE.NORMAL, self.start_time) for _ in range(elevator_num)]
+        # 行程：电梯从出发到空闲或换向为一趟，记录每趟的停靠次数
+        self.trip_stops = [0 for _ in range(elevator_num)]
+        self.trips_total = 0
+        self.stops_total = 0
+
+    def task_created(self, outer_task):
+        '''
+        产生了新的外部任务，记录按下按钮的时刻
+        '''
+        with self.lock:
+            outer_task.created_time = self.clock()
+            self.hall_calls_total += 1
+
+    def task_assigned(self, outer_task):
+        '''
+        外部任务分配到了电梯（故障后的重新分配不重复计入）
+        '''
+        with self.lock:
+            if outer_task.assigned_time is not None:
+                return
+            outer_task.assigned_time = self.clock()
+            self.hall_calls_assigned_total += 1
+            self.assignment_latency.observe(outer_task.assigned_time - outer_task.created_time)
+
+    def task_finished(self, outer_task):
+        '''
+        外部任务完成
+        '''
+        with self.lock:
+            outer_task.finished_time = self.clock()
+            self.hall_calls_finished_total += 1
+            self.wait_time.observe(outer_task.finished_time - outer_task.created_time)
+
+    def car_state(self, elevator_id, state):
+        '''
+        电梯进入新的状态，结算上一个状态持续的时间
+        '''
+        with self.lock:
+            now = self.clock()
+            old_state, since = self.car_states[elevator_id]
+            self.state_durations[elevator_id][old_state.name] += now - since
+            self.car_states[elevator_id] = (state, now)
+
+    def car_stop(self, elevator_id):
+        '''
+        电梯完成一次停靠（开关门）
+        '''
+        with self.lock:
+            self.trip_stops[elevator_id] += 1
+
+    def trip_end(self, elevator_id):
+        '''
+        电梯空闲或换向，结束当前行程（没有停靠的行程不计）
+        '''
+        with self.lock:
+            stops = self.trip_stops[elevator_id]
+            if stops:
+                self.trips_total += 1
+                self.stops_total += stops
+                self.trip_stops[elevator_id] = 0
+
+    def snapshot(self, pending_hall_calls=None, unassigned_hall_calls=None, car_states=None, car_floors=None):
+        '''
+        读取所有指标
+        :param pending_hall_calls: 尚未完成的外部任务数（由调用者在outer锁内读出）
+        :param unassigned_hall_calls: 等待分配的外部任务数
+        :param car_states: 每台电梯的当前状态（由调用者在电梯锁内读出）
+        :param car_floors: 每台电梯的当前楼层
+        :return: 可直接转为JSON的字典，时间单位为毫秒
+        '''
+        with self.lock:
+            now = self.clock()
+            durations = []
+            for elevator_id, totals in enumerate(self.state_durations):
+                totals = dict(totals)
+                # 当前状态持续到现在的时间也计入
+                state, since = self.car_states[elevator_id]
+                totals[state.name] += now - since
+                durations.append(totals)
+            result = {
+                "uptime_ms": now - self.start_time,
+                "hall_calls_total": self.hall_calls_total,
+                "hall_calls_assigned_total": self.hall_calls_assigned_total,
+                "hall_calls_finished_total": self.hall_calls_finished_total,
+                "assignment_latency_ms": self.assignment_latency.snapshot(),
+                "wait_time_ms": self.wait_time.snapshot(),
+                "car_state_durations_ms": durations,
+                "trips_total": self.trips_total,
+                "stops_per_trip": self.stops_total / self.trips_total if self.trips_total else 0.0,
+            }
+        if pending_hall_calls is not None:
+            result["pending_hall_calls"] = pending_hall_calls
+        if unassigned_hall_calls is not None:
+            result["unassigned_hall_calls"] = unassigned_hall_calls
+        if car_states is not None:
+            result["car_states"] = [state.name for state in car_states]
+        if car_floors is not None:
+            result["car_floors"] = list(car_floors)
+        return result
+
+
+def dump_json(path, data):
+    '''
+    写出指标文件（先写临时文件再替换，读取方不会读到写了一半的内容）
+    '''
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
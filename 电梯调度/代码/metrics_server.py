@@ -0,0 +1,121 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from elevator_core import ELEVATOR_STATE
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_PORT = 9108
+
+
+def format_value(value):
+    '''
+    样本值：整数原样输出，浮点数保留全部有效数字（%g只有6位，大的计数器会被舍入，rate()随之出错）
+    '''
+    if isinstance(value, int):
+        return "%d" % value
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def format_histogram(lines, name, help_text, histogram):
+    '''
+    把 metrics.Histogram 的快照（毫秒）写成Prometheus直方图（秒）
+    '''
+    lines.append("# HELP %s %s" % (name, help_text))
+    lines.append("# TYPE %s histogram" % name)
+    for bound, cumulative in histogram["buckets"].items():
+        lines.append('%s_bucket{le="%s"} %s' % (name, format_value(bound / 1000), format_value(cumulative)))
+    lines.append('%s_bucket{le="+Inf"} %s' % (name, format_value(histogram["count"])))
+    lines.append("%s_sum %s" % (name, format_value(histogram["sum"] / 1000)))
+    lines.append("%s_count %s" % (name, format_value(histogram["count"])))
+
+
+def format_metric(lines, name, metric_type, help_text, samples):
+    '''
+    :param samples: (标签字典, 数值) 的列表
+    '''
+    lines.append("# HELP %s %s" % (name, help_text))
+    lines.append("# TYPE %s %s" % (name, metric_type))
+    for labels, value in samples:
+        if labels:
+            label_text = ",".join('%s="%s"' % (key, value) for key, value in labels.items())
+            lines.append("%s{%s} %s" % (name, label_text, format_value(value)))
+        else:
+            lines.append("%s %s" % (name, format_value(value)))
+
+
+def format_prometheus(snapshot):
+    '''
+    把界面进程中 metrics() 的结果转为Prometheus文本格式
+    :param snapshot: 指标字典（见 metrics.ControllerMetrics.snapshot）
+    :return: 文本
+    '''
+    lines = []
+    format_metric(lines, "elevator_uptime_seconds", "gauge", "控制器运行时间",
+                  [({}, snapshot["uptime_ms"] / 1000)])
+    format_metric(lines, "elevator_hall_calls_total", "counter", "产生的外部任务数",
+                  [({}, snapshot["hall_calls_total"])])
+    format_metric(lines, "elevator_hall_calls_assigned_total", "counter", "首次分配到电梯的外部任务数",
+                  [({}, snapshot["hall_calls_assigned_total"])])
+    format_metric(lines, "elevator_hall_calls_finished_total", "counter", "完成的外部任务数",
+                  [({}, snapshot["hall_calls_finished_total"])])
+    if "pending_hall_calls" in snapshot:
+        format_metric(lines, "elevator_pending_hall_calls", "gauge", "尚未完成的外部任务数",
+                      [({}, snapshot["pending_hall_calls"])])
+    if "unassigned_hall_calls" in snapshot:
+        format_metric(lines, "elevator_unassigned_hall_calls", "gauge", "等待分配的外部任务数",
+                      [({}, snapshot["unassigned_hall_calls"])])
+    format_histogram(lines, "elevator_assignment_latency_seconds", "按下按钮到分配电梯的时间",
+                     snapshot["assignment_latency_ms"])
+    format_histogram(lines, "elevator_wait_time_seconds", "按下按钮到电梯开门完成的时间", snapshot["wait_time_ms"])
+    if "car_states" in snapshot:
+        format_metric(lines, "elevator_car_state", "gauge", "电梯当前状态（当前状态为1）",
+                      [({"car": car, "state": state.name}, 1 if state.name == current else 0)
+                       for car, current in enumerate(snapshot["car_states"]) for state in ELEVATOR_STATE])
+    if "car_floors" in snapshot:
+        format_metric(lines, "elevator_car_floor", "gauge", "电梯当前楼层（从1开始）",
+                      [({"car": car}, floor + 1) for car, floor in enumerate(snapshot["car_floors"])])
+    format_metric(lines, "elevator_car_state_seconds_total", "counter", "电梯处于各状态的累计时间",
+                  [({"car": car, "state": state}, duration / 1000)
+                   for car, durations in enumerate(snapshot["car_state_durations_ms"])
+                   for state, duration in durations.items()])
+    format_metric(lines, "elevator_trips_total", "counter", "完成的行程数", [({}, snapshot["trips_total"])])
+    format_metric(lines, "elevator_stops_per_trip", "gauge", "每趟行程的平均停靠次数",
+                  [({}, snapshot["stops_per_trip"])])
+    return "\n".join(lines) + "\n"
+
+
+def start_server(get_snapshot, port=DEFAULT_PORT, host="127.0.0.1"):
+    '''
+    在后台线程中启动只监听本机的HTTP服务，GET /metrics 返回Prometheus格式的指标
+    :param get_snapshot: 返回指标字典的函数（如界面进程中的 metrics，只在锁内复制数据）
+    :param port: 端口
+    :param host: 监听地址，默认只允许本机访问
+    :return: HTTP服务对象，调用 shutdown() 停止
+    '''
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = format_prometheus(get_snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不在控制台打印每一次抓取
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
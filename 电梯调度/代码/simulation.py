@@ -0,0 +1,436 @@
+import heapq
+from enum import Enum
+
+import dispatch
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, CAR_CAPACITY, TRANSFER_TIME, \
+    DOOR, ELEVATOR_STATE, MOVE_STATE, Passenger, ElevatorGroup
+
+
+# 离散事件的种类
+class EVENT(Enum):
+    HALL_CALL = 0  # 外部按钮被按下（乘客到达）
+    CAR_CALL = 1  # 电梯内部按钮被按下
+    FLOOR_REACHED = 2  # 电梯到达相邻楼层
+    DOOR_OPENED = 3  # 电梯门完全打开，乘客进出
+    DOOR_CLOSED = 4  # 电梯门关闭，开关门动作完成，电梯可以离开
+    FAULT = 5  # 报警键按下，电梯进入故障
+    REPAIR = 6  # 再次按下报警键，电梯恢复正常
+    PASSENGER_ARRIVAL = 7  # 乘客到达候梯厅，按下外部按钮，进入电梯后按下目的楼层
+    DISPATCH = 9  # 批量分配的周期到达
+
+
+class Simulation(ElevatorGroup):
+    """
+    无界面、无线程的离散事件电梯模拟器
+    用虚拟时钟（毫秒）代替 msleep，事件堆按发生时刻排序，
+    电梯的扫描、开关门、故障处理以及外部任务分配规则与 main.py 中的线程完全一致（由 ElevatorGroup 实现）
+    """
+
+    def __init__(self, elevator_num=ELEVATOR_NUM, floor_num=FLOOR_NUM, move_time=MOVE_TIME,
+                 door_time=DOOR_OPEN_AND_CLOSE_TIME, vectorized=False, strategy=None,
+                 destination_dispatch=False, capacity=CAR_CAPACITY, transfer_time=TRANSFER_TIME,
+                 batch_interval=None):
+        """
+        初始化模拟器
+        :param elevator_num: 电梯数量
+        :param floor_num: 楼层数
+        :param move_time: 移动一层所需时间（毫秒）
+        :param door_time: 一次开关门所需时间（毫秒）
+        :param vectorized: 是否用numpy批量计算外部任务的最近电梯（电梯与任务很多时使用，分配结果不变）
+        :param strategy: 外部任务的分配策略，dispatch.STRATEGIES中的名称或 DispatchStrategy 对象，
+            None表示默认策略（eta，vectorized时为nearest，见 dispatch.default_strategy）
+        :param destination_dispatch: 目的楼层分配模式：乘客在候梯厅输入目的楼层，登记时即由
+            dispatch.DestinationGrouping 分配电梯（此时不使用strategy）
+        :param capacity: 每台电梯最多容纳的乘客数，None表示不限；满载的电梯不参与分配
+        :param transfer_time: 每位乘客进出电梯所需时间（毫秒），开关门后电梯按进出人数多停留
+        :param batch_interval: 批量分配的周期（毫秒）：等待分配的外部任务攒到下一个周期一起分配，
+            只用于提供 assign_batch 的策略（如batch）且不在目的楼层分配模式下，None表示每个事件之后立即分配
+        """
+        if strategy is None:
+            strategy = dispatch.default_strategy(vectorized)
+        if isinstance(strategy, str):
+            strategy = dispatch.make_strategy(strategy, move_time, door_time)
+        if vectorized and not isinstance(strategy, dispatch.NearestCar):
+            raise ValueError("numpy批量打分只支持nearest分配策略")
+        super().__init__(elevator_num, floor_num, move_time, door_time, strategy, capacity, transfer_time)
+        self.vectorized = vectorized
+        self.destination_dispatch = destination_dispatch
+        self.destination_strategy = dispatch.DestinationGrouping(move_time, door_time)
+        # 目的楼层分配模式在乘客登记后立即分配，不使用strategy，也不按周期分配
+        if destination_dispatch or not hasattr(self.strategy, "assign_batch"):
+            batch_interval = None
+        self.batch_interval = batch_interval
+        self.dispatch_scheduled = False  # 是否已经安排了下一次批量分配
+
+        # 虚拟时钟
+        self.now = 0
+        # 事件堆：(发生时刻, 序号, 事件, 参数)
+        self.events = []
+        self.event_seq = 0
+
+        # 电梯是否正在执行移动/开关门动作
+        self.elevator_busy = [False for _ in range(elevator_num)]
+        # 电梯动作的版本号，故障时递增，使尚未发生的动作事件失效
+        self.elevator_generation = [0 for _ in range(elevator_num)]
+        # 电梯完成移动/开关门动作所用的总时间（毫秒），用于计算利用率
+        self.elevator_busy_time = [0 for _ in range(elevator_num)]
+
+        # 目的楼层分配模式：等待分配电梯的乘客、已分配但尚未上车的乘客
+        self.unassigned_passengers = []
+        self.assigned_passengers = [[] for _ in range(elevator_num)]
+
+        # 已经处理的事件数
+        self.event_count = 0
+
+    def current_time(self):
+        return self.now
+
+    def schedule(self, time, event, *args):
+        """
+        向事件堆中加入一个事件
+        :param time: 发生时刻（毫秒）
+        :param event: 事件种类
+        :param args: 事件参数
+        """
+        heapq.heappush(self.events, (time, self.event_seq, event, args))
+        self.event_seq += 1
+
+    def hall_call(self, time, floor_id, move_state):
+        """
+        在time时刻按下floor_id层的外部方向按钮
+        """
+        self.schedule(time, EVENT.HALL_CALL, floor_id, move_state)
+
+    def car_call(self, time, elevator_id, floor_id):
+        """
+        在time时刻按下elevator_id号电梯内部的floor_id层按钮
+        """
+        self.schedule(time, EVENT.CAR_CALL, elevator_id, floor_id)
+
+    def passenger(self, time, origin, destination):
+        """
+        在time时刻有一位乘客到达origin层，要去destination层
+        :return: 乘客对象，模拟结束后可读取其进出电梯的时刻
+        """
+        passenger = Passenger(origin, destination, time)
+        self.schedule(time, EVENT.PASSENGER_ARRIVAL, passenger)
+        return passenger
+
+    def fault(self, time, elevator_id):
+        """
+        在time时刻按下elevator_id号电梯的报警键
+        """
+        self.schedule(time, EVENT.FAULT, elevator_id)
+
+    def repair(self, time, elevator_id):
+        """
+        在time时刻将elevator_id号电梯恢复正常
+        """
+        self.schedule(time, EVENT.REPAIR, elevator_id)
+
+    def run(self, until=None):
+        """
+        依次处理事件，直到事件堆为空或虚拟时钟到达until
+        :param until: 模拟截止时刻（毫秒），None表示处理完所有事件
+        :return: 当前虚拟时刻
+        """
+        while self.events:
+            if until is not None and self.events[0][0] > until:
+                break
+            time, _, event, args = heapq.heappop(self.events)
+            self.now = time
+            self.event_count += 1
+            self.handle_event(event, *args)
+        if until is not None and until > self.now:
+            self.now = until
+        return self.now
+
+    def handle_event(self, event, *args):
+        """
+        处理单个事件，随后进行一次外部任务分配
+        """
+        touched = []
+        if event == EVENT.HALL_CALL:
+            self.external_direction_button_clicked(*args)
+        elif event == EVENT.PASSENGER_ARRIVAL:
+            self.passenger_arrival(*args)
+        elif event == EVENT.CAR_CALL:
+            if self.elevator_button_clicked(*args):
+                touched.append(args[0])
+        elif event == EVENT.FAULT:
+            self.elevator_fault(*args)
+        elif event == EVENT.REPAIR:
+            if self.elevator_repair(*args):
+                touched.append(args[0])
+        elif event == EVENT.DISPATCH:
+            self.dispatch_scheduled = False
+            waiting = len(self.outer_tasks_queue.unassigned)
+            touched.extend(self.dispatch())
+            # 本次一个任务也没有分配出去时不再安排下一次分配，等电梯到站、恢复等事件之后再安排，
+            # 否则无法分配的任务（如所有电梯故障）会不断产生分配事件，模拟永远不会结束
+            retry = len(self.outer_tasks_queue.unassigned) < waiting
+        else:
+            elevator_id, generation = args
+            # 电梯在动作途中发生了故障，该事件作废
+            if generation != self.elevator_generation[elevator_id]:
+                return
+            if event == EVENT.FLOOR_REACHED:
+                self.floor_reached(elevator_id)
+                touched.append(elevator_id)
+            elif event == EVENT.DOOR_OPENED:
+                self.door_opened(elevator_id)
+            elif event == EVENT.DOOR_CLOSED:
+                self.door_closed(elevator_id)
+                touched.append(elevator_id)
+
+        if self.batch_interval is None:
+            touched.extend(self.dispatch())
+        elif self.outer_tasks_queue.unassigned and not self.dispatch_scheduled and not self.destination_dispatch \
+                and (event != EVENT.DISPATCH or retry):
+            self.dispatch_scheduled = True
+            self.schedule(self.now + self.batch_interval, EVENT.DISPATCH)
+        for elevator_id in touched:
+            self.advance(elevator_id)
+
+    def passenger_arrival(self, passenger):
+        """
+        乘客到达候梯厅并按下对应方向的外部按钮（目的楼层分配模式下为输入目的楼层，等待分配电梯）
+        """
+        if self.destination_dispatch:
+            self.unassigned_passengers.append(passenger)
+            return
+        super().passenger_arrival(passenger)
+
+    def elevator_fault(self, elevator_id):
+        """
+        报警键按下：电梯回到一楼并进入故障处理，尚未发生的动作事件作废
+        :return: 电梯是否由正常进入故障
+        """
+        if self.elevator_states[elevator_id] == ELEVATOR_STATE.FAULT:
+            return False
+        self.elevator_busy[elevator_id] = False
+        self.elevator_generation[elevator_id] += 1
+        # 已分配给该电梯、尚未上车的乘客重新分配
+        for passenger in self.assigned_passengers[elevator_id]:
+            passenger.elevator_id = None
+            self.unassigned_passengers.append(passenger)
+        self.assigned_passengers[elevator_id] = []
+        return super().elevator_fault(elevator_id)
+
+    def advance(self, elevator_id):
+        """
+        空闲电梯决定下一步动作（对应 Elevator.run 的一次循环）
+        """
+        if self.elevator_busy[elevator_id] or self.elevator_states[elevator_id] == ELEVATOR_STATE.FAULT:
+            return
+        if self.destination_dispatch:
+            self.place_pickups(elevator_id)
+        action = self.next_action(elevator_id)
+        if action == DOOR:
+            self.start_door_operation(elevator_id)
+        elif action is not None:
+            self.start_move_one_floor(elevator_id, action)
+
+    def start_move_one_floor(self, elevator_id, move_state):
+        """
+        电梯开始移动一层楼
+        """
+        if move_state == MOVE_STATE.UP:
+            self.elevator_states[elevator_id] = ELEVATOR_STATE.UP
+        else:
+            self.elevator_states[elevator_id] = ELEVATOR_STATE.DOWN
+        self.elevator_busy[elevator_id] = True
+        self.schedule(self.now + self.move_time, EVENT.FLOOR_REACHED, elevator_id,
+                      self.elevator_generation[elevator_id])
+
+    def floor_reached(self, elevator_id):
+        """
+        电梯到达相邻楼层
+        """
+        if self.elevator_states[elevator_id] == ELEVATOR_STATE.UP:
+            self.elevator_cur_floor[elevator_id] += MOVE_STATE.UP.value
+        else:
+            self.elevator_cur_floor[elevator_id] += MOVE_STATE.DOWN.value
+        self.elevator_states[elevator_id] = ELEVATOR_STATE.NORMAL
+        self.elevator_busy[elevator_id] = False
+        self.elevator_busy_time[elevator_id] += self.move_time
+
+    def start_door_operation(self, elevator_id):
+        """
+        电梯开始开门-等待-关门
+        """
+        self.elevator_states[elevator_id] = ELEVATOR_STATE.DOOR
+        self.elevator_busy[elevator_id] = True
+        # 进度条前1/4为开门阶段
+        self.schedule(self.now + self.door_time // 4, EVENT.DOOR_OPENED, elevator_id,
+                      self.elevator_generation[elevator_id])
+
+    def door_opened(self, elevator_id):
+        """
+        电梯门完全打开，完成停靠、乘客进出；有乘客进出时关门前按人数多停留一段时间
+        :return: 进出电梯的人数
+        """
+        moved = super().door_opened(elevator_id)
+        dwell = self.door_time - self.door_time // 4 + moved * self.transfer_time
+        self.elevator_busy_time[elevator_id] += self.door_time + moved * self.transfer_time
+        self.schedule(self.now + dwell, EVENT.DOOR_CLOSED, elevator_id, self.elevator_generation[elevator_id])
+        return moved
+
+    def door_closed(self, elevator_id):
+        """
+        电梯门关闭，电梯恢复空闲
+        """
+        self.elevator_states[elevator_id] = ELEVATOR_STATE.NORMAL
+        self.elevator_busy[elevator_id] = False
+
+    def load(self, elevator_id):
+        """
+        :return: 分配时计入电梯载客量的乘客数，目的楼层分配模式下计入已分配未上车的乘客
+        """
+        load = len(self.riding_passengers[elevator_id])
+        if self.destination_dispatch:
+            load += len(self.assigned_passengers[elevator_id])
+        return load
+
+    def exchange_passengers(self, elevator_id, finished_tasks):
+        """
+        到站的乘客下车，候梯的乘客上车（目的楼层分配模式下为分配给该电梯的乘客）
+        :param finished_tasks: 本次完成的外部任务列表
+        :return: 进出电梯的人数
+        """
+        if self.destination_dispatch:
+            return self.alight_passengers(elevator_id) + self.board_assigned_passengers(elevator_id)
+        return super().exchange_passengers(elevator_id, finished_tasks)
+
+    def board_assigned_passengers(self, elevator_id):
+        """
+        目的楼层分配模式：分配给该电梯、在当前楼层等待的乘客上车
+        只有去向与电梯接下来的运行方向一致的乘客上车，其余乘客的出发楼层按其方向重新加入停靠，
+        超出容量没能上车的乘客重新分配
+        :return: 上车的人数
+        """
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        here = [passenger for passenger in self.assigned_passengers[elevator_id] if passenger.origin == cur_floor]
+        if not here:
+            return 0
+        up_targets = self.elevator_up_target_list[elevator_id]
+        down_targets = self.elevator_down_target_list[elevator_id]
+        move_state = self.elevator_move_states[elevator_id]
+        # 电梯接下来的运行方向：当前方向还有目标则不变，否则跟随第一位乘客（避免在两组反向的乘客之间来回折返）
+        if (move_state == MOVE_STATE.UP and up_targets) or (move_state == MOVE_STATE.DOWN and down_targets):
+            next_state = move_state
+        else:
+            next_state = here[0].move_state
+        self.elevator_move_states[elevator_id] = next_state
+        self.assigned_passengers[elevator_id] = [passenger for passenger in self.assigned_passengers[elevator_id]
+                                                 if passenger.origin != cur_floor or
+                                                 passenger.move_state != next_state]
+        boarded = 0
+        for passenger in here:
+            if passenger.move_state == next_state:
+                if self.free_space(elevator_id) > 0:
+                    passenger.board_time = self.now
+                    self.riding_passengers[elevator_id].append(passenger)
+                    self.elevator_button_clicked(elevator_id, passenger.destination)
+                    boarded += 1
+                else:
+                    passenger.elevator_id = None
+                    self.unassigned_passengers.append(passenger)
+            elif passenger.move_state == MOVE_STATE.UP:
+                up_targets.add(cur_floor)
+            else:
+                down_targets.add(cur_floor)
+        return boarded
+
+    def place_pickups(self, elevator_id):
+        """
+        目的楼层分配模式：反向乘客的出发楼层等电梯折返时再停靠
+        电梯上行、前方更高处还有停靠时，在上方等待下行的乘客只能等电梯折返后上车，
+        把其出发楼层从上行停靠移到下行停靠，电梯去程不再白停一次（下行时反之）
+        """
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        up_targets = self.elevator_up_target_list[elevator_id]
+        down_targets = self.elevator_down_target_list[elevator_id]
+        move_state = self.elevator_move_states[elevator_id]
+        if move_state == MOVE_STATE.UP:
+            same_targets, other_targets = up_targets, down_targets
+        else:
+            same_targets, other_targets = down_targets, up_targets
+        if not same_targets:
+            return
+        # 去程还需要停靠的楼层：同向候梯乘客的出发楼层与车内乘客的目的楼层
+        needed = {passenger.origin for passenger in self.assigned_passengers[elevator_id]
+                  if passenger.move_state == move_state}
+        needed.update(passenger.destination for passenger in self.riding_passengers[elevator_id])
+        farthest = same_targets[-1]
+        for passenger in self.assigned_passengers[elevator_id]:
+            floor = passenger.origin
+            if passenger.move_state == move_state or floor in needed or floor == farthest:
+                continue
+            ahead = floor > cur_floor if move_state == MOVE_STATE.UP else floor < cur_floor
+            if ahead and same_targets.discard(floor):
+                other_targets.add(floor)
+
+    def add_pickup(self, elevator_id, floor_id):
+        """
+        目的楼层分配模式：把乘客的出发楼层加入电梯的停靠
+        """
+        cur_floor = self.elevator_cur_floor[elevator_id]
+        state = self.elevator_states[elevator_id]
+        if floor_id > cur_floor:
+            self.elevator_up_target_list[elevator_id].add(floor_id)
+        elif floor_id < cur_floor:
+            self.elevator_down_target_list[elevator_id].add(floor_id)
+        # 电梯正离开该层，之后折返
+        elif state == ELEVATOR_STATE.UP:
+            self.elevator_down_target_list[elevator_id].add(floor_id)
+        elif state == ELEVATOR_STATE.DOWN:
+            self.elevator_up_target_list[elevator_id].add(floor_id)
+        # 电梯停在该层：加入当前扫描方向的停靠，随即开门（正在开关门时关门后直接上车，乘客进出阶段则再开一次门）
+        else:
+            if self.elevator_move_states[elevator_id] == MOVE_STATE.UP:
+                self.elevator_up_target_list[elevator_id].add(floor_id)
+            else:
+                self.elevator_down_target_list[elevator_id].add(floor_id)
+
+    def dispatch_passengers(self):
+        """
+        目的楼层分配模式：为登记了目的楼层的乘客分配电梯
+        :return: 加入了新停靠的电梯编号
+        """
+        touched = []
+        passengers = self.unassigned_passengers
+        self.unassigned_passengers = []
+        for passenger in passengers:
+            committed = [self.assigned_passengers[i] + self.riding_passengers[i] for i in range(self.elevator_num)]
+            target_id = self.destination_strategy.choose(
+                passenger, self.available_states(), self.elevator_cur_floor, self.elevator_move_states,
+                self.elevator_up_target_list, self.elevator_down_target_list, committed)
+            if target_id == -1:
+                self.unassigned_passengers.append(passenger)
+                continue
+            passenger.elevator_id = target_id
+            self.assigned_passengers[target_id].append(passenger)
+            self.add_pickup(target_id, passenger.origin)
+            touched.append(target_id)
+        return touched
+
+    def make_scorer(self, outer_tasks, states):
+        """
+        :return: vectorized时为numpy批量打分对象，否则为None
+        """
+        if not self.vectorized:
+            return None
+        # numpy只在批量打分时需要
+        from vector_dispatch import BatchScorer
+        return BatchScorer(outer_tasks, states, self.elevator_cur_floor, self.elevator_move_states,
+                           self.elevator_up_target_list, self.elevator_down_target_list, self.floor_num)
+
+    def dispatch(self):
+        """
+        外部任务分配（对应 Outer.run 的一次循环）
+        :return: 加入了新目标楼层的电梯编号
+        """
+        if self.destination_dispatch:
+            return self.dispatch_passengers()
+        return super().dispatch()
@@ -0,0 +1,112 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import benchmark
+import dispatch
+from elevator_core import ELEVATOR_NUM, FLOOR_NUM, MOVE_TIME, DOOR_OPEN_AND_CLOSE_TIME, CAR_CAPACITY
+
+# 表格中每种配置输出的指标
+SWEEP_METRICS = ("wait_avg", "wait_p95", "wait_p99", "journey_avg", "journey_p95", "passengers_per_hour",
+                 "stops_per_trip", "car_utilization_avg")
+CONFIG_FIELDS = ("workload", "elevator_num", "floor_num", "move_time", "door_time", "strategy", "destination_dispatch")
+
+
+def run_config(config):
+    '''
+    在子进程中运行一种配置
+    :param config: 配置字典，字段见CONFIG_FIELDS
+    :return: (配置, 指标)
+    '''
+    metrics = benchmark.run_workload(
+        benchmark.WORKLOADS[config["workload"]], config["elevator_num"], config["floor_num"], config["move_time"],
+        config["door_time"], strategy=config["strategy"], destination_dispatch=config["destination_dispatch"],
+        capacity=config["capacity"])
+    return config, metrics
+
+
+def make_configs(workloads, elevator_nums, floor_nums, move_times, door_times, strategies, capacity=CAR_CAPACITY):
+    '''
+    各参数的笛卡尔积
+    :param strategies: 分配策略名称，"destination"表示目的楼层分配模式
+    :return: 配置字典列表
+    '''
+    configs = []
+    for workload, elevator_num, floor_num, move_time, door_time, strategy in itertools.product(
+            workloads, elevator_nums, floor_nums, move_times, door_times, strategies):
+        destination = strategy == "destination"
+        configs.append({
+            "workload": workload, "elevator_num": elevator_num, "floor_num": floor_num, "move_time": move_time,
+            "door_time": door_time, "strategy": dispatch.NearestCar.name if destination else strategy,
+            "destination_dispatch": destination, "capacity": capacity,
+        })
+    return configs
+
+
+def sweep(configs, jobs=None):
+    '''
+    用进程池并行运行所有配置（每种配置相互独立，耗时随核数线性下降）
+    :param configs: 配置字典列表
+    :param jobs: 进程数，None为CPU核数
+    :return: 与configs顺序相同的 (配置, 指标) 列表
+    '''
+    if jobs == 1:
+        return [run_config(config) for config in configs]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(run_config, configs))
+
+
+def write_table(path, rows):
+    '''
+    把结果写成CSV表格，每种配置一行
+    '''
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CONFIG_FIELDS + SWEEP_METRICS)
+        for config, metrics in rows:
+            writer.writerow([config[field] for field in CONFIG_FIELDS] + [metrics[key] for key in SWEEP_METRICS])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="并行运行电梯数量、楼层数、运行时间与分配策略的参数组合")
+    parser.add_argument("-w", "--workload", nargs="+", default=list(benchmark.WORKLOADS),
+                        choices=sorted(benchmark.WORKLOADS), help="客流，默认全部")
+    parser.add_argument("-e", "--elevators", nargs="+", type=int, default=[ELEVATOR_NUM], help="电梯数量")
+    parser.add_argument("-f", "--floors", nargs="+", type=int, default=[FLOOR_NUM], help="楼层数")
+    parser.add_argument("-m", "--move-time", nargs="+", type=int, default=[MOVE_TIME], help="移动一层的时间（毫秒）")
+    parser.add_argument("--door-time", nargs="+", type=int, default=[DOOR_OPEN_AND_CLOSE_TIME],
+                        help="开关门时间（毫秒）")
+    parser.add_argument("-s", "--strategy", nargs="+", default=[dispatch.EtaMinimizing.name],
+                        choices=sorted(dispatch.STRATEGIES) + ["destination"],
+                        help="分配策略，默认eta，destination为目的楼层分配模式")
+    parser.add_argument("-c", "--capacity", type=int, default=CAR_CAPACITY, help="轿厢额定载客人数，0表示不限")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument("-o", "--output", default="sweep_results.csv", help="结果表格（CSV）")
+    args = parser.parse_args(argv)
+
+    configs = make_configs(args.workload, args.elevators, args.floors, args.move_time, args.door_time,
+                           args.strategy, args.capacity or None)
+    start = time.perf_counter()
+    rows = sweep(configs, args.jobs)
+    elapsed = time.perf_counter() - start
+    write_table(args.output, rows)
+
+    print("%-10s %4s %4s %6s %6s %-12s %8s %8s %8s %8s" % (
+        "workload", "cars", "楼层", "move", "door", "strategy", "候梯均值", "候梯P95", "行程均值", "人/小时"))
+    for config, metrics in rows:
+        strategy = "destination" if config["destination_dispatch"] else config["strategy"]
+        print("%-10s %4d %4d %6d %6d %-12s %8s %8s %8s %8.0f" % (
+            config["workload"], config["elevator_num"], config["floor_num"], config["move_time"],
+            config["door_time"], strategy, benchmark.format_seconds(metrics["wait_avg"]),
+            benchmark.format_seconds(metrics["wait_p95"]), benchmark.format_seconds(metrics["journey_avg"]),
+            metrics["passengers_per_hour"]))
+    print("%d种配置，%d个进程，用时%.1fs，结果已写入%s" % (len(configs), args.jobs or os.cpu_count(), elapsed, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+asyncio控制器的单元测试（时间倍率很大，每个测试只需零点几秒）
+运行：python -m pytest -q 或 python -m unittest test_async_core
+"""
+import asyncio
+import unittest
+
+import traffic
+from async_core import AsyncElevatorSystem, run_traffic
+from elevator_core import ELEVATOR_STATE
+
+SPEED = 100.0
+
+
+async def wait_delivered(system, passengers, timeout=600000):
+    """
+    等待乘客全部送达（最多timeout毫秒控制器时间），随后停止控制器
+    """
+    deadline = system.now() + timeout
+    while len(system.delivered_passengers) < len(passengers) and system.now() < deadline:
+        await system.sleep(500)
+    await system.stop()
+
+
+class AsyncElevatorSystemTest(unittest.TestCase):
+
+    def test_run_traffic_delivers_everyone(self):
+        system, passengers = asyncio.run(run_traffic(3, 10, traffic.LUNCH, 20, 60 * 1000, SPEED, "eta", seed=1))
+        self.assertTrue(passengers)
+        self.assertEqual(len(system.delivered_passengers), len(passengers))
+        for passenger in system.delivered_passengers:
+            self.assertLessEqual(passenger.arrival_time, passenger.board_time)
+            self.assertLess(passenger.board_time, passenger.alight_time)
+
+    def test_capacity_and_transfer_time(self):
+        async def scenario():
+            system = AsyncElevatorSystem(1, 10, speed=SPEED, capacity=2, transfer_time=1000)
+            system.start()
+            passengers = [system.passenger(0, 5) for _ in range(3)]
+            loads = []
+            while len(system.delivered_passengers) < len(passengers):
+                loads.append(len(system.riding_passengers[0]))
+                await system.sleep(100)
+            await system.stop()
+            return passengers, loads
+
+        passengers, loads = asyncio.run(scenario())
+        # 载客量为2：第三位乘客等电梯送完前两位、回到一楼后才上车
+        self.assertLessEqual(max(loads), 2)
+        self.assertEqual(sorted(passenger.board_time is not None for passenger in passengers), [True] * 3)
+        first, second, third = sorted(passengers, key=lambda passenger: passenger.board_time)
+        self.assertEqual(first.board_time, second.board_time)
+        self.assertGreater(third.board_time, second.alight_time)
+        # 开关门2s，两人上车多停2s，再上行5层
+        self.assertGreaterEqual(first.alight_time - first.board_time, 2000 + 5000)
+
+    def test_fault_requeues_riders(self):
+        async def scenario():
+            system = AsyncElevatorSystem(2, 10, speed=SPEED)
+            system.start()
+            passenger = system.passenger(3, 8)
+            while passenger.board_time is None:
+                await system.sleep(100)
+            elevator_id = passenger.elevator_id
+            await system.sleep(2000)
+            system.fault(elevator_id)
+            self.assertEqual(system.elevator_states[elevator_id], ELEVATOR_STATE.FAULT)
+            self.assertEqual(system.riding_passengers[elevator_id], [])
+            await wait_delivered(system, [passenger])
+            return passenger, elevator_id
+
+        passenger, elevator_id = asyncio.run(scenario())
+        # 在一楼重新候梯，由另一台电梯送达
+        self.assertEqual(passenger.origin, 0)
+        self.assertIsNotNone(passenger.alight_time)
+        self.assertNotEqual(passenger.elevator_id, elevator_id)
+
+    def test_hall_call_kept_while_all_faulted(self):
+        async def scenario():
+            system = AsyncElevatorSystem(2, 10, speed=SPEED)
+            system.start()
+            system.fault(0)
+            system.fault(1)
+            passenger = system.passenger(5, 0)
+            await system.sleep(5000)
+            self.assertIsNone(passenger.board_time)
+            system.repair(1)
+            await wait_delivered(system, [passenger])
+            return passenger
+
+        passenger = asyncio.run(scenario())
+        # 电梯恢复后分配，乘客没有被丢下
+        self.assertIsNotNone(passenger.alight_time)
+        self.assertEqual(passenger.elevator_id, 1)
+        self.assertGreaterEqual(passenger.board_time, 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+benchmark 中指标统计与基准比较的单元测试
+运行：python -m pytest -q 或 python -m unittest test_benchmark
+"""
+import unittest
+
+import benchmark
+import traffic
+
+
+def metrics(wait_avg=10.0, delivered=100, per_hour=1000.0):
+    """
+    :return: 只包含比较用到的指标的结果
+    """
+    return {"wait_avg": wait_avg, "wait_p95": wait_avg and wait_avg * 3, "wait_p99": wait_avg and wait_avg * 4,
+            "journey_avg": wait_avg and wait_avg * 2, "journey_p95": wait_avg and wait_avg * 5,
+            "journey_p99": wait_avg and wait_avg * 6, "passengers_delivered": delivered,
+            "passengers_per_hour": per_hour}
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_within_tolerance(self):
+        baseline = {"lunch": metrics()}
+        self.assertEqual(benchmark.compare({"lunch": metrics(wait_avg=10.4, per_hour=960.0)}, baseline, 0.05), [])
+
+    def test_slower_wait(self):
+        baseline = {"lunch": metrics()}
+        regressions = benchmark.compare({"lunch": metrics(wait_avg=11.0)}, baseline, 0.05)
+        self.assertIn(("lunch", "wait_avg", 10.0, 11.0), regressions)
+
+    def test_nobody_delivered(self):
+        # 没有送达任何乘客时候梯等指标为None，不能当作没有变差
+        baseline = {"lunch": metrics()}
+        regressions = benchmark.compare({"lunch": metrics(wait_avg=None, delivered=0, per_hour=0.0)}, baseline, 0.05)
+        keys = {key for _, key, _, _ in regressions}
+        self.assertEqual(keys, set(benchmark.REGRESSION_METRICS + benchmark.THROUGHPUT_METRICS))
+        self.assertIn(("lunch", "wait_avg", 10.0, None), regressions)
+
+    def test_fewer_delivered(self):
+        baseline = {"lunch": metrics()}
+        regressions = benchmark.compare({"lunch": metrics(delivered=90, per_hour=900.0)}, baseline, 0.05)
+        self.assertEqual({key for _, key, _, _ in regressions}, {"passengers_delivered", "passengers_per_hour"})
+
+    def test_missing_baseline_data_skipped(self):
+        baseline = {"lunch": metrics(wait_avg=None, delivered=0, per_hour=0.0)}
+        self.assertEqual(benchmark.compare({"lunch": metrics()}, baseline, 0.05), [])
+        self.assertEqual(benchmark.compare({"up_peak": metrics(wait_avg=None)}, baseline, 0.05), [])
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_format_seconds(self):
+        self.assertEqual(benchmark.format_seconds(None), "n/a")
+        self.assertEqual(benchmark.format_seconds(12.345), "12.3s")
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 95), 95)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+        self.assertIsNone(benchmark.percentile([], 95))
+
+    def test_run_workload(self):
+        result = benchmark.run_workload((traffic.LUNCH, 20, 5, 1))
+        self.assertEqual(result["passengers_delivered"], result["passengers_generated"])
+        self.assertGreater(result["calls_served_per_hour"], 0)
+        self.assertEqual(result["passengers_per_hour"], round(result["passengers_delivered"] * 12, 1))
+        self.assertLessEqual(result["wait_avg"], result["wait_p95"])
+        self.assertLessEqual(result["wait_p95"], result["wait_p99"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+轨迹文件的单元测试：记录、写出、读回与在模拟器中重放
+运行：python -m pytest -q 或 python -m unittest test_call_trace
+"""
+import os
+import tempfile
+import unittest
+
+import call_trace
+from elevator_core import MOVE_STATE
+from simulation import Simulation
+
+
+class FakeClock:
+    """
+    手动推进的毫秒时钟
+    """
+
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+
+def record_incident(recorder, clock):
+    """
+    录一段按键：外部请求、内部按钮、故障与恢复
+    """
+    recorder.hall_call(5, MOVE_STATE.UP)
+    clock.now += 500
+    recorder.hall_call(12, MOVE_STATE.DOWN)
+    clock.now += 3000
+    recorder.car_call(1, 9)
+    recorder.fault(2)
+    clock.now += 20000
+    recorder.repair(2)
+
+
+class TraceRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "incident.trace")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_save_and_load(self):
+        clock = FakeClock()
+        recorder = call_trace.TraceRecorder(elevator_num=3, floor_num=15, clock=clock)
+        record_incident(recorder, clock)
+        recorder.save(self.path)
+        records, elevator_num, floor_num = call_trace.load_trace(self.path)
+        self.assertEqual((elevator_num, floor_num), (3, 15))
+        self.assertEqual(records, [
+            (0, call_trace.HALL_CALL, 5, 1),
+            (500, call_trace.HALL_CALL, 12, -1),
+            (3500, call_trace.CAR_CALL, 1, 9),
+            (3500, call_trace.FAULT, 2),
+            (23500, call_trace.REPAIR, 2),
+        ])
+        self.assertEqual(records, recorder.records)
+
+    def test_streamed_file_matches_save(self):
+        clock = FakeClock()
+        streamed = os.path.join(self.dir.name, "streamed.trace")
+        recorder = call_trace.TraceRecorder(streamed, elevator_num=3, floor_num=15, clock=clock)
+        record_incident(recorder, clock)
+        recorder.close()
+        recorder.save(self.path)
+        self.assertEqual(call_trace.load_trace(streamed), call_trace.load_trace(self.path))
+
+    def test_load_sorts_by_time_keeping_order(self):
+        call_trace.save_trace(self.path, [(200, call_trace.CAR_CALL, 0, 4), (100, call_trace.FAULT, 1),
+                                          (100, call_trace.REPAIR, 1)])
+        records, _, _ = call_trace.load_trace(self.path)
+        self.assertEqual([record[1] for record in records], [call_trace.FAULT, call_trace.REPAIR, call_trace.CAR_CALL])
+
+    def test_load_rejects_unknown_record(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(call_trace.trace_header(5, 20) + "\n100 X 3\n")
+        with self.assertRaises(ValueError):
+            call_trace.load_trace(self.path)
+
+    def test_replay_matches_direct_simulation(self):
+        clock = FakeClock()
+        recorder = call_trace.TraceRecorder(elevator_num=3, floor_num=15, clock=clock)
+        record_incident(recorder, clock)
+        recorder.save(self.path)
+        replayed = call_trace.replay(self.path)
+
+        sim = Simulation(3, 15)
+        sim.hall_call(0, 5, MOVE_STATE.UP)
+        sim.hall_call(500, 12, MOVE_STATE.DOWN)
+        sim.car_call(3500, 1, 9)
+        sim.fault(3500, 2)
+        sim.repair(23500, 2)
+        sim.run()
+        self.assertEqual(replayed.now, sim.now)
+        self.assertEqual([(task.floor, task.created_time, task.finished_time) for task in replayed.finished_tasks],
+                         [(task.floor, task.created_time, task.finished_time) for task in sim.finished_tasks])
+        self.assertEqual(len(replayed.finished_tasks), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+"""
+elevator_core 与 dispatch 中不依赖PyQt5的数据结构的单元测试
+运行：python -m pytest -q 或 python -m unittest test_core
+"""
+import itertools
+import random
+import unittest
+
+from dispatch import min_cost_assignment
+from elevator_core import MOVE_STATE, TASK_STATE, OuterTask, TargetSet, HallCallQueue
+
+FLOORS = 20
+
+
+class TargetSetTest(unittest.TestCase):
+    """
+    随机的加入/删除/取出/清空操作，与按停靠顺序排好的普通列表比较
+    """
+
+    def check(self, target_set, model):
+        self.assertEqual(list(target_set), model)
+        self.assertEqual(len(target_set), len(model))
+        for floor in range(FLOORS):
+            self.assertEqual(floor in target_set, floor in model)
+        if model:
+            self.assertEqual(target_set[0], model[0])
+            self.assertEqual(target_set[-1], model[-1])
+            self.assertEqual(target_set.lowest(), min(model))
+            self.assertEqual(target_set.highest(), max(model))
+        for low in range(-1, FLOORS + 1):
+            for high in range(low - 1, FLOORS + 1):
+                expected = sum(1 for floor in model if low <= floor <= high)
+                self.assertEqual(target_set.count_between(low, high), expected, (low, high))
+
+    def run_random(self, descending, seed):
+        rng = random.Random(seed)
+        target_set = TargetSet(descending, FLOORS)
+        model = []
+        for _ in range(300):
+            op = rng.random()
+            floor = rng.randrange(FLOORS)
+            if op < 0.5:
+                self.assertEqual(target_set.add(floor), floor not in model)
+                if floor not in model:
+                    model.append(floor)
+            elif op < 0.7:
+                self.assertEqual(target_set.discard(floor), floor in model)
+                if floor in model:
+                    model.remove(floor)
+            elif op < 0.95:
+                if model:
+                    self.assertEqual(target_set.pop(), model.pop(0))
+            else:
+                target_set.clear()
+                model.clear()
+            model.sort(reverse=descending)
+            self.check(target_set, model)
+
+    def test_up_targets(self):
+        for seed in range(5):
+            self.run_random(False, seed)
+
+    def test_down_targets(self):
+        for seed in range(5):
+            self.run_random(True, seed)
+
+    def test_copy_is_independent(self):
+        target_set = TargetSet(False, FLOORS)
+        for floor in (3, 7, 12):
+            target_set.add(floor)
+        copied = target_set.copy()
+        copied.add(5)
+        copied.pop()
+        self.assertEqual(list(target_set), [3, 7, 12])
+        self.assertEqual(target_set.count_between(0, FLOORS), 3)
+        self.assertEqual(list(copied), [5, 7, 12])
+        self.assertEqual(copied.count_between(4, 6), 1)
+
+
+class MinCostAssignmentTest(unittest.TestCase):
+    """
+    小矩阵上与穷举所有匹配的最小代价比较
+    """
+
+    def brute_force(self, cost):
+        n, m = len(cost), len(cost[0])
+        return min(sum(cost[i][columns[i]] for i in range(n))
+                   for columns in itertools.permutations(range(m), n))
+
+    def test_random_matrices(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            n = rng.randint(1, 5)
+            m = rng.randint(n, 6)
+            # 小范围的整数代价，包含大量相同代价的情形
+            cost = [[rng.randint(0, 9) for _ in range(m)] for _ in range(n)]
+            result = min_cost_assignment(cost)
+            self.assertEqual(len(result), n)
+            self.assertEqual(len(set(result)), n)
+            self.assertTrue(all(0 <= column < m for column in result))
+            self.assertEqual(sum(cost[i][result[i]] for i in range(n)), self.brute_force(cost), cost)
+
+    def test_unavailable_cost(self):
+        # 与 BatchOptimal.UNAVAILABLE 一样用极大的代价表示不能分配
+        big = 10 ** 12
+        cost = [[big, 5, big],
+                [3, big, big]]
+        self.assertEqual(min_cost_assignment(cost), [1, 0])
+
+
+class HallCallQueueTest(unittest.TestCase):
+
+    def test_push_coalesces_same_button(self):
+        queue = HallCallQueue()
+        first = OuterTask(5, MOVE_STATE.UP, created_time=0)
+        self.assertTrue(queue.push(first))
+        self.assertFalse(queue.push(OuterTask(5, MOVE_STATE.UP, created_time=1000)))
+        self.assertTrue(queue.push(OuterTask(5, MOVE_STATE.DOWN)))
+        self.assertEqual(len(queue), 2)
+        self.assertIs(queue.get(5, MOVE_STATE.UP), first)
+        self.assertIs(queue.pop(), first)
+        self.assertEqual(queue.pop().key, (5, MOVE_STATE.DOWN))
+        self.assertIsNone(queue.pop())
+
+    def test_requeue_and_assign(self):
+        queue = HallCallQueue()
+        task = OuterTask(3, MOVE_STATE.DOWN)
+        queue.push(task)
+        self.assertIs(queue.pop(), task)
+        queue.assign(task, 1, True)
+        self.assertEqual(task.task_state, TASK_STATE.WAITING)
+        self.assertEqual(queue.assigned_to(1), [task])
+        queue.requeue(task)
+        self.assertEqual(task.task_state, TASK_STATE.UNASSIGNED)
+        self.assertIsNone(task.elevator_id)
+        self.assertEqual(queue.assigned_to(1), [])
+        self.assertIs(queue.pop(), task)
+        self.assertIsNone(queue.pop())
+
+    def test_pop_skips_assigned_and_finished(self):
+        queue = HallCallQueue()
+        assigned = OuterTask(1, MOVE_STATE.UP)
+        finished = OuterTask(2, MOVE_STATE.UP)
+        waiting = OuterTask(3, MOVE_STATE.UP)
+        for task in (assigned, finished, waiting):
+            queue.push(task)
+        queue.assign(assigned, 0, False)
+        queue.finish(finished)
+        self.assertIs(queue.pop(), waiting)
+        self.assertIsNone(queue.pop())
+        self.assertNotIn(finished, queue)
+
+    def targets(self, up=(), down=()):
+        up_targets, down_targets = TargetSet(False, FLOORS), TargetSet(True, FLOORS)
+        for floor in up:
+            up_targets.add(floor)
+        for floor in down:
+            down_targets.add(floor)
+        return up_targets, down_targets
+
+    def test_finish_stop_keeps_opposite_call_for_return_sweep(self):
+        queue = HallCallQueue()
+        up = OuterTask(4, MOVE_STATE.UP)
+        down = OuterTask(4, MOVE_STATE.DOWN)
+        queue.push(up)
+        queue.push(down)
+        queue.assign(up, 0, False)
+        queue.assign(down, 0, False)
+        # 上行途中停靠、继续上行：只完成上行请求，下行请求留给折返后的下行目标
+        up_targets, down_targets = self.targets(up=[9])
+        self.assertEqual(queue.finish_stop(0, 4, MOVE_STATE.UP, up_targets, down_targets), [up])
+        self.assertEqual(up.task_state, TASK_STATE.FINISHED)
+        self.assertIs(queue.get(4, MOVE_STATE.DOWN), down)
+        self.assertEqual(queue.assigned_to(0), [down])
+        self.assertTrue(down.descending)
+        self.assertEqual(list(down_targets), [4])
+        self.assertEqual(list(up_targets), [9])
+        # 折返后在下行途中停靠
+        up_targets.pop()
+        down_targets.pop()
+        self.assertEqual(queue.finish_stop(0, 4, MOVE_STATE.DOWN, up_targets, down_targets), [down])
+        self.assertEqual(len(queue), 0)
+        self.assertFalse(up_targets or down_targets)
+
+    def test_finish_stop_serves_own_call_in_arrival_direction(self):
+        queue = HallCallQueue()
+        down = OuterTask(5, MOVE_STATE.DOWN)
+        queue.push(down)
+        queue.assign(down, 0, True)
+        # 下行到达、下方已无目标但上方还有：本电梯的下行请求仍然完成，不会在本层反复停靠
+        up_targets, down_targets = self.targets(up=[8])
+        self.assertEqual(queue.finish_stop(0, 5, MOVE_STATE.DOWN, up_targets, down_targets), [down])
+        self.assertFalse(down_targets)
+
+    def test_finish_stop_reversing_car_serves_new_direction(self):
+        queue = HallCallQueue()
+        down = OuterTask(7, MOVE_STATE.DOWN)
+        queue.push(down)
+        queue.assign(down, 0, False)
+        # 上行到达最高的目标后换向下行，完成下行请求
+        up_targets, down_targets = self.targets(down=[2])
+        self.assertEqual(queue.finish_stop(0, 7, MOVE_STATE.UP, up_targets, down_targets), [down])
+
+    def test_finish_stop_does_not_take_other_cars_opposite_calls(self):
+        queue = HallCallQueue()
+        own = OuterTask(6, MOVE_STATE.UP)
+        other = OuterTask(6, MOVE_STATE.DOWN)
+        queue.push(own)
+        queue.push(other)
+        queue.assign(own, 0, False)
+        queue.assign(other, 1, True)
+        up_targets, down_targets = self.targets(up=[10])
+        self.assertEqual(queue.finish_stop(0, 6, MOVE_STATE.UP, up_targets, down_targets), [own])
+        self.assertEqual(queue.assigned_to(1), [other])
+        self.assertNotIn(6, down_targets)
+
+    def test_finish_stop_fallback_follows_departing_direction(self):
+        queue = HallCallQueue()
+        up = OuterTask(2, MOVE_STATE.UP)
+        down = OuterTask(2, MOVE_STATE.DOWN)
+        queue.push(up)
+        queue.push(down)
+        queue.assign(up, 1, False)
+        # 电梯0在2楼停靠（为车内乘客），没有自己的任务：只完成与离开方向相同的请求，不论分配给了谁
+        up_targets, down_targets = self.targets(down=[0])
+        self.assertEqual(queue.finish_stop(0, 2, MOVE_STATE.DOWN, up_targets, down_targets), [down])
+        self.assertIs(queue.get(2, MOVE_STATE.UP), up)
+        up_targets, down_targets = self.targets(up=[5])
+        self.assertEqual(queue.finish_stop(0, 2, MOVE_STATE.DOWN, up_targets, down_targets), [up])
+        self.assertEqual(queue.assigned_to(1), [])
+        self.assertEqual(len(queue), 0)
+
+    def test_finish_stop_idle_car_prefers_sweep_direction(self):
+        queue = HallCallQueue()
+        up = OuterTask(8, MOVE_STATE.UP)
+        down = OuterTask(8, MOVE_STATE.DOWN)
+        queue.push(up)
+        queue.push(down)
+        # 空闲时两个方向都可以，只完成按优先顺序的第一个
+        up_targets, down_targets = self.targets()
+        self.assertEqual(queue.finish_stop(0, 8, MOVE_STATE.UP, up_targets, down_targets), [up])
+        self.assertEqual(queue.finish_stop(0, 8, MOVE_STATE.UP, up_targets, down_targets), [down])
+        self.assertEqual(queue.finish_stop(0, 8, MOVE_STATE.UP, up_targets, down_targets), [])
+
+    def test_release_requeues_only_that_car(self):
+        queue = HallCallQueue()
+        tasks = [OuterTask(floor, MOVE_STATE.UP) for floor in range(4)]
+        for task in tasks:
+            queue.push(task)
+            self.assertIs(queue.pop(), task)
+        queue.assign(tasks[0], 0, False)
+        queue.assign(tasks[1], 1, False)
+        queue.assign(tasks[2], 0, True)
+        queue.assign(tasks[3], 1, True)
+        released = queue.release(0)
+        self.assertEqual(set(task.key for task in released), {tasks[0].key, tasks[2].key})
+        self.assertEqual(queue.assigned_to(0), [])
+        self.assertEqual(queue.assigned_to(1), [tasks[1], tasks[3]])
+        self.assertEqual([queue.pop(), queue.pop(), queue.pop()], [tasks[0], tasks[2], None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+加锁统计的单元测试：调用位置的名称
+运行：python -m pytest -q 或 python -m unittest test_lock_profile
+"""
+import sys
+import unittest
+
+try:
+    import lock_profile
+except ImportError:
+    lock_profile = None
+
+
+class Holder:
+
+    def locked(self):
+        return lock_profile.call_site(1)
+
+    @staticmethod
+    def locked_static():
+        return lock_profile.call_site(1)
+
+
+def locked_function():
+    return lock_profile.call_site(1)
+
+
+@unittest.skipIf(lock_profile is None, "需要 PyQt5")
+class CallSiteTest(unittest.TestCase):
+
+    def test_method(self):
+        self.assertEqual(Holder().locked(), "Holder.locked")
+
+    def test_module_function(self):
+        self.assertIn("locked_function", locked_function())
+
+    @unittest.skipIf(sys.version_info < (3, 11), "co_qualname 需要 Python 3.11")
+    def test_static_method_keeps_class(self):
+        self.assertEqual(Holder.locked_static(), "Holder.locked_static")
+
+    @unittest.skipIf(sys.version_info >= (3, 11), "Python 3.11起使用 co_qualname")
+    def test_static_method_fallback(self):
+        site = Holder.locked_static()
+        self.assertTrue(site.startswith(__name__ + ":locked_static:"), site)
+
+
+if __name__ == "__main__":
+    unittest.main()
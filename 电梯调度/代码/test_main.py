@@ -0,0 +1,45 @@
+"""
+图形界面模块 main.py 的单元测试：控制器状态在导入时创建，导入后即可读取运行指标
+运行：python -m pytest -q 或 python -m unittest test_main
+"""
+import os
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+try:
+    import PyQt5  # noqa: F401
+except ImportError:
+    PyQt5 = None
+
+from elevator_core import ELEVATOR_NUM, ELEVATOR_STATE, MOVE_STATE, OuterTask, HallCallQueue
+
+
+@unittest.skipIf(PyQt5 is None, "需要 PyQt5")
+class MetricsOnImportTest(unittest.TestCase):
+
+    def setUp(self):
+        import main
+        self.main = main
+
+    def test_metrics_after_import(self):
+        snapshot = self.main.metrics()
+        self.assertEqual(snapshot["pending_hall_calls"], 0)
+        self.assertEqual(snapshot["unassigned_hall_calls"], 0)
+        self.assertEqual(snapshot["car_states"], [ELEVATOR_STATE.NORMAL.name] * ELEVATOR_NUM)
+        self.assertEqual(len(snapshot["car_floors"]), ELEVATOR_NUM)
+
+    def test_metrics_counts_hall_calls(self):
+        outer_tasks_queue = self.main.outer_tasks_queue
+        self.main.outer_tasks_queue = HallCallQueue()
+        self.main.outer_tasks_queue.push(OuterTask(3, MOVE_STATE.UP))
+        try:
+            snapshot = self.main.metrics()
+            self.assertEqual(snapshot["pending_hall_calls"], 1)
+            self.assertEqual(snapshot["unassigned_hall_calls"], 1)
+        finally:
+            self.main.outer_tasks_queue = outer_tasks_queue
+        self.assertEqual(self.main.metrics()["pending_hall_calls"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
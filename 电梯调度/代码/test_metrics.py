@@ -0,0 +1,117 @@
+"""
+运行指标与Prometheus文本格式的单元测试
+运行：python -m pytest -q 或 python -m unittest test_metrics
+"""
+import unittest
+
+import metrics_server
+from elevator_core import ELEVATOR_STATE, MOVE_STATE, OuterTask
+from metrics import ControllerMetrics, Histogram
+
+
+class FakeClock:
+    """
+    手动推进的毫秒时钟
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def sample_snapshot():
+    """
+    1台电梯：300ms时分配、4000ms时完成一个外部任务，1000ms起故障，5000ms时读取
+    """
+    clock = FakeClock()
+    controller_metrics = ControllerMetrics(elevator_num=1, clock=clock)
+    outer_task = OuterTask(3, MOVE_STATE.UP)
+    controller_metrics.task_created(outer_task)
+    clock.now = 300
+    controller_metrics.task_assigned(outer_task)
+    clock.now = 1000
+    controller_metrics.car_state(0, ELEVATOR_STATE.FAULT)
+    clock.now = 4000
+    controller_metrics.task_finished(outer_task)
+    controller_metrics.car_stop(0)
+    controller_metrics.trip_end(0)
+    clock.now = 5000
+    return controller_metrics.snapshot(1, 0, [ELEVATOR_STATE.FAULT], [0])
+
+
+class ControllerMetricsTest(unittest.TestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram(buckets=(100, 1000))
+        for value in (50, 100, 500, 5000):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {100: 2, 1000: 3})
+        self.assertEqual((snapshot["count"], snapshot["sum"], snapshot["max"]), (4, 5650, 5000))
+
+    def test_snapshot(self):
+        snapshot = sample_snapshot()
+        self.assertEqual(snapshot["uptime_ms"], 5000)
+        self.assertEqual(snapshot["assignment_latency_ms"]["sum"], 300)
+        self.assertEqual(snapshot["wait_time_ms"]["sum"], 4000)
+        # 当前状态持续到读取时刻的时间也计入
+        self.assertEqual(snapshot["car_state_durations_ms"][0][ELEVATOR_STATE.NORMAL.name], 1000)
+        self.assertEqual(snapshot["car_state_durations_ms"][0][ELEVATOR_STATE.FAULT.name], 4000)
+        self.assertEqual((snapshot["trips_total"], snapshot["stops_per_trip"]), (1, 1.0))
+        self.assertEqual(snapshot["car_states"], [ELEVATOR_STATE.FAULT.name])
+
+    def test_assignment_counted_once(self):
+        controller_metrics = ControllerMetrics(elevator_num=1, clock=FakeClock())
+        outer_task = OuterTask(3, MOVE_STATE.UP)
+        controller_metrics.task_created(outer_task)
+        controller_metrics.task_assigned(outer_task)
+        controller_metrics.task_assigned(outer_task)
+        self.assertEqual(controller_metrics.snapshot()["hall_calls_assigned_total"], 1)
+
+
+class PrometheusFormatTest(unittest.TestCase):
+
+    def test_format_value(self):
+        self.assertEqual(metrics_server.format_value(12345678901), "12345678901")
+        self.assertEqual(metrics_server.format_value(1234567.25), "1234567.25")
+        self.assertEqual(metrics_server.format_value(float("nan")), "NaN")
+        self.assertEqual(metrics_server.format_value(float("inf")), "+Inf")
+        self.assertEqual(metrics_server.format_value(float("-inf")), "-Inf")
+
+    def test_format_prometheus(self):
+        lines = metrics_server.format_prometheus(sample_snapshot()).splitlines()
+        self.assertIn("elevator_uptime_seconds 5.0", lines)
+        self.assertIn("elevator_hall_calls_total 1", lines)
+        self.assertIn("elevator_pending_hall_calls 1", lines)
+        self.assertIn("elevator_unassigned_hall_calls 0", lines)
+        # 直方图的单位转为秒，桶是累积的
+        self.assertIn('elevator_wait_time_seconds_bucket{le="2.5"} 0', lines)
+        self.assertIn('elevator_wait_time_seconds_bucket{le="5.0"} 1', lines)
+        self.assertIn('elevator_wait_time_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn("elevator_wait_time_seconds_sum 4.0", lines)
+        self.assertIn('elevator_car_state{car="0",state="FAULT"} 1', lines)
+        self.assertIn('elevator_car_state{car="0",state="NORMAL"} 0', lines)
+        self.assertIn('elevator_car_floor{car="0"} 1', lines)
+        self.assertIn('elevator_car_state_seconds_total{car="0",state="FAULT"} 4.0', lines)
+        self.assertIn("elevator_stops_per_trip 1.0", lines)
+
+    def test_every_metric_declared_once(self):
+        lines = metrics_server.format_prometheus(sample_snapshot()).splitlines()
+        types = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+        self.assertEqual(len(types), len(set(types)))
+        for line in lines:
+            if not line.startswith("#"):
+                name = line.split("{")[0].split()[0]
+                self.assertTrue(any(name == declared or name.startswith(declared + "_") for declared in types), line)
+
+    def test_optional_fields_omitted(self):
+        snapshot = ControllerMetrics(elevator_num=1, clock=FakeClock()).snapshot()
+        text = metrics_server.format_prometheus(snapshot)
+        self.assertNotIn("elevator_pending_hall_calls", text)
+        self.assertNotIn("elevator_car_floor", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+离散事件模拟器的单元测试
+运行：python -m pytest -q 或 python -m unittest test_simulation
+"""
+import unittest
+
+import traffic
+from simulation import Simulation
+
+
+def run_lunch(minutes=10, seed=1, **sim_args):
+    """
+    运行一段午餐客流
+    :return: (模拟器, 乘客列表)
+    """
+    sim = Simulation(**sim_args)
+    passengers = traffic.schedule_passengers(
+        sim, traffic.generate(traffic.LUNCH, minutes * 60 * 1000, 20, seed, sim.floor_num))
+    sim.run()
+    return sim, passengers
+
+
+class CallDirectionTest(unittest.TestCase):
+    """
+    外部请求只由离开方向与之相同的电梯完成，乘客不会先搭反方向的电梯
+    """
+
+    def test_down_call_served_on_down_sweep(self):
+        # 电梯0→8上行途中，5楼有人要去2楼：经过5楼时不停，到8楼折返后在5楼接上
+        for strategy in ("nearest", "look", "eta", "batch"):
+            sim = Simulation(elevator_num=1, strategy=strategy)
+            sim.car_call(0, 0, 8)
+            passenger = sim.passenger(500, 5, 2)
+            sim.run()
+            self.assertEqual(len(sim.finished_tasks), 1, strategy)
+            self.assertEqual(sim.finished_tasks[0].finished_time, 13500, strategy)
+            self.assertEqual(passenger.board_time, 13500, strategy)
+            self.assertEqual(passenger.alight_time, 19500, strategy)
+            self.assertEqual(sim.stops_total, 3, strategy)
+
+    def test_passengers_never_ride_the_wrong_way(self):
+        for strategy in ("nearest", "eta"):
+            sim = Simulation(elevator_num=3, strategy=strategy)
+            passengers = traffic.schedule_passengers(
+                sim, traffic.generate(traffic.INTERFLOOR, 10 * 60 * 1000, 40, 2, sim.floor_num))
+            # 记录每位乘客上车后电梯经过的楼层
+            paths = {}
+            floor_reached = sim.floor_reached
+
+            def record(elevator_id):
+                floor_reached(elevator_id)
+                for passenger in sim.riding_passengers[elevator_id]:
+                    paths.setdefault(id(passenger), []).append(sim.elevator_cur_floor[elevator_id])
+
+            sim.floor_reached = record
+            sim.run()
+            self.assertEqual(len(sim.delivered_passengers), len(passengers))
+            for passenger in passengers:
+                path = [passenger.origin] + paths.get(id(passenger), [])
+                direction = 1 if passenger.destination > passenger.origin else -1
+                self.assertTrue(all((b - a) * direction > 0 for a, b in zip(path, path[1:])), (strategy, passenger))
+
+
+class DoorTest(unittest.TestCase):
+    """
+    乘客在门完全打开时进出，关门按进出人数推迟
+    """
+
+    def test_exchange_when_door_opened(self):
+        sim = Simulation(elevator_num=1, door_time=2000, transfer_time=1000)
+        first = sim.passenger(0, 0, 3)
+        second = sim.passenger(0, 0, 3)
+        sim.run()
+        # 开门500ms后上车，两人进出多停留2000ms，4000ms时关门
+        self.assertEqual((first.board_time, second.board_time), (500, 500))
+        # 4000ms起上行3层，7000ms到达，7500ms开门下车
+        self.assertEqual((first.alight_time, second.alight_time), (7500, 7500))
+        self.assertEqual(sim.now, 7500 + 1500 + 2000)
+        self.assertEqual(sim.elevator_busy_time[0], 2 * (2000 + 2000) + 3 * 1000)
+
+    def test_fault_while_door_open(self):
+        sim = Simulation(elevator_num=2)
+        passenger = sim.passenger(0, 0, 3)
+        sim.fault(1000, 0)
+        sim.run()
+        # 门开着时发生故障：关门事件作废，乘客在一楼重新候梯，由另一台电梯送达
+        self.assertEqual(passenger.elevator_id, 1)
+        self.assertIsNotNone(passenger.alight_time)
+
+
+class AllCarsFaultedTest(unittest.TestCase):
+    """
+    所有电梯都故障时外部请求留在队列中，有电梯恢复后再分配
+    """
+
+    def test_hall_call_kept_until_repair(self):
+        sim = Simulation(elevator_num=2)
+        sim.fault(0, 0)
+        sim.fault(0, 1)
+        passenger = sim.passenger(1000, 5, 0)
+        sim.repair(20000, 1)
+        sim.run()
+        self.assertEqual(sim.delivered_passengers, [passenger])
+        self.assertEqual(passenger.elevator_id, 1)
+        self.assertGreater(passenger.board_time, 20000)
+
+    def test_riders_requeued_while_all_faulted(self):
+        sim = Simulation(elevator_num=1)
+        passenger = sim.passenger(0, 0, 8)
+        sim.fault(3000, 0)
+        sim.repair(10000, 0)
+        sim.run()
+        # 唯一的电梯故障，乘客在一楼重新候梯，电梯恢复后送达
+        self.assertEqual(sim.delivered_passengers, [passenger])
+        self.assertEqual(passenger.origin, 0)
+        self.assertGreater(passenger.board_time, 10000)
+
+    def test_destination_dispatch(self):
+        sim = Simulation(elevator_num=1, destination_dispatch=True)
+        sim.fault(0, 0)
+        passenger = sim.passenger(1000, 5, 0)
+        sim.repair(20000, 0)
+        sim.run()
+        self.assertEqual(sim.delivered_passengers, [passenger])
+
+
+class DestinationDispatchTest(unittest.TestCase):
+
+    def test_all_passengers_delivered(self):
+        sim, passengers = run_lunch(destination_dispatch=True)
+        self.assertTrue(passengers)
+        self.assertEqual(len(sim.delivered_passengers), len(passengers))
+
+    def test_batch_interval_ignored(self):
+        # 目的楼层分配不使用strategy，批量分配的周期不能让乘客无人分配
+        sim, passengers = run_lunch(destination_dispatch=True, strategy="batch", batch_interval=1000)
+        self.assertIsNone(sim.batch_interval)
+        self.assertEqual(len(sim.delivered_passengers), len(passengers))
+
+
+class BatchIntervalTest(unittest.TestCase):
+
+    def test_all_passengers_delivered(self):
+        sim, passengers = run_lunch(strategy="batch", batch_interval=1000)
+        self.assertEqual(sim.batch_interval, 1000)
+        self.assertEqual(len(sim.delivered_passengers), len(passengers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import random
+import sys
+
+from elevator_core import FLOOR_NUM, Passenger
+
+# 标准的楼宇客流模式
+UP_PEAK = "up_peak"  # 早高峰：大部分乘客从大堂上楼
+DOWN_PEAK = "down_peak"  # 晚高峰：大部分乘客下楼回到大堂
+LUNCH = "lunch"  # 午餐：上下楼各约一半，另有少量层间交通
+INTERFLOOR = "interfloor"  # 平峰：任意两层之间均匀往来
+PROFILES = (UP_PEAK, DOWN_PEAK, LUNCH, INTERFLOOR)
+
+# 各模式下 (从大堂出发, 前往大堂, 层间) 的比例
+PROFILE_MIX = {
+    UP_PEAK: (0.85, 0.05, 0.10),
+    DOWN_PEAK: (0.05, 0.85, 0.10),
+    LUNCH: (0.45, 0.45, 0.10),
+    INTERFLOOR: (0.0, 0.0, 1.0),
+}
+
+
+def od_matrix(profile, floor_num=FLOOR_NUM, lobby=0):
+    '''
+    生成客流模式对应的起讫点矩阵
+    :param profile: 客流模式，PROFILES之一
+    :param floor_num: 楼层数
+    :param lobby: 大堂所在楼层
+    :return: floor_num × floor_num 的权重矩阵，matrix[i][j]为从i层去j层的相对概率，对角线为0
+    '''
+    if profile not in PROFILE_MIX:
+        raise ValueError("未知的客流模式 %r，可选 %s" % (profile, ", ".join(PROFILES)))
+    if floor_num < 2:
+        raise ValueError("楼层数至少为2")
+    from_lobby, to_lobby, interfloor = PROFILE_MIX[profile]
+    others = [floor for floor in range(floor_num) if floor != lobby]
+    matrix = [[0.0 for _ in range(floor_num)] for _ in range(floor_num)]
+    for floor in others:
+        matrix[lobby][floor] += from_lobby / len(others)
+        matrix[floor][lobby] += to_lobby / len(others)
+    if len(others) > 1:
+        pairs = len(others) * (len(others) - 1)
+        for origin in others:
+            for destination in others:
+                if origin != destination:
+                    matrix[origin][destination] += interfloor / pairs
+    return matrix
+
+
+def generate(profile=INTERFLOOR, duration=3600 * 1000, rate=60, seed=None, floor_num=FLOOR_NUM, matrix=None,
+             start_time=0):
+    '''
+    按泊松过程生成乘客
+    :param profile: 客流模式，matrix不为None时忽略
+    :param duration: 生成时长（毫秒）
+    :param rate: 平均每分钟到达的乘客数
+    :param seed: 随机数种子，相同的种子得到相同的乘客序列
+    :param floor_num: 楼层数
+    :param matrix: 自定义起讫点矩阵（floor_num × floor_num的权重）
+    :param start_time: 第一位乘客可能到达的最早时刻（毫秒）
+    :return: 按到达时刻排序的乘客列表
+    '''
+    if matrix is None:
+        matrix = od_matrix(profile, floor_num)
+    pairs = []
+    cum_weights = []
+    total = 0.0
+    for origin in range(floor_num):
+        for destination in range(floor_num):
+            weight = matrix[origin][destination]
+            if weight > 0 and origin != destination:
+                total += weight
+                pairs.append((origin, destination))
+                cum_weights.append(total)
+    if not pairs:
+        raise ValueError("起讫点矩阵中没有可用的乘客去向")
+
+    rng = random.Random(seed)
+    passengers = []
+    # 到达间隔服从指数分布
+    mean_interval = 60 * 1000 / rate
+    time = start_time
+    while True:
+        time += rng.expovariate(1 / mean_interval)
+        if time >= start_time + duration:
+            break
+        origin, destination = rng.choices(pairs, cum_weights=cum_weights)[0]
+        passengers.append(Passenger(origin, destination, int(time)))
+    return passengers
+
+
+def schedule_passengers(sim, passengers):
+    '''
+    把乘客放入无界面模拟器（simulation.Simulation）的事件堆
+    :return: 模拟器中的乘客对象列表
+    '''
+    return [sim.passenger(passenger.arrival_time, passenger.origin, passenger.destination)
+            for passenger in passengers]
+
+
+if __name__ == '__main__':
+    # python traffic.py <客流模式> [每分钟人数] [分钟数] [种子]：生成乘客并在模拟器中运行
+    from simulation import Simulation
+
+    profile = sys.argv[1] if len(sys.argv) > 1 else INTERFLOOR
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    minutes = float(sys.argv[3]) if len(sys.argv) > 3 else 60
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    sim = Simulation()
+    passengers = schedule_passengers(sim, generate(profile, int(minutes * 60 * 1000), rate, seed))
+    sim.run()
+    delivered = sim.delivered_passengers
+    waits = [passenger.board_time - passenger.arrival_time for passenger in delivered]
+    print("%s：生成乘客 %d 人，送达 %d 人，平均候梯 %.1fs，模拟时长 %.1f分钟" % (
+        profile, len(passengers), len(delivered), sum(waits) / len(waits) / 1000 if waits else 0,
+        sim.now / 60000))
@@ -0,0 +1,125 @@
+import numpy as np
+
+from elevator_core import FLOOR_NUM, ELEVATOR_STATE, MOVE_STATE
+
+
+def car_arrays(elevator_states, elevator_cur_floor, elevator_move_states, elevator_up_target_list,
+               elevator_down_target_list):
+    '''
+    把每台电梯的状态整理成numpy数组
+    :return: (出发楼层, 是否故障, 扫描方向, 扫描方向上是否有目标, 扫描方向上最远的目标)
+    '''
+    elevator_num = len(elevator_states)
+    origin = np.empty(elevator_num, dtype=np.int64)
+    fault = np.empty(elevator_num, dtype=bool)
+    move_dir = np.empty(elevator_num, dtype=np.int64)
+    has_targets = np.empty(elevator_num, dtype=bool)
+    last_target = np.zeros(elevator_num, dtype=np.int64)
+    for i in range(elevator_num):
+        origin[i], fault[i], move_dir[i], has_targets[i], last_target[i] = car_values(
+            elevator_states[i], elevator_cur_floor[i], elevator_move_states[i], elevator_up_target_list[i],
+            elevator_down_target_list[i])
+    return origin, fault, move_dir, has_targets, last_target
+
+
+def car_values(state, cur_floor, move_state, up_targets, down_targets):
+    '''
+    单台电梯参与打分的数值，与 elevator_core.find_best_elevator 中的含义相同
+    '''
+    # 如果已经上行/下行了，则上/下移动一层
+    origin = cur_floor
+    if state == ELEVATOR_STATE.UP:
+        origin += 1
+    elif state == ELEVATOR_STATE.DOWN:
+        origin -= 1
+    if move_state == MOVE_STATE.UP:
+        targets = up_targets
+    else:
+        targets = down_targets
+    last_target = targets[-1] if targets else 0
+    return origin, state == ELEVATOR_STATE.FAULT, move_state.value, bool(targets), last_target
+
+
+def cost_matrix(task_floors, task_dirs, origin, fault, move_dir, has_targets, last_target):
+    '''
+    一次计算所有任务 × 所有电梯的距离矩阵，故障电梯记为inf
+    :param task_floors: 任务楼层 (T,)
+    :param task_dirs: 任务方向 (T,)，取MOVE_STATE的值
+    :return: (T, E) 的距离矩阵
+    '''
+    floors = task_floors[:, None]
+    dirs = task_dirs[:, None]
+    direct = np.abs(origin - floors)
+    # 电梯朝着按键所在楼层运行，且运动方向与外部请求相同
+    on_the_way = (move_dir == dirs) & (((dirs == MOVE_STATE.UP.value) & (floors >= origin)) |
+                                       ((dirs == MOVE_STATE.DOWN.value) & (floors <= origin)))
+    detour = np.abs(origin - last_target) + np.abs(floors - last_target)
+    cost = np.where(~has_targets | on_the_way, direct, detour).astype(np.float64)
+    cost[:, fault] = np.inf
+    return cost
+
+
+def best_from_costs(cost, floor_num=FLOOR_NUM):
+    '''
+    每一行取距离最小的电梯（相同距离取编号最小的），距离不小于floor_num+1时记为-1
+    :return: 电梯编号数组
+    '''
+    if cost.shape[1] == 0:
+        return np.full(cost.shape[0], -1, dtype=np.int64)
+    best = np.argmin(cost, axis=1)
+    best[cost[np.arange(cost.shape[0]), best] >= floor_num + 1] = -1
+    return best
+
+
+def find_best_elevators(outer_tasks, elevator_states, elevator_cur_floor, elevator_move_states,
+                        elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+    '''
+    批量版本的 find_best_elevator：对同一份电梯状态，一次给出每个任务的最近电梯
+    :param outer_tasks: 外部任务列表
+    :return: 电梯编号数组，没有可用电梯的任务为-1
+    '''
+    task_floors = np.fromiter((task.floor for task in outer_tasks), dtype=np.int64, count=len(outer_tasks))
+    task_dirs = np.fromiter((task.move_state.value for task in outer_tasks), dtype=np.int64,
+                            count=len(outer_tasks))
+    cars = car_arrays(elevator_states, elevator_cur_floor, elevator_move_states, elevator_up_target_list,
+                      elevator_down_target_list)
+    return best_from_costs(cost_matrix(task_floors, task_dirs, *cars), floor_num)
+
+
+class BatchScorer:
+    """
+    按顺序分配一批任务时使用的距离矩阵
+    先一次算出整张矩阵，某台电梯加入新目标后只重算该电梯对应的一列，
+    因此逐个分配的结果与逐个调用 find_best_elevator 完全相同
+    """
+
+    def __init__(self, outer_tasks, elevator_states, elevator_cur_floor, elevator_move_states,
+                 elevator_up_target_list, elevator_down_target_list, floor_num=FLOOR_NUM):
+        self.floor_num = floor_num
+        self.task_floors = np.fromiter((task.floor for task in outer_tasks), dtype=np.int64,
+                                       count=len(outer_tasks))
+        self.task_dirs = np.fromiter((task.move_state.value for task in outer_tasks), dtype=np.int64,
+                                     count=len(outer_tasks))
+        cars = car_arrays(elevator_states, elevator_cur_floor, elevator_move_states, elevator_up_target_list,
+                          elevator_down_target_list)
+        self.cost = cost_matrix(self.task_floors, self.task_dirs, *cars)
+
+    def best(self, task_index):
+        '''
+        第task_index个任务的最近电梯
+        :return: 电梯编号，没有可用电梯时为-1
+        '''
+        row = self.cost[task_index]
+        if row.size == 0:
+            return -1
+        elevator_id = int(np.argmin(row))
+        if row[elevator_id] >= self.floor_num + 1:
+            return -1
+        return elevator_id
+
+    def update(self, elevator_id, start, state, cur_floor, move_state, up_targets, down_targets):
+        '''
+        电梯状态改变后，重算它对第start个及之后任务的距离
+        '''
+        values = [np.array([value]) for value in car_values(state, cur_floor, move_state, up_targets, down_targets)]
+        self.cost[start:, elevator_id] = cost_matrix(self.task_floors[start:], self.task_dirs[start:], *values)[:, 0]